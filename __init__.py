@@ -1,43 +1,88 @@
+import os
+import weakref
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
+# Apps whose pooled connections a forked child must drop; weak, so an app can still be freed
+_apps = weakref.WeakSet()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    import replicas
+    replicas.configure(app)
+
+    import engine_profiles
+    engine_profiles.configure(app)
     db.init_app(app)
+    engine_profiles.init_app(app)
+    replicas.init_app(app)
+
     login_manager.init_app(app)
     login_manager.login_view = 'login'
     login_manager.login_message = 'Please log in to access this page.'
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        from models import User
-        return User.query.get(int(user_id))
+    from commands import register_commands
+    register_commands(app)
+
+    import pagination
+    pagination.init_app(app)
+
+    import images
+    images.init_app(app)
+
+    import storage
+    storage.init_app(app)
+
+    import snapshots
+    snapshots.init_app(app)
 
-    with app.app_context():
-        import models
-        db.create_all()
-        
-        # Create default admin user if it doesn't exist
-        from models import User
-        admin_user = User.query.filter_by(username='admin').first()
-        if not admin_user:
-            admin_user = User(username='admin', email='admin@example.com', role='admin')
-            admin_user.set_password('admin123')
-            db.session.add(admin_user)
-            db.session.commit()
+    import counters
+    counters.init_app(app)
 
-    return app    
-    
+    import activity
+    activity.init_app(app)
 
+    import unit_of_work
+    unit_of_work.init_app(app)
 
+    import expiry
+    expiry.init_app(app)
+
+    import identity
+    identity.init_app(app)
+
+    import query_budget
+    query_budget.init_app(app)
+
+    import metrics
+    metrics.init_app(app)
+
+    import sql_profiler
+    sql_profiler.init_app(app)
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return identity.load(int(user_id))
 
+    # Registers the models; schema setup and seeding are `flask init-db`, so booting a
+    # worker runs no queries
+    import models
 
+    _apps.add(app)
+    return app
 
+def _dispose_engines():
+    # Workers forked from a --preload master must not share its pooled connections
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
 
+os.register_at_fork(after_in_child=_dispose_engines)
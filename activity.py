@@ -0,0 +1,126 @@
+import atexit
+import os
+import threading
+from datetime import datetime
+from flask import has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from __init__ import db
+from models import UserActivity
+
+_app = None
+_buffer = []
+_buffer_pid = None
+_lock = threading.Lock()
+_wake = threading.Event()
+_flusher = None
+
+
+def record(user_id, action, details=None, ip_address=None):
+    """Log an activity row once the request's unit of work commits; nothing is logged on rollback"""
+    row = {
+        'user_id': user_id,
+        'action': action,
+        'details': details,
+        'ip_address': ip_address,
+        'created_at': datetime.utcnow(),
+    }
+    if _app.config['ACTIVITY_LOG_MODE'] == 'sync':
+        db.session.add(UserActivity(**row))
+    elif has_request_context():
+        db.session.info.setdefault('pending_activity', []).append(row)
+    else:
+        _enqueue([row])
+
+
+def _enqueue(rows):
+    with _lock:
+        _start_flusher()
+        _buffer.extend(rows)
+        full = len(_buffer) >= _app.config['ACTIVITY_BATCH_SIZE']
+    if full:
+        _wake.set()
+
+
+def flush():
+    """Write everything buffered in this worker; returns the number of rows written"""
+    with _lock:
+        if _buffer_pid != os.getpid():
+            return 0
+        rows = _buffer[:]
+        del _buffer[:]
+    if not rows:
+        return 0
+    try:
+        return _write(rows)
+    except Exception as e:
+        _app.logger.error(f'Could not write {len(rows)} activity rows: {str(e)}')
+        _requeue(rows)
+        return 0
+
+
+def _write(rows):
+    table = UserActivity.__table__
+    with _app.app_context():
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(table.insert(), rows)
+            return len(rows)
+        except IntegrityError:
+            # One bad row (e.g. a user deleted since) must not take the batch with it
+            written = 0
+            for row in rows:
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(table.insert(), [row])
+                    written += 1
+                except IntegrityError:
+                    _app.logger.warning(f'Dropped activity row {row["action"]} for user {row["user_id"]}')
+            return written
+
+
+def _requeue(rows):
+    limit = _app.config['ACTIVITY_BUFFER_LIMIT']
+    with _lock:
+        _buffer[:0] = rows
+        # While the database is unreachable keep the newest rows and bound memory
+        overflow = len(_buffer) - limit
+        if overflow > 0:
+            del _buffer[:overflow]
+            _app.logger.warning(f'Activity buffer full; dropped {overflow} oldest rows')
+
+
+def _run():
+    interval = _app.config['ACTIVITY_FLUSH_INTERVAL']
+    while True:
+        _wake.wait(interval)
+        _wake.clear()
+        flush()
+
+
+def _start_flusher():
+    global _flusher, _buffer_pid
+    # A thread inherited across fork is gone and so is the parent's buffer; start over per process
+    if _buffer_pid != os.getpid():
+        del _buffer[:]
+        _buffer_pid = os.getpid()
+        _flusher = threading.Thread(target=_run, name='activity-flusher', daemon=True)
+        _flusher.start()
+
+
+def _after_commit(session):
+    rows = session.info.pop('pending_activity', None)
+    if rows:
+        _enqueue(rows)
+
+
+def _after_rollback(session):
+    session.info.pop('pending_activity', None)
+
+
+def init_app(app):
+    global _app
+    _app = app
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
+    atexit.register(flush)
@@ -1,6 +1,7 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, send_from_directory
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, send_from_directory, abort, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from sqlalchemy.orm import joinedload
 from dotenv import load_dotenv
 from __init__ import create_app, db
 from forms import (LostItem, FoundItem, Claim, LoginForm, RegistrationForm,
@@ -8,15 +9,41 @@ from forms import (LostItem, FoundItem, Claim, LoginForm, RegistrationForm,
                    UserManagementForm, CategoryForm, LocationForm, SystemSettingForm, SearchForm,
                    ProfileEditForm, PasswordChangeForm, ItemSearchForm)
 from models import (LostItemModel, FoundItemModel, ClaimModel, User, Category,
-                   Location, SystemSetting, UserActivity, ClaimHistory)
+                   Location, SystemSetting, UserActivity, ClaimHistory, DailyItemStat)
+from search import apply_search
+from pagination import keyset_paginate
+import matching
+from images import RENDITIONS, rendition_name, schedule_renditions
+import storage
+import snapshots
+import counters
+import activity
+import expiry
+import passwords
+import rollups
+import exports
+import metrics
+from unit_of_work import unit_of_work, commits_in_batches
+from replicas import read_replica
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import json
 
 load_dotenv()
 
 app = create_app()
 
+# Column values each set-based bulk action writes
+BULK_UPDATES = {
+    'approve': {'is_verified': True},
+    'reject': {'is_verified': False},
+    'verify': {'is_verified': True},
+    'expire': {'status': 'expired'},
+}
+BULK_CHUNK_SIZE = 500
+# Longest date range the statistics charts cover
+STATISTICS_MAX_DAYS = 366
+
 def admin_required(f):
     from functools import wraps
     @wraps(f)
@@ -29,39 +56,30 @@ def admin_required(f):
 
 def log_activity(user_id, action, details=None, ip_address=None):
     """Log user activity"""
-    activity = UserActivity(
-        user_id=user_id,
-        action=action,
-        details=details,
-        ip_address=ip_address
-    )
-    db.session.add(activity)
-    db.session.commit()
+    activity.record(user_id, action, details, ip_address)
+
+def paginate_admin_list(query, model, per_page, sort_by='created_at', sort_order='desc'):
+    """Cursor pagination for the default created_at sort, page numbers for any other sort"""
+    if app.config['ADMIN_PAGINATION'] == 'keyset' and sort_by == 'created_at':
+        return keyset_paginate(query, model, per_page,
+                               cursor=request.args.get('cursor'),
+                               order=sort_order,
+                               count_limit=app.config['ADMIN_COUNT_LIMIT'])
 
+    column = getattr(model, sort_by)
+    query = query.order_by(column.desc() if sort_order == 'desc' else column.asc())
+    page = request.args.get('page', 1, type=int)
+    return query.paginate(page=page, per_page=per_page, error_out=False)
 
 @app.route('/')
+@app.route('/home', endpoint='home')
 def index():
-    # Get recent items for display on home page
-    recent_lost = LostItemModel.query.filter_by(status='active').order_by(LostItemModel.created_at.desc()).limit(6).all()
-    recent_found = FoundItemModel.query.filter_by(status='active').order_by(FoundItemModel.created_at.desc()).limit(6).all()
-    
-    return render_template('home.html', 
-                         title='Home',
-                         recent_lost=recent_lost,
-                         recent_found=recent_found)
-
-@app.route('/home')
-def home():
-    # Get recent items for display on home page
-    recent_lost = LostItemModel.query.filter_by(status='active').order_by(LostItemModel.created_at.desc()).limit(6).all()
-    recent_found = FoundItemModel.query.filter_by(status='active').order_by(FoundItemModel.created_at.desc()).limit(6).all()
-    
-    return render_template('home.html', 
+    return render_template('home.html',
                          title='Home',
-                         recent_lost=recent_lost,
-                         recent_found=recent_found)
+                         recent_items=snapshots.recent_items())
 
 @app.route('/login', methods=['GET', 'POST'])
+@unit_of_work
 def login():
     if current_user.is_authenticated:
         # Redirect based on user role
@@ -80,7 +98,8 @@ def login():
             
             login_user(user)
             user.last_login = datetime.utcnow()
-            db.session.commit()
+            if passwords.needs_rehash(user.password_hash):
+                user.set_password(form.password.data)
             
             log_activity(user.id, 'login', ip_address=request.remote_addr)
             flash('Login successful!', 'success')
@@ -96,6 +115,7 @@ def login():
     return render_template('login.html', title='Login', form=form)
 
 @app.route('/register', methods=['GET', 'POST'])
+@unit_of_work
 def register():
     if current_user.is_authenticated:
         # Redirect based on user role
@@ -124,9 +144,11 @@ def register():
             user.set_password(form.password.data)
             
             db.session.add(user)
-            db.session.commit()
+            db.session.flush()
             
             log_activity(user.id, 'register', ip_address=request.remote_addr)
+            # Flushed here so a constraint error takes the except path below, not the commit
+            db.session.flush()
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('login'))
         except Exception as e:
@@ -139,6 +161,7 @@ def register():
 
 @app.route('/logout')
 @login_required
+@unit_of_work
 def logout():
     log_activity(current_user.id, 'logout', ip_address=request.remote_addr)
     logout_user()
@@ -177,6 +200,7 @@ def user_dashboard():
 
 @app.route('/profile', methods=['GET', 'POST'])
 @login_required
+@unit_of_work
 def user_profile():
     form = ProfileEditForm(obj=current_user)
     
@@ -192,8 +216,9 @@ def user_profile():
             flash('Email already registered', 'error')
             return render_template('profile.html', title='Profile', form=form)
         
-        form.populate_obj(current_user)
-        db.session.commit()
+        # current_user may be the cached identity; change the stored row
+        user = db.session.get(User, current_user.id)
+        form.populate_obj(user)
         
         log_activity(current_user.id, 'update_profile')
         flash('Profile updated successfully!', 'success')
@@ -203,6 +228,7 @@ def user_profile():
 
 @app.route('/change-password', methods=['GET', 'POST'])
 @login_required
+@unit_of_work
 def change_password():
     form = PasswordChangeForm()
     
@@ -211,8 +237,7 @@ def change_password():
             flash('Current password is incorrect', 'error')
             return render_template('change_password.html', title='Change Password', form=form)
         
-        current_user.set_password(form.new_password.data)
-        db.session.commit()
+        db.session.get(User, current_user.id).set_password(form.new_password.data)
         
         log_activity(current_user.id, 'change_password')
         flash('Password changed successfully!', 'success')
@@ -222,6 +247,7 @@ def change_password():
 
 # Item Browsing Routes
 @app.route('/lost-items')
+@read_replica
 def browse_lost_items():
     page = request.args.get('page', 1, type=int)
     category_filter = request.args.get('category', 'all')
@@ -233,11 +259,7 @@ def browse_lost_items():
         query = query.filter_by(category=category_filter)
     
     if search_query:
-        query = query.filter(
-            LostItemModel.item_name.contains(search_query) |
-            LostItemModel.description.contains(search_query) |
-            LostItemModel.location.contains(search_query)
-        )
+        query = apply_search(query, LostItemModel, search_query)
     
     items = query.order_by(LostItemModel.created_at.desc()).paginate(
         page=page, per_page=12, error_out=False)
@@ -249,6 +271,7 @@ def browse_lost_items():
                          search_query=search_query)
 
 @app.route('/found-items')
+@read_replica
 def browse_found_items():
     page = request.args.get('page', 1, type=int)
     category_filter = request.args.get('category', 'all')
@@ -260,11 +283,7 @@ def browse_found_items():
         query = query.filter_by(category=category_filter)
     
     if search_query:
-        query = query.filter(
-            FoundItemModel.item_name.contains(search_query) |
-            FoundItemModel.description.contains(search_query) |
-            FoundItemModel.location.contains(search_query)
-        )
+        query = apply_search(query, FoundItemModel, search_query)
     
     items = query.order_by(FoundItemModel.created_at.desc()).paginate(
         page=page, per_page=12, error_out=False)
@@ -277,23 +296,28 @@ def browse_found_items():
 
 # Item Detail Routes
 @app.route('/item/lost/<int:item_id>')
+@read_replica
 def lost_item_detail(item_id):
     item = LostItemModel.query.get_or_404(item_id)
     return render_template('item_detail.html',
                          title=f'Lost Item: {item.item_name}',
                          item=item,
-                         item_type='lost')
+                         item_type='lost',
+                         matches=matching.matches_for('lost', item.id))
 
 @app.route('/item/found/<int:item_id>')
+@read_replica
 def found_item_detail(item_id):
     item = FoundItemModel.query.get_or_404(item_id)
     return render_template('item_detail.html',
                          title=f'Found Item: {item.item_name}',
                          item=item,
-                         item_type='found')
+                         item_type='found',
+                         matches=matching.matches_for('found', item.id))
 
 # Search Routes
 @app.route('/search')
+@read_replica
 def search_items():
     form = ItemSearchForm()
     results = {'lost': [], 'found': []}
@@ -308,11 +332,7 @@ def search_items():
             if category != 'all':
                 lost_query = lost_query.filter_by(category=category)
             if query:
-                lost_query = lost_query.filter(
-                    LostItemModel.item_name.contains(query) |
-                    LostItemModel.description.contains(query) |
-                    LostItemModel.location.contains(query)
-                )
+                lost_query = apply_search(lost_query, LostItemModel, query)
             results['lost'] = lost_query.order_by(LostItemModel.created_at.desc()).limit(20).all()
         
         if item_type in ['all', 'found']:
@@ -320,11 +340,7 @@ def search_items():
             if category != 'all':
                 found_query = found_query.filter_by(category=category)
             if query:
-                found_query = found_query.filter(
-                    FoundItemModel.item_name.contains(query) |
-                    FoundItemModel.description.contains(query) |
-                    FoundItemModel.location.contains(query)
-                )
+                found_query = apply_search(found_query, FoundItemModel, query)
             results['found'] = found_query.order_by(FoundItemModel.created_at.desc()).limit(20).all()
     
     return render_template('search_results.html',
@@ -333,12 +349,30 @@ def search_items():
                          results=results)
 
 # File serving route for photos
-@app.route('/uploads/<filename>')
+@app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return storage.send_photo(filename)
+
+@app.route('/photos/<size>/<path:filename>')
+def photo_rendition(size, filename):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    original = safe_join(upload_folder, filename)
+    if size not in RENDITIONS or original is None:
+        abort(404)
+
+    name = rendition_name(filename, size)
+    if os.path.exists(os.path.join(upload_folder, name)):
+        return storage.send_photo(name, variant=size)
+
+    # Renditions are still pending (or were never made): queue them and serve the
+    # original, without letting browsers cache it under this URL for good
+    if os.path.exists(original):
+        schedule_renditions(filename)
+    return storage.send_photo(filename, immutable=False)
 
 @app.route('/report-lost-item', methods=['GET', 'POST'])
 @login_required
+@unit_of_work
 def report_lost_item():
     form = LostItem()
     if form.validate_on_submit():
@@ -352,10 +386,7 @@ def report_lost_item():
 
         photo_filename = None
         if form.photo.data:
-            photo_file = form.photo.data
-            photo_filename = secure_filename(photo_file.filename)
-            photo_path = os.path.join(app.config['UPLOAD_FOLDER'], photo_filename)
-            photo_file.save(photo_path)
+            photo_filename = storage.save_upload(form.photo.data)
 
         #save to database
         lost_item = LostItemModel(
@@ -368,8 +399,10 @@ def report_lost_item():
             student_email=student_email,
             photo_filename=photo_filename
         )
+        expiry.stamp(lost_item)
         db.session.add(lost_item)
-        db.session.commit()
+        db.session.flush()
+        matching.index_item('lost', lost_item)
 
         log_activity(current_user.id, 'report_lost_item', f'Reported lost item: {item_name}')
         flash('Lost item reported successfully!', 'success')
@@ -379,6 +412,7 @@ def report_lost_item():
 
 @app.route('/report-found-item', methods=['GET', 'POST'])
 @login_required
+@unit_of_work
 def report_found_item():
     form = FoundItem()
     if form.validate_on_submit():
@@ -394,10 +428,7 @@ def report_found_item():
         # Handle photo upload
         photo_filename = None
         if form.photo.data:
-            photo_file = form.photo.data
-            photo_filename = secure_filename(photo_file.filename)
-            photo_path = os.path.join(app.config['UPLOAD_FOLDER'], photo_filename)
-            photo_file.save(photo_path)
+            photo_filename = storage.save_upload(form.photo.data)
 
         #(later you can store this in a DB)
         found_item = FoundItemModel(
@@ -411,8 +442,10 @@ def report_found_item():
             current_location=current_location,
             photo_filename=photo_filename
         )
+        expiry.stamp(found_item)
         db.session.add(found_item)
-        db.session.commit()
+        db.session.flush()
+        matching.index_item('found', found_item)
 
         log_activity(current_user.id, 'report_found_item', f'Reported found item: {item_name}')
         flash('Found item reported successfully!', 'success')
@@ -422,6 +455,7 @@ def report_found_item():
 
 @app.route('/claim', methods=['GET', 'POST'])
 @login_required
+@unit_of_work
 def claim():
     form = Claim()
     
@@ -451,7 +485,7 @@ def claim():
         )
         
         db.session.add(claim)
-        db.session.commit()
+        db.session.flush()
         
         # Log claim history
         history = ClaimHistory(
@@ -460,7 +494,6 @@ def claim():
             notes='Claim submitted'
         )
         db.session.add(history)
-        db.session.commit()
         
         log_activity(current_user.id, 'submit_claim', f'Submitted claim for {item_type} item')
         flash('Claim submitted successfully! Admin will review your claim.', 'success')
@@ -474,12 +507,13 @@ def claim():
 @admin_required
 def admin_dashboard():
     # Get statistics
-    total_lost = LostItemModel.query.count()
-    total_found = FoundItemModel.query.count()
-    total_claims = ClaimModel.query.count()
-    pending_claims = ClaimModel.query.filter_by(status='pending').count()
-    active_lost = LostItemModel.query.filter_by(status='active').count()
-    active_found = FoundItemModel.query.filter_by(status='active').count()
+    counts = counters.snapshot()
+    total_lost = counters.total(counts, 'lost')
+    total_found = counters.total(counts, 'found')
+    total_claims = counters.total(counts, 'claim')
+    pending_claims = counters.total(counts, 'claim', 'pending')
+    active_lost = counters.total(counts, 'lost', 'active')
+    active_found = counters.total(counts, 'found', 'active')
     
     # Recent items
     recent_lost = LostItemModel.query.order_by(LostItemModel.created_at.desc()).limit(5).all()
@@ -502,7 +536,6 @@ def admin_dashboard():
 @login_required
 @admin_required
 def admin_lost_items():
-    page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', 'all')
     category_filter = request.args.get('category', 'all')
     sort_by = request.args.get('sort', 'created_at')
@@ -516,13 +549,7 @@ def admin_lost_items():
     if category_filter != 'all':
         query = query.filter_by(category=category_filter)
     
-    # Apply sorting
-    if sort_order == 'desc':
-        query = query.order_by(getattr(LostItemModel, sort_by).desc())
-    else:
-        query = query.order_by(getattr(LostItemModel, sort_by).asc())
-    
-    items = query.paginate(page=page, per_page=20, error_out=False)
+    items = paginate_admin_list(query, LostItemModel, 20, sort_by, sort_order)
     
     form = AdminItemStatusForm()
     
@@ -539,7 +566,6 @@ def admin_lost_items():
 @login_required
 @admin_required
 def admin_found_items():
-    page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', 'all')
     category_filter = request.args.get('category', 'all')
     sort_by = request.args.get('sort', 'created_at')
@@ -553,13 +579,7 @@ def admin_found_items():
     if category_filter != 'all':
         query = query.filter_by(category=category_filter)
     
-    # Apply sorting
-    if sort_order == 'desc':
-        query = query.order_by(getattr(FoundItemModel, sort_by).desc())
-    else:
-        query = query.order_by(getattr(FoundItemModel, sort_by).asc())
-    
-    items = query.paginate(page=page, per_page=20, error_out=False)
+    items = paginate_admin_list(query, FoundItemModel, 20, sort_by, sort_order)
     
     form = AdminItemStatusForm()
     
@@ -576,7 +596,6 @@ def admin_found_items():
 @login_required
 @admin_required
 def admin_claims():
-    page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', 'all')
     item_type_filter = request.args.get('item_type', 'all')
     sort_by = request.args.get('sort', 'created_at')
@@ -590,13 +609,7 @@ def admin_claims():
     if item_type_filter != 'all':
         query = query.filter_by(item_type=item_type_filter)
     
-    # Apply sorting
-    if sort_order == 'desc':
-        query = query.order_by(getattr(ClaimModel, sort_by).desc())
-    else:
-        query = query.order_by(getattr(ClaimModel, sort_by).asc())
-    
-    claims = query.paginate(page=page, per_page=20, error_out=False)
+    claims = paginate_admin_list(query, ClaimModel, 20, sort_by, sort_order)
     
     form = AdminClaimForm()
     
@@ -612,6 +625,7 @@ def admin_claims():
 @app.route('/admin/update-item-status/<item_type>/<int:item_id>', methods=['POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_update_item_status(item_type, item_id):
     form = AdminItemStatusForm()
     if form.validate_on_submit():
@@ -622,7 +636,7 @@ def admin_update_item_status(item_type, item_id):
         
         item.status = form.status.data
         item.updated_at = datetime.utcnow()
-        db.session.commit()
+        matching.index_item(item_type, item)
         
         log_activity(current_user.id, f'update_{item_type}_status', f'Updated {item_type} item {item_id} status to {form.status.data}')
         flash(f'{item_type.title()} item status updated successfully!', 'success')
@@ -634,6 +648,7 @@ def admin_update_item_status(item_type, item_id):
 @app.route('/admin/update-claim/<int:claim_id>', methods=['POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_update_claim(claim_id):
     try:
         claim = ClaimModel.query.get_or_404(claim_id)
@@ -652,6 +667,7 @@ def admin_update_claim(claim_id):
         claim.status = new_status
         claim.admin_notes = admin_notes if admin_notes else None
         claim.updated_at = datetime.utcnow()
+        claim.resolved_at = claim.updated_at if new_status in ('approved', 'rejected') else None
         
         # If claim is approved, update the related item status
         if new_status == 'approved' and claim.item_id:
@@ -663,6 +679,7 @@ def admin_update_claim(claim_id):
             if item:
                 item.status = 'claimed'
                 item.updated_at = datetime.utcnow()
+                matching.remove_items(claim.item_type, [item.id])
         
         # Log claim history
         history = ClaimHistory(
@@ -672,9 +689,10 @@ def admin_update_claim(claim_id):
             notes=admin_notes
         )
         db.session.add(history)
-        db.session.commit()
         
         log_activity(current_user.id, 'update_claim', f'Updated claim {claim_id} from {old_status} to {new_status}')
+        # Flushed here so a constraint error or deadlock takes the except path below, not the commit
+        db.session.flush()
         flash('Claim status updated successfully!', 'success')
         
     except Exception as e:
@@ -687,20 +705,18 @@ def admin_update_claim(claim_id):
 @app.route('/admin/delete-item/<item_type>/<int:item_id>', methods=['POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_delete_item(item_type, item_id):
     if item_type == 'lost':
         item = LostItemModel.query.get_or_404(item_id)
     else:
         item = FoundItemModel.query.get_or_404(item_id)
     
-    # Delete associated photo if exists
-    if item.photo_filename:
-        photo_path = os.path.join(app.config['UPLOAD_FOLDER'], item.photo_filename)
-        if os.path.exists(photo_path):
-            os.remove(photo_path)
-    
+    matching.remove_items(item_type, [item.id])
     db.session.delete(item)
-    db.session.commit()
+    db.session.flush()
+    # The photo file goes once the last item using it is deleted
+    storage.release([item.photo_filename])
     
     log_activity(current_user.id, f'delete_{item_type}_item', f'Deleted {item_type} item {item_id}')
     flash(f'{item_type.title()} item deleted successfully!', 'success')
@@ -709,10 +725,10 @@ def admin_delete_item(item_type, item_id):
 @app.route('/admin/delete-claim/<int:claim_id>', methods=['POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_delete_claim(claim_id):
     claim = ClaimModel.query.get_or_404(claim_id)
     db.session.delete(claim)
-    db.session.commit()
     
     log_activity(current_user.id, 'delete_claim', f'Deleted claim {claim_id}')
     flash('Claim deleted successfully!', 'success')
@@ -721,32 +737,31 @@ def admin_delete_claim(claim_id):
 @app.route('/admin/statistics')
 @login_required
 @admin_required
+@read_replica
 def admin_statistics():
     # Get detailed statistics
-    lost_by_status = db.session.query(
-        LostItemModel.status, 
-        db.func.count(LostItemModel.id)
-    ).group_by(LostItemModel.status).all()
-    
-    found_by_status = db.session.query(
-        FoundItemModel.status, 
-        db.func.count(FoundItemModel.id)
-    ).group_by(FoundItemModel.status).all()
-    
-    claims_by_status = db.session.query(
-        ClaimModel.status, 
-        db.func.count(ClaimModel.id)
-    ).group_by(ClaimModel.status).all()
-    
-    lost_by_category = db.session.query(
-        LostItemModel.category, 
-        db.func.count(LostItemModel.id)
-    ).group_by(LostItemModel.category).all()
-    
-    found_by_category = db.session.query(
-        FoundItemModel.category, 
-        db.func.count(FoundItemModel.id)
-    ).group_by(FoundItemModel.category).all()
+    counts = counters.snapshot()
+    lost_by_status = counters.grouped(counts, 'lost', 'status')
+    found_by_status = counters.grouped(counts, 'found', 'status')
+    claims_by_status = counters.grouped(counts, 'claim', 'status')
+    lost_by_category = counters.grouped(counts, 'lost', 'category')
+    found_by_category = counters.grouped(counts, 'found', 'category')
+    
+    # Date-range charts come from the daily rollups, which `flask stats-rollup` (cron) keeps
+    # up to date through yesterday; a GET never rolls up, so the charts stop at the last rolled-up day
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    rolled_up_through = rollups.last_rolled_up_day()
+    latest = min(rolled_up_through or yesterday, yesterday)
+    try:
+        range_end = min(datetime.strptime(request.args['end'], '%Y-%m-%d').date(), latest)
+    except (KeyError, ValueError):
+        range_end = latest
+    try:
+        range_start = datetime.strptime(request.args['start'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        range_start = range_end - timedelta(days=29)
+    range_start = max(min(range_start, range_end), range_end - timedelta(days=STATISTICS_MAX_DAYS - 1))
+    daily = rollups.series(range_start, range_end)
     
     return render_template('admin_statistics.html',
                          title='Statistics Dashboard',
@@ -754,13 +769,21 @@ def admin_statistics():
                          found_by_status=found_by_status,
                          claims_by_status=claims_by_status,
                          lost_by_category=lost_by_category,
-                         found_by_category=found_by_category)
+                         found_by_category=found_by_category,
+                         range_start=range_start,
+                         range_end=range_end,
+                         rollups_behind=(rolled_up_through or date.min) < yesterday,
+                         rolled_up_through=rolled_up_through,
+                         daily=daily,
+                         top_categories=rollups.top(DailyItemStat.category, range_start, range_end),
+                         top_locations=rollups.top(DailyItemStat.location, range_start, range_end))
 
 # New Admin Routes for Advanced Features
 
 @app.route('/admin/edit-item/<item_type>/<int:item_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_edit_item(item_type, item_id):
     if item_type == 'lost':
         item = LostItemModel.query.get_or_404(item_id)
@@ -772,7 +795,7 @@ def admin_edit_item(item_type, item_id):
     if form.validate_on_submit():
         form.populate_obj(item)
         item.updated_at = datetime.utcnow()
-        db.session.commit()
+        matching.index_item(item_type, item)
         
         log_activity(current_user.id, f'edit_{item_type}_item', f'Edited {item_type} item {item_id}')
         flash(f'{item_type.title()} item updated successfully!', 'success')
@@ -787,37 +810,38 @@ def admin_edit_item(item_type, item_id):
 @app.route('/admin/bulk-action/<item_type>', methods=['POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_bulk_action(item_type):
     form = BulkActionForm()
     if form.validate_on_submit():
-        item_ids = json.loads(form.item_ids.data)
+        item_ids = sorted({int(item_id) for item_id in json.loads(form.item_ids.data)})
         action = form.action.data
+        model = LostItemModel if item_type == 'lost' else FoundItemModel
         
-        if item_type == 'lost':
-            items = LostItemModel.query.filter(LostItemModel.id.in_(item_ids)).all()
-        else:
-            items = FoundItemModel.query.filter(FoundItemModel.id.in_(item_ids)).all()
-        
-        for item in items:
+        # One statement per chunk of ids instead of loading and touching every row
+        affected = 0
+        for start in range(0, len(item_ids), BULK_CHUNK_SIZE):
+            chunk = item_ids[start:start + BULK_CHUNK_SIZE]
+            selected = db.session.query(model).filter(model.id.in_(chunk))
             if action == 'delete':
-                if item.photo_filename:
-                    photo_path = os.path.join(app.config['UPLOAD_FOLDER'], item.photo_filename)
-                    if os.path.exists(photo_path):
-                        os.remove(photo_path)
-                db.session.delete(item)
-            elif action == 'approve':
-                item.is_verified = True
-            elif action == 'reject':
-                item.is_verified = False
-            elif action == 'expire':
-                item.status = 'expired'
-            elif action == 'verify':
-                item.is_verified = True
+                photos = [row[0] for row in db.session.query(model.photo_filename).filter(
+                    model.id.in_(chunk), model.photo_filename.isnot(None))]
+                matching.remove_items(item_type, chunk)
+                affected += selected.delete(synchronize_session=False)
+                # Files are removed by a background queue once this commits
+                storage.release(photos)
+            elif action in BULK_UPDATES:
+                now = datetime.utcnow()
+                values = dict(BULK_UPDATES[action], updated_at=now)
+                if action == 'expire':
+                    matching.remove_items(item_type, chunk)
+                    # Already expired items keep the day they expired on
+                    selected = selected.filter(model.status != 'expired')
+                    values['expired_at'] = now
+                affected += selected.update(values, synchronize_session=False)
         
-        db.session.commit()
-        
-        log_activity(current_user.id, f'bulk_{action}_{item_type}', f'Applied {action} to {len(items)} {item_type} items')
-        flash(f'Bulk action "{action}" applied to {len(items)} items successfully!', 'success')
+        log_activity(current_user.id, f'bulk_{action}_{item_type}', f'Applied {action} to {affected} {item_type} items')
+        flash(f'Bulk action "{action}" applied to {affected} items successfully!', 'success')
     
     return redirect(request.referrer or url_for('admin_dashboard'))
 
@@ -828,8 +852,7 @@ from forms import DeleteUserForm
 @login_required
 @admin_required
 def admin_users():
-    page = request.args.get('page', 1, type=int)
-    users = User.query.paginate(page=page, per_page=20, error_out=False)
+    users = paginate_admin_list(User.query, User, 20)
     delete_forms = {user.id: DeleteUserForm() for user in users.items}
     return render_template('admin_users.html',
                          title='Manage Users',
@@ -839,13 +862,13 @@ def admin_users():
 @app.route('/admin/edit-user/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_edit_user(user_id):
     user = User.query.get_or_404(user_id)
     form = UserManagementForm(obj=user)
     
     if form.validate_on_submit():
         form.populate_obj(user)
-        db.session.commit()
         
         log_activity(current_user.id, 'edit_user', f'Edited user {user_id}')
         flash('User updated successfully!', 'success')
@@ -859,6 +882,7 @@ def admin_edit_user(user_id):
 @app.route('/admin/delete-user/<int:user_id>', methods=['POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_delete_user(user_id):
     user = User.query.get_or_404(user_id)
     
@@ -872,10 +896,10 @@ def admin_delete_user(user_id):
         flash('You cannot delete the main admin user.', 'error')
         return redirect(url_for('admin_users'))
     
-    # Delete all user activities for this user first
+    # Delete all user activities for this user first, including any still buffered here
+    activity.flush()
     UserActivity.query.filter_by(user_id=user.id).delete()
     db.session.delete(user)
-    db.session.commit()
     
     log_activity(current_user.id, 'delete_user', f'Deleted user {user_id}')
     flash('User deleted successfully!', 'success')
@@ -884,6 +908,7 @@ def admin_delete_user(user_id):
 @app.route('/admin/create-user', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@unit_of_work
 def admin_create_user():
     form = RegistrationForm()
     # Remove the confirm_password field from the form since it's not needed for admin creation
@@ -914,9 +939,10 @@ def admin_create_user():
             user.set_password(password)
             
             db.session.add(user)
-            db.session.commit()
+            db.session.flush()
             
             log_activity(current_user.id, 'create_user', f'Created user {user.id}')
+            db.session.flush()
             flash(f'User created successfully! Temporary password: {password}', 'success')
             return redirect(url_for('admin_users'))
         except Exception as e:
@@ -929,6 +955,7 @@ def admin_create_user():
 @app.route('/admin/categories')
 @login_required
 @admin_required
+@unit_of_work
 def admin_categories():
     categories = Category.query.all()
     form = CategoryForm()
@@ -940,7 +967,6 @@ def admin_categories():
             is_active=form.is_active.data
         )
         db.session.add(category)
-        db.session.commit()
         
         log_activity(current_user.id, 'add_category', f'Added category: {form.name.data}')
         flash('Category added successfully!', 'success')
@@ -954,6 +980,7 @@ def admin_categories():
 @app.route('/admin/locations')
 @login_required
 @admin_required
+@unit_of_work
 def admin_locations():
     locations = Location.query.all()
     form = LocationForm()
@@ -965,7 +992,6 @@ def admin_locations():
             is_active=form.is_active.data
         )
         db.session.add(location)
-        db.session.commit()
         
         log_activity(current_user.id, 'add_location', f'Added location: {form.name.data}')
         flash('Location added successfully!', 'success')
@@ -979,6 +1005,7 @@ def admin_locations():
 @app.route('/admin/settings')
 @login_required
 @admin_required
+@unit_of_work
 def admin_settings():
     settings = SystemSetting.query.all()
     form = SystemSettingForm()
@@ -990,7 +1017,6 @@ def admin_settings():
             description=form.description.data
         )
         db.session.add(setting)
-        db.session.commit()
         
         log_activity(current_user.id, 'add_setting', f'Added setting: {form.key.data}')
         flash('Setting added successfully!', 'success')
@@ -1005,14 +1031,37 @@ def admin_settings():
 @login_required
 @admin_required
 def admin_activity_logs():
-    page = request.args.get('page', 1, type=int)
-    activities = UserActivity.query.order_by(UserActivity.created_at.desc()).paginate(
-        page=page, per_page=50, error_out=False)
+    activity.flush()
+    activities = paginate_admin_list(UserActivity.query.options(joinedload(UserActivity.user)), UserActivity, 50)
     
     return render_template('admin_activity_logs.html',
                          title='Activity Logs',
                          activities=activities)
 
+@app.route('/admin/export/<kind>.<fmt>')
+@login_required
+@admin_required
+@unit_of_work
+def admin_export(kind, fmt):
+    if kind not in exports.EXPORTS or fmt not in exports.FORMATS:
+        abort(404)
+    filters = request.args.to_dict()
+    for bound in ('since', 'until'):
+        if filters.get(bound):
+            try:
+                filters[bound] = datetime.strptime(filters[bound], '%Y-%m-%d')
+            except ValueError:
+                abort(400)
+    compress = request.args.get('gzip') == '1'
+    
+    # Rows are read and written a chunk at a time while the response streams
+    response = app.response_class(stream_with_context(exports.stream(kind, fmt, filters, compress)),
+                                  mimetype='application/gzip' if compress else exports.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={exports.filename(kind, fmt, compress)}'
+    
+    log_activity(current_user.id, 'export', f'Exported {kind} as {fmt}')
+    return response
+
 @app.route('/admin/search')
 @login_required
 @admin_required
@@ -1060,33 +1109,30 @@ def admin_search():
 @app.route('/admin/expire-old-items')
 @login_required
 @admin_required
+@commits_in_batches
 def admin_expire_old_items():
-    # Auto-expire items older than 30 days
-    expiry_date = datetime.utcnow() - timedelta(days=30)
-    
-    lost_items = LostItemModel.query.filter(
-        LostItemModel.created_at < expiry_date,
-        LostItemModel.status == 'active'
-    ).all()
-    
-    found_items = FoundItemModel.query.filter(
-        FoundItemModel.created_at < expiry_date,
-        FoundItemModel.status == 'active'
-    ).all()
-    
-    for item in lost_items + found_items:
-        item.status = 'expired'
-        item.updated_at = datetime.utcnow()
+    # Expire items past their expires_at now instead of waiting for the scheduler; each batch commits
+    run = expiry.run_expiry('admin', batch_size=app.config['EXPIRY_BATCH_SIZE'])
     
+    log_activity(current_user.id, 'expire_old_items', f'Expired {run.lost_expired} lost and {run.found_expired} found items')
     db.session.commit()
-    
-    log_activity(current_user.id, 'expire_old_items', f'Expired {len(lost_items)} lost and {len(found_items)} found items')
-    flash(f'Expired {len(lost_items)} lost items and {len(found_items)} found items successfully!', 'success')
+    flash(f'Expired {run.lost_expired} lost items and {run.found_expired} found items successfully!', 'success')
     
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/metrics')
+def metrics_endpoint():
+    # Admins, or a scraper presenting METRICS_TOKEN; 404 when metrics are off
+    if not app.config['METRICS_ENABLED']:
+        abort(404)
+    if not metrics.token_matches(app.config['METRICS_TOKEN'], request.headers.get('Authorization')):
+        if not current_user.is_authenticated or current_user.role != 'admin':
+            abort(403)
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Temporary route to create default users
 @app.route('/create-default-users')
+@unit_of_work
 def create_default_users():
     try:
         # Create admin user
@@ -1095,7 +1141,7 @@ def create_default_users():
             admin_user = User(username='admin', email='admin@example.com', role='admin', is_verified=True)
             admin_user.set_password('admin123')
             db.session.add(admin_user)
-            db.session.commit()
+            db.session.flush()
             admin_created = True
         else:
             admin_created = False
@@ -1106,7 +1152,7 @@ def create_default_users():
             student_user = User(username='22211013', email='student@example.com', role='student', is_verified=True)
             student_user.set_password('password123')
             db.session.add(student_user)
-            db.session.commit()
+            db.session.flush()
             student_created = True
         else:
             student_created = False
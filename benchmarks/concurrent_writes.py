@@ -0,0 +1,145 @@
+"""Write throughput on SQLite with several worker processes, per engine profile.
+
+    python benchmarks/concurrent_writes.py
+    python benchmarks/concurrent_writes.py --scenario report --processes 4 --threads 4 --duration 20
+
+Each profile gets a fresh database in a temporary directory, seeded by dataset.py. Then
+--processes workers (standing in for gunicorn workers) each run --threads threads that
+write in a loop, with --reads browse queries before each write. 'none' is SQLAlchemy's and
+the driver's defaults (rollback journal, synchronous=FULL, 5 s lock wait); 'sqlite' is the
+tuned profile (WAL, synchronous=NORMAL, busy_timeout, mmap and cache size).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(ROOT)
+
+
+def work(threads, duration, start, reads, scenario):
+    sys.path.insert(0, REPO)
+    sys.path.insert(0, ROOT)
+    from sqlalchemy.exc import OperationalError
+    from __init__ import create_app, db
+    from dataset import Generator
+    from models import LostItemModel
+    import expiry
+    import matching
+
+    app = create_app()
+    with app.app_context():
+        item_ids = [item_id for (item_id,) in db.session.query(LostItemModel.id)]
+    results = {'commits': 0, 'locked': 0, 'errors': 0, 'reads': 0, 'latencies': []}
+    lock = threading.Lock()
+
+    def run(seed):
+        generator = Generator(random.Random(seed), 30)
+        with app.app_context():
+            while time.time() < start:
+                time.sleep(0.01)
+            while time.time() < start + duration:
+                for _ in range(reads):
+                    LostItemModel.query.filter_by(status='active').order_by(
+                        LostItemModel.created_at.desc()).limit(20).all()
+                    db.session.rollback()
+                    with lock:
+                        results['reads'] += 1
+                began = time.perf_counter()
+                try:
+                    if scenario == 'report':
+                        row = generator.item('lost')
+                        row.update(status='active', is_verified=False, created_at=None, updated_at=None)
+                        del row['expires_at']
+                        item = LostItemModel(**row)
+                        expiry.stamp(item)
+                        db.session.add(item)
+                        db.session.flush()
+                        matching.index_item('lost', item)
+                    else:
+                        item = db.session.get(LostItemModel, generator.rng.choice(item_ids))
+                        item.is_verified = not item.is_verified
+                    db.session.commit()
+                except OperationalError as error:
+                    db.session.rollback()
+                    with lock:
+                        results['locked' if 'locked' in str(error) else 'errors'] += 1
+                    continue
+                with lock:
+                    results['commits'] += 1
+                    results['latencies'].append(time.perf_counter() - began)
+
+    workers = [threading.Thread(target=run, args=(os.getpid() * 100 + index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    print(json.dumps(results))
+
+
+def measure(profile, args):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(directory, "bench.db")}',
+                   DB_PROFILE=profile, UPLOAD_FOLDER=os.path.join(directory, 'uploads'),
+                   SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmark'), EXPIRY_INTERVAL='0')
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=REPO, env=env,
+                       check=True, capture_output=True)
+        subprocess.run([sys.executable, os.path.join(ROOT, 'dataset.py'), '--users', '10', '--admins', '1',
+                        '--items', str(args.items), '--activity', '0', '--seed', '1'],
+                       cwd=REPO, env=env, check=True, capture_output=True)
+        # Workers boot first, then all start writing at the same moment
+        start = time.time() + 5
+        command = [sys.executable, __file__, '--worker', '--threads', str(args.threads),
+                   '--duration', str(args.duration), '--start', str(start), '--reads', str(args.reads),
+                   '--scenario', args.scenario]
+        processes = [subprocess.Popen(command, cwd=REPO, env=env, stdout=subprocess.PIPE, text=True)
+                     for _ in range(args.processes)]
+        total = {'commits': 0, 'locked': 0, 'errors': 0, 'reads': 0, 'latencies': []}
+        for process in processes:
+            output, _ = process.communicate()
+            if process.returncode:
+                raise SystemExit(f'worker exited with {process.returncode}')
+            for key, value in json.loads(output.strip().splitlines()[-1]).items():
+                total[key] += value
+        return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', default=['none', 'sqlite'], choices=['none', 'sqlite'])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=1, help='Threads per process')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds of writing per profile')
+    parser.add_argument('--scenario', choices=['report', 'verify'], default='verify',
+                        help='report: the report view\'s insert and match indexing; verify: a one-row update')
+    parser.add_argument('--reads', type=int, default=4, help='Browse queries before each write')
+    parser.add_argument('--items', type=int, default=2000, help='Items in the seeded database')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--start', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        work(args.threads, args.duration, args.start, args.reads, args.scenario)
+        return
+
+    print(f'{args.scenario}: {args.processes} processes x {args.threads} threads, {args.duration:.0f}s per profile')
+    print(f'{"profile":<8} {"commits":>8} {"commits/s":>10} {"reads/s":>8} {"locked":>7} {"errors":>7} '
+          f'{"p50 ms":>7} {"p95 ms":>7}')
+    for profile in args.profiles:
+        result = measure(profile, args)
+        latencies = sorted(result['latencies']) or [0.0]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f'{profile:<8} {result["commits"]:>8} {result["commits"] / args.duration:>10.1f} '
+              f'{result["reads"] / args.duration:>8.1f} {result["locked"]:>7} {result["errors"]:>7} '
+              f'{statistics.median(latencies) * 1000:>7.1f} {p95 * 1000:>7.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""Fill the configured database with a synthetic campus-scale dataset for load testing.
+
+    python benchmarks/dataset.py --users 5000 --items 500000
+    python benchmarks/dataset.py --items 20000 --no-match-index --seed 7
+
+Users are named loadtest<letters> (admins loadtestadmin<letters>) and share one password.
+Rows are bulk inserted; the counters, home snapshot, statistics rollups and (unless
+--no-match-index) the match index are rebuilt afterwards.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from __init__ import create_app, db
+from forms import FoundItem, LostItem
+from models import User, LostItemModel, FoundItemModel, ClaimModel, ClaimHistory, UserActivity
+
+USER_PREFIX = 'loadtest'
+ADMIN_PREFIX = 'loadtestadmin'
+RETENTION_DAYS = 30
+
+# Roughly what a front desk sees: phones and cards far more often than sports kit
+CATEGORY_WEIGHTS = {'electronics': 30, 'personal_items': 25, 'bags': 12, 'books': 10,
+                    'clothing': 10, 'jewelry': 4, 'sports': 4, 'other': 5}
+LOCATION_WEIGHTS = {'library_steve_biko': 45, 'library_ml_sultan': 30, 'it_labs_ritson': 25}
+CURRENT_LOCATION_WEIGHTS = {'department_office': 40, 'library_information_desk': 45, 'i_have_it_with_me': 15}
+NOUNS = {
+    'electronics': ['phone', 'laptop', 'charger', 'earphones', 'calculator', 'tablet', 'power bank', 'usb drive'],
+    'personal_items': ['wallet', 'student card', 'keys', 'glasses', 'umbrella', 'water bottle', 'id book'],
+    'bags': ['backpack', 'laptop bag', 'handbag', 'tote bag', 'pencil case'],
+    'books': ['textbook', 'notebook', 'lab manual', 'novel', 'study guide'],
+    'clothing': ['hoodie', 'jacket', 'scarf', 'cap', 'jersey'],
+    'jewelry': ['ring', 'necklace', 'bracelet', 'watch', 'earrings'],
+    'sports': ['soccer ball', 'gym bag', 'tennis racket', 'running shoes'],
+    'other': ['lunch box', 'flash cards', 'headphones case', 'mug'],
+}
+COLOURS = ['black', 'white', 'blue', 'red', 'grey', 'silver', 'green', 'brown', 'pink', 'gold']
+BRANDS = ['samsung', 'apple', 'huawei', 'hp', 'lenovo', 'casio', 'nike', 'adidas', 'puma', 'jbl']
+DETAILS = ['with a cracked screen', 'with stickers on the back', 'in a leather cover', 'with my name inside',
+           'with a keyring attached', 'with a torn strap', 'with notes for my exams', 'with a blue case']
+FIRST_NAMES = ['Thandiwe', 'Sipho', 'Ayanda', 'Lerato', 'Kagiso', 'Naledi', 'Priya', 'Ravi', 'Zanele',
+               'Lwazi', 'Aisha', 'Johan', 'Nomvula', 'Themba', 'Fatima', 'Kyle', 'Busisiwe', 'Mandla']
+LAST_NAMES = ['Dlamini', 'Naidoo', 'Mokoena', 'Nkosi', 'Pillay', 'Botha', 'Khumalo', 'Mthembu',
+              'Govender', 'van der Merwe', 'Zulu', 'Ndlovu', 'Moodley', 'Ngcobo']
+ACTION_WEIGHTS = {'login': 45, 'logout': 20, 'report_lost_item': 10, 'report_found_item': 8,
+                  'submit_claim': 7, 'update_profile': 5, 'change_password': 2, 'register': 3}
+
+
+def _choices(field):
+    """Real option values of a report form SelectField, without the placeholder"""
+    return {value for value, _ in field.kwargs['choices'] if value and not value.startswith('select_')}
+
+
+def _check_vocabulary():
+    # The generator must only use values the report forms accept
+    assert set(CATEGORY_WEIGHTS) == _choices(FoundItem.category) == _choices(LostItem.category)
+    assert set(LOCATION_WEIGHTS) == _choices(FoundItem.location)
+    assert set(CURRENT_LOCATION_WEIGHTS) == _choices(FoundItem.current_location)
+
+
+def letters(n):
+    """0 -> 'a', 25 -> 'z', 26 -> 'ba': usernames must be alphabetic"""
+    word = ''
+    while True:
+        n, remainder = divmod(n, 26)
+        word = string.ascii_lowercase[remainder] + word
+        if not n:
+            return word
+
+
+class Generator:
+    def __init__(self, rng, days):
+        self.rng = rng
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.start = self.now - timedelta(days=days)
+        self.days = days
+        self.categories, self.category_weights = zip(*CATEGORY_WEIGHTS.items())
+        self.locations, self.location_weights = zip(*LOCATION_WEIGHTS.items())
+        self.current_locations, self.current_location_weights = zip(*CURRENT_LOCATION_WEIGHTS.items())
+        self.actions, self.action_weights = zip(*ACTION_WEIGHTS.items())
+
+    def timestamp(self, after=None):
+        """Mostly weekdays during lecture hours, uniform over the period otherwise"""
+        rng = self.rng
+        while True:
+            moment = self.start + timedelta(days=rng.randrange(self.days))
+            if moment.weekday() < 5 or rng.random() < 0.3:
+                break
+        hour = min(max(int(rng.gauss(12.5, 3)), 6), 22)
+        moment = moment.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        if after is not None and moment <= after:
+            moment = after + timedelta(hours=rng.expovariate(1 / 36))
+        return min(moment, self.now)
+
+    def person(self):
+        rng = self.rng
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        number = str(rng.randrange(20000000, 23999999))
+        return {'full_names': f'{first} {last}', 'student_number': number,
+                'student_email': f'{number}@dut4life.ac.za'}
+
+    def item(self, item_type):
+        rng = self.rng
+        category = rng.choices(self.categories, self.category_weights)[0]
+        noun = rng.choice(NOUNS[category])
+        colour = rng.choice(COLOURS)
+        name = f'{colour} {rng.choice(BRANDS)} {noun}' if rng.random() < 0.4 else f'{colour} {noun}'
+        created_at = self.timestamp()
+        expires_at = created_at + timedelta(days=RETENTION_DAYS)
+        if expires_at < self.now:
+            status = rng.choices(['expired', 'claimed', 'returned', 'active'], [60, 20, 15, 5])[0]
+        else:
+            status = rng.choices(['active', 'claimed', 'returned'], [80, 12, 8])[0]
+        if item_type == 'lost' and status == 'returned':
+            status = 'claimed'
+        row = {
+            'item_name': name[:50], 'category': category,
+            'description': f'{colour.capitalize()} {noun} {rng.choice(DETAILS)}. '
+                           f'Last seen around {created_at:%H:%M} near the {rng.choice(["entrance", "study area", "printers", "lockers", "cafeteria"])}.',
+            'location': rng.choices(self.locations, self.location_weights)[0],
+            'photo_filename': None, 'status': status, 'is_verified': rng.random() < 0.3,
+            'created_at': created_at, 'updated_at': created_at, 'expires_at': expires_at,
+            'expired_at': expires_at if status == 'expired' else None,
+            **self.person(),
+        }
+        if item_type == 'found':
+            row['current_location'] = rng.choices(self.current_locations, self.current_location_weights)[0]
+        return row
+
+    def claim(self, item_type, item_id, item_created_at):
+        rng = self.rng
+        created_at = self.timestamp(after=item_created_at)
+        status = 'pending' if (self.now - created_at).days < 3 else rng.choices(
+            ['approved', 'rejected', 'pending'], [60, 30, 10])[0]
+        resolved_at = None
+        if status != 'pending':
+            resolved_at = min(created_at + timedelta(hours=rng.expovariate(1 / 30)), self.now)
+        return {
+            'description': f'This is mine, it has {rng.choice(DETAILS)[5:]}.',
+            'status': status, 'item_type': item_type, 'item_id': item_id,
+            'admin_notes': None if status == 'pending' else rng.choice(['Verified student card', 'Could not verify', None]),
+            'created_at': created_at, 'updated_at': resolved_at or created_at, 'resolved_at': resolved_at,
+            **self.person(),
+        }
+
+    def activity(self, user_ids):
+        rng = self.rng
+        return {'user_id': rng.choice(user_ids), 'action': rng.choices(self.actions, self.action_weights)[0],
+                'details': None, 'ip_address': f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                'created_at': self.timestamp()}
+
+
+def _insert(table, rows):
+    if rows:
+        with db.engine.begin() as conn:
+            conn.execute(table.insert(), rows)
+
+
+def _progress(label, done, total, started):
+    print(f'\r  {label}: {done}/{total} ({done / max(time.perf_counter() - started, 1e-6):.0f} rows/s)',
+          end='\n' if done >= total else '', flush=True)
+
+
+def create_users(generator, students, admins, password, method):
+    password_hash = generate_password_hash(password, method=method)
+    offset = User.query.filter(User.username.like(f'{USER_PREFIX}%')).count()
+    rows = []
+    for n in range(offset, offset + students + admins):
+        admin = n - offset >= students
+        username = (ADMIN_PREFIX if admin else USER_PREFIX) + letters(n)
+        rows.append({'username': username, 'email': f'{username}@loadtest.example', 'password_hash': password_hash,
+                     'role': 'admin' if admin else 'student', 'is_verified': True, 'is_banned': False,
+                     'created_at': generator.timestamp()})
+    _insert(User.__table__, rows)
+    return [row[0] for row in db.session.query(User.id).filter(User.username.like(f'{USER_PREFIX}%'))]
+
+
+def create_items(generator, item_type, count, claim_ratio, chunk_size):
+    model = LostItemModel if item_type == 'lost' else FoundItemModel
+    claims = 0
+    started = time.perf_counter()
+    for done in range(0, count, chunk_size):
+        last_id = db.session.query(db.func.max(model.id)).scalar() or 0
+        _insert(model.__table__, [generator.item(item_type) for _ in range(min(chunk_size, count - done))])
+        # Claims for the rows just inserted, a chunk at a time
+        new_items = db.session.query(model.id, model.created_at).filter(model.id > last_id).all()
+        claim_rows = [generator.claim(item_type, item_id, created_at) for item_id, created_at in new_items
+                      if generator.rng.random() < claim_ratio]
+        if claim_rows:
+            last_claim = db.session.query(db.func.max(ClaimModel.id)).scalar() or 0
+            _insert(ClaimModel.__table__, claim_rows)
+            history = []
+            for claim_id, status, created_at, resolved_at in db.session.query(
+                ClaimModel.id, ClaimModel.status, ClaimModel.created_at, ClaimModel.resolved_at
+            ).filter(ClaimModel.id > last_claim):
+                history.append({'claim_id': claim_id, 'action': 'created', 'admin_id': None,
+                                'notes': 'Claim submitted', 'created_at': created_at})
+                if resolved_at:
+                    history.append({'claim_id': claim_id, 'action': status, 'admin_id': None,
+                                    'notes': None, 'created_at': resolved_at})
+            _insert(ClaimHistory.__table__, history)
+            claims += len(claim_rows)
+        db.session.rollback()  # end the read transaction between chunks
+        _progress(f'{item_type} items', done + len(new_items), count, started)
+    return claims
+
+
+def create_activity(generator, user_ids, count, chunk_size):
+    started = time.perf_counter()
+    for done in range(0, count, chunk_size):
+        _insert(UserActivity.__table__, [generator.activity(user_ids) for _ in range(min(chunk_size, count - done))])
+        _progress('activity', min(done + chunk_size, count), count, started)
+
+
+def refresh_derived(generator, match_index):
+    import counters
+    import rollups
+    import snapshots
+    with db.engine.begin() as conn:
+        counters.rebuild(conn)
+        snapshots.bump(conn, [snapshots.HOME_RECENT_ITEMS])
+    print(f'  rolled up {rollups.roll_up(since=generator.start.date())} days of statistics')
+    if match_index:
+        import matching
+        started = time.perf_counter()
+        stored = matching.rebuild_index(progress=lambda item_type, n: print(
+            f'\r  match index: {n} candidates ({item_type} pass)', end='', flush=True))
+        print(f'\r  match index: {stored} candidates in {time.perf_counter() - started:.0f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000, help='Student accounts')
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--items', type=int, default=50000, help='Lost plus found items')
+    parser.add_argument('--found-share', type=float, default=0.6, help='Fraction of the items that are found items')
+    parser.add_argument('--claim-ratio', type=float, default=0.25, help='Claims per item')
+    parser.add_argument('--activity', type=int, default=100000, help='Activity log rows')
+    parser.add_argument('--days', type=int, default=365, help='Period the rows are spread over')
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per executemany')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--no-match-index', dest='match_index', action='store_false',
+                        help='Skip rebuilding the match index (the slowest step); run flask match-reindex later')
+    args = parser.parse_args()
+
+    _check_vocabulary()
+    app = create_app()
+    generator = Generator(random.Random(args.seed), args.days)
+    started = time.perf_counter()
+    with app.app_context():
+        user_ids = create_users(generator, args.users, args.admins, args.password, app.config['PASSWORD_HASH_METHOD'])
+        print(f'  users: {args.users} students, {args.admins} admins (password {args.password!r})')
+        found = round(args.items * args.found_share)
+        claims = create_items(generator, 'found', found, args.claim_ratio, args.chunk_size)
+        claims += create_items(generator, 'lost', args.items - found, args.claim_ratio, args.chunk_size)
+        print(f'  claims: {claims}')
+        create_activity(generator, user_ids, args.activity, args.chunk_size)
+        refresh_derived(generator, args.match_index)
+    print(f'Done in {time.perf_counter() - started:.0f}s')
+
+
+if __name__ == '__main__':
+    main()
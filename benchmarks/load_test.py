@@ -0,0 +1,320 @@
+"""Latency percentiles and throughput of the real app under concurrent simulated users.
+
+    python benchmarks/dataset.py --items 500000          # once, to have something to browse
+    python benchmarks/load_test.py --users 200 --duration 60
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --users 50 --scenarios home search detail
+
+Without --url the app is started locally (gunicorn when installed, otherwise Werkzeug's
+threaded server) on the configured database. Virtual users log in as the accounts made by
+dataset.py; report and claim scenarios write real rows.
+"""
+import argparse
+import http.cookiejar
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dataset import ADMIN_PREFIX, USER_PREFIX, CATEGORY_WEIGHTS, NOUNS, COLOURS, Generator, letters
+
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+ITEM_LINK = re.compile(r'/item/(lost|found)/(\d+)')
+# 1x1 GIF for report uploads; each upload gets a unique trailer, like real photos would differ
+PHOTO = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+         b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+
+# Relative frequency of each scenario for students; admins run the admin scenarios
+STUDENT_MIX = {'home': 25, 'browse': 25, 'search': 20, 'detail': 20, 'report': 5, 'claim': 5}
+ADMIN_MIX = {'admin_dashboard': 30, 'admin_items': 30, 'admin_claims': 25, 'admin_activity': 10, 'admin_statistics': 5}
+
+
+class Client:
+    """One virtual user's cookie-keeping HTTP session"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, data=None, files=None):
+        """(status, body); redirects are followed like a browser would"""
+        headers = {}
+        if files:
+            boundary = uuid.uuid4().hex
+            data = _multipart(boundary, data, files)
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        elif data is not None:
+            data = urllib.parse.urlencode(data).encode()
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+    def csrf_token(self, path):
+        status, body = self.request(path)
+        match = CSRF_TOKEN.search(body)
+        return match.group(1) if match else ''
+
+
+def _multipart(boundary, fields, files):
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+    return b''.join(parts) + f'--{boundary}--\r\n'.encode()
+
+
+class VirtualUser:
+    def __init__(self, base_url, username, password, mix, item_ids, rng):
+        self.client = Client(base_url)
+        self.username = username
+        self.password = password
+        self.scenarios, self.weights = zip(*mix.items())
+        self.item_ids = item_ids
+        self.rng = rng
+        self.generator = Generator(rng, 1)
+
+    def login(self):
+        token = self.client.csrf_token('/login')
+        status, body = self.client.request('/login', {'csrf_token': token, 'username': self.username,
+                                                      'password': self.password})
+        return status == 200 and 'Invalid username or password' not in body
+
+    def run_one(self):
+        """Run one scenario: (name, seconds, ok)"""
+        name = self.rng.choices(self.scenarios, self.weights)[0]
+        started = time.perf_counter()
+        status = getattr(self, name)()
+        return name, time.perf_counter() - started, status < 400
+
+    def _search_term(self):
+        category = self.rng.choice(list(CATEGORY_WEIGHTS))
+        return category, self.rng.choice([self.rng.choice(NOUNS[category]), self.rng.choice(COLOURS)])
+
+    def _item(self):
+        item_type = self.rng.choice(['lost', 'found'])
+        first, last = self.item_ids[item_type]
+        return item_type, self.rng.randint(first, last)
+
+    def home(self):
+        return self.client.request('/')[0]
+
+    def browse(self):
+        item_type = self.rng.choice(['lost', 'found'])
+        category = self.rng.choice(['all', 'all'] + list(CATEGORY_WEIGHTS))
+        page = self.rng.choice([1, 1, 1, 2, 3])
+        return self.client.request(f'/{item_type}-items?category={category}&page={page}')[0]
+
+    def search(self):
+        category, term = self._search_term()
+        query = urllib.parse.urlencode({'query': term, 'category': self.rng.choice(['all', category]),
+                                        'item_type': self.rng.choice(['all', 'lost', 'found'])})
+        return self.client.request(f'/search?{query}')[0]
+
+    def detail(self):
+        item_type, item_id = self._item()
+        status = self.client.request(f'/item/{item_type}/{item_id}')[0]
+        return 200 if status == 404 else status  # gaps in the id range are not failures
+
+    def report(self):
+        item_type = self.rng.choice(['lost', 'found'])
+        path = f'/report-{item_type}-item'
+        values = self.generator.item(item_type)
+        fields = {name: values[name] for name in ('item_name', 'category', 'description', 'location',
+                                                  'full_names', 'student_number', 'student_email')}
+        if item_type == 'found':
+            fields['current_location'] = values['current_location']
+        fields['csrf_token'] = self.client.csrf_token(path)
+        return self.client.request(path, fields, {'photo': ('photo.gif', PHOTO + uuid.uuid4().bytes)})[0]
+
+    def claim(self):
+        item_type, item_id = self._item()
+        path = f'/claim?item_type={item_type}&item_id={item_id}'
+        fields = dict(self.generator.person(), description='I think this is mine.', item_type=item_type,
+                      item_id=item_id, csrf_token=self.client.csrf_token(path))
+        return self.client.request('/claim', fields)[0]
+
+    def admin_dashboard(self):
+        return self.client.request('/admin_dashboard')[0]
+
+    def admin_items(self):
+        item_type = self.rng.choice(['lost', 'found'])
+        status = self.rng.choice(['all', 'active', 'expired'])
+        return self.client.request(f'/admin/{item_type}-items?status={status}')[0]
+
+    def admin_claims(self):
+        return self.client.request(f'/admin/claims?status={self.rng.choice(["all", "pending"])}')[0]
+
+    def admin_activity(self):
+        return self.client.request('/admin/activity-logs')[0]
+
+    def admin_statistics(self):
+        return self.client.request('/admin/statistics')[0]
+
+
+def item_id_ranges(base_url):
+    """Lowest and highest item ids of each kind, read off the first and last browse pages"""
+    client = Client(base_url)
+    ranges = {}
+    for item_type in ('lost', 'found'):
+        ids = [int(item_id) for kind, item_id in ITEM_LINK.findall(client.request(f'/{item_type}-items')[1])
+               if kind == item_type]
+        ranges[item_type] = (1, max(ids)) if ids else (1, 1)
+    return ranges
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, workers, threads):
+    port = _free_port()
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-c', 'import logging; logging.getLogger("werkzeug").setLevel(logging.ERROR); '
+                   f'from app import app; app.run(port={port}, threaded=True)']
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f'{server} exited with status {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit(f'{server} did not start listening within 60s')
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(results, errors, elapsed):
+    print(f'{"scenario":<18} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    everything = []
+    for name in sorted(results):
+        timings = sorted(results[name])
+        everything.extend(timings)
+        print(f'{name:<18} {len(timings):>9} {errors[name]:>7} {len(timings) / elapsed:>8.1f} '
+              f'{1000 * percentile(timings, 0.5):>8.1f} {1000 * percentile(timings, 0.95):>8.1f} '
+              f'{1000 * percentile(timings, 0.99):>8.1f}')
+    everything.sort()
+    print(f'{"all":<18} {len(everything):>9} {sum(errors.values()):>7} {len(everything) / elapsed:>8.1f} '
+          f'{1000 * percentile(everything, 0.5):>8.1f} {1000 * percentile(everything, 0.95):>8.1f} '
+          f'{1000 * percentile(everything, 0.99):>8.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=None, help='Test a running server instead of starting one')
+    parser.add_argument('--server', choices=['gunicorn', 'werkzeug'], default=None)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--users', type=int, default=50, help='Concurrent virtual users')
+    parser.add_argument('--admin-share', type=float, default=0.05, help='Fraction of the users that are admins')
+    parser.add_argument('--accounts', type=int, default=2000, help='Student accounts created by dataset.py')
+    parser.add_argument('--admin-accounts', type=int, default=5)
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds measured, after the warm-up')
+    parser.add_argument('--warmup', type=float, default=5.0)
+    parser.add_argument('--think-time', type=float, default=0.0, help='Mean pause between a user\'s requests')
+    parser.add_argument('--scenarios', nargs='+', default=None, help='Only run these scenarios')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        server = args.server
+        if server is None:
+            try:
+                import gunicorn  # noqa: F401
+                server = 'gunicorn'
+            except ImportError:
+                server = 'werkzeug'
+        process, base_url = start_server(server, args.workers, args.threads)
+        print(f'Started {server} at {base_url}')
+
+    rng = random.Random(args.seed)
+    student_mix, admin_mix = STUDENT_MIX, ADMIN_MIX
+    if args.scenarios:
+        student_mix = {name: weight for name, weight in STUDENT_MIX.items() if name in args.scenarios}
+        admin_mix = {name: weight for name, weight in ADMIN_MIX.items() if name in args.scenarios}
+    admins = round(args.users * args.admin_share) if admin_mix else 0
+    if not student_mix:
+        admins = args.users
+
+    results = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    measuring = threading.Event()
+    stopping = threading.Event()
+
+    def run(number, admin):
+        if admin:
+            username = ADMIN_PREFIX + letters(args.accounts + number % args.admin_accounts)
+        else:
+            username = USER_PREFIX + letters(number % args.accounts)
+        user = VirtualUser(base_url, username, args.password, admin_mix if admin else student_mix,
+                           item_ids, random.Random(rng.random()))
+        if not user.login():
+            print(f'  login failed for {username}; run dataset.py first', file=sys.stderr)
+            return
+        while not stopping.is_set():
+            name, seconds, ok = user.run_one()
+            if measuring.is_set():
+                with lock:
+                    results[name].append(seconds)
+                    errors[name] += not ok
+            if args.think_time:
+                time.sleep(user.rng.expovariate(1 / args.think_time))
+
+    try:
+        item_ids = item_id_ranges(base_url)
+        threads = [threading.Thread(target=run, args=(number, number < admins), daemon=True)
+                   for number in range(args.users)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.warmup)
+        measuring.set()
+        started = time.perf_counter()
+        time.sleep(args.duration)
+        measuring.clear()
+        elapsed = time.perf_counter() - started
+        stopping.set()
+        for thread in threads:
+            thread.join(timeout=60)
+        print(f'{args.users} users ({admins} admins), {elapsed:.0f}s measured after {args.warmup:.0f}s warm-up')
+        report(results, errors, elapsed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Login throughput (password verifications per second) for hash methods and pool sizes.
+
+    python benchmarks/password_hashing.py
+    python benchmarks/password_hashing.py --methods scrypt:16384:8:1 pbkdf2:sha256:600000 --workers 1 2 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from passwords import _verify
+
+DEFAULT_METHODS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000']
+
+
+def measure(password_hash, workers, seconds):
+    """Verifications completed per second with `workers` processes kept busy"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Warm the pool so process start-up is not counted
+        list(pool.map(_verify, [password_hash] * workers, ['password'] * workers))
+        done = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            batch = workers * 4
+            done += sum(1 for _ in pool.map(_verify, [password_hash] * batch, ['password'] * batch))
+        return done / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', nargs='+', default=DEFAULT_METHODS)
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument('--seconds', type=float, default=3.0, help='Time spent on each measurement')
+    args = parser.parse_args()
+
+    print(f'{"method":<24} {"workers":>7} {"logins/s":>10} {"per core":>10} {"latency ms":>11}')
+    for method in args.methods:
+        password_hash = generate_password_hash('password', method=method)
+        for workers in args.workers:
+            rate = measure(password_hash, workers, args.seconds)
+            print(f'{method:<24} {workers:>7} {rate:>10.1f} {rate / workers:>10.1f} {1000 * workers / rate:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
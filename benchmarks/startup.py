@@ -0,0 +1,73 @@
+"""Worker boot time: interpreter start, imports, create_app() and importing app.py, in fresh processes.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 20
+
+Also counts the SQL statements run while booting, which should be none: schema setup
+and seeding belong to `flask init-db`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter for every measurement
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+sqlalchemy_done = time.perf_counter()
+from __init__ import create_app
+import commands, models
+imports_done = time.perf_counter()
+create_app()
+create_done = time.perf_counter()
+import app
+app_done = time.perf_counter()
+print(json.dumps({
+    'sqlalchemy import': sqlalchemy_done - started,
+    'app module imports': imports_done - sqlalchemy_done,
+    'create_app()': create_done - imports_done,
+    'import app.py': app_done - create_done,
+    'statements': len(statements),
+}))
+'''
+
+
+def measure():
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD, ROOT], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    total = time.perf_counter() - started
+    result = json.loads(output.strip().splitlines()[-1])
+    result['interpreter + exit'] = total - sum(value for name, value in result.items() if name != 'statements')
+    result['total'] = total
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    measure()  # warm the filesystem and bytecode caches
+    runs = [measure() for _ in range(args.runs)]
+    print(f'{"phase":<22} {"median ms":>10} {"min ms":>8} {"max ms":>8}')
+    for phase in ('interpreter + exit', 'sqlalchemy import', 'app module imports', 'create_app()',
+                  'import app.py', 'total'):
+        values = [run[phase] * 1000 for run in runs]
+        print(f'{phase:<22} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}')
+    print(f'SQL statements while booting: {max(run["statements"] for run in runs)}')
+
+
+if __name__ == '__main__':
+    main()
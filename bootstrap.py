@@ -0,0 +1,54 @@
+from sqlalchemy.exc import IntegrityError
+from __init__ import db
+from migrations import upgrade
+from models import User, Category, Location, SystemSetting
+
+DEFAULT_CATEGORIES = ['Electronics', 'Bags', 'Books', 'Personal Items', 'Clothing', 'Jewelry', 'Sports', 'Other']
+DEFAULT_LOCATIONS = ['Library(Steve Biko)', 'Library(M.L. Sultan)', 'IT Labs(Ritson)',
+                     'Department Office', 'Library Information Desk']
+DEFAULT_SETTINGS = [
+    ('item_expiry_days', '30', 'Number of days before items expire'),
+    ('max_photo_size', '5242880', 'Maximum photo file size in bytes'),
+    ('allowed_photo_types', 'jpg,jpeg,png,gif', 'Allowed photo file types'),
+    ('site_name', 'Lost and Found Portal', 'Site display name'),
+    ('contact_email', 'admin@example.com', 'Contact email for support'),
+]
+
+
+def create_schema():
+    """Create missing tables, then apply pending migrations; returns the migrations applied"""
+    db.create_all()
+    return upgrade(db.engine)
+
+
+def ensure_user(username, email, password, role='student'):
+    """Create a verified user unless the username is taken; True when created
+
+    Safe to run from several processes at once: the loser of a race on the
+    unique username rolls back instead of failing.
+    """
+    if User.query.filter_by(username=username).first():
+        return False
+    user = User(username=username, email=email, role=role, is_verified=True)
+    user.set_password(password)
+    db.session.add(user)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+def seed_defaults():
+    """Add the default categories, locations and system settings that are missing"""
+    for name in DEFAULT_CATEGORIES:
+        if not Category.query.filter_by(name=name).first():
+            db.session.add(Category(name=name, description=f'Default category for {name.lower()}'))
+    for name in DEFAULT_LOCATIONS:
+        if not Location.query.filter_by(name=name).first():
+            db.session.add(Location(name=name, description=f'Default location: {name}'))
+    for key, value, description in DEFAULT_SETTINGS:
+        if not SystemSetting.query.filter_by(key=key).first():
+            db.session.add(SystemSetting(key=key, value=value, description=description))
+    db.session.commit()
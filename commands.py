@@ -0,0 +1,159 @@
+import click
+from __init__ import db
+
+
+def register_commands(app):
+    @app.cli.command('db-upgrade')
+    @click.option('--target', type=int, default=None, help='Stop after this migration version.')
+    def db_upgrade(target):
+        """Apply pending schema migrations without touching existing data."""
+        from migrations import upgrade, current_version
+        applied = upgrade(db.engine, target=target)
+        for version, name in applied:
+            click.echo(f'Applied migration {version:04d}: {name}')
+        click.echo(f'Database is at version {current_version(db.engine)}')
+
+    @app.cli.command('init-db')
+    @click.option('--admin-password', default='admin123', show_default=True,
+                  help='Password for the admin account if it has to be created.')
+    def init_db(admin_password):
+        """Create the schema, apply migrations and seed the admin account and defaults (run once per deploy)."""
+        import bootstrap
+        for version, name in bootstrap.create_schema():
+            click.echo(f'Applied migration {version:04d}: {name}')
+        if bootstrap.ensure_user('admin', 'admin@example.com', admin_password, role='admin'):
+            click.echo("Created admin user 'admin'")
+        bootstrap.seed_defaults()
+        click.echo('Database is ready')
+
+    @app.cli.command('match-reindex')
+    @click.option('--batch-size', type=int, default=500, show_default=True)
+    def match_reindex(batch_size):
+        """Rebuild the lost/found match index and candidates from scratch."""
+        from matching import rebuild_index
+        stored = rebuild_index(batch_size=batch_size,
+                               progress=lambda item_type, n: click.echo(f'  {n} candidates stored ({item_type} pass)'))
+        click.echo(f'Stored {stored} match candidates')
+
+    @app.cli.command('photos-backfill')
+    @click.option('--workers', type=int, default=4, show_default=True)
+    def photos_backfill(workers):
+        """Generate missing renditions for every existing upload."""
+        import os
+        from concurrent.futures import ThreadPoolExecutor
+        from images import RENDITION_DIR, generate_renditions
+        upload_folder = app.config['UPLOAD_FOLDER']
+        filenames = []
+        for root, dirs, files in os.walk(upload_folder):
+            if root == upload_folder and RENDITION_DIR in dirs:
+                dirs.remove(RENDITION_DIR)
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                filenames.append(os.path.relpath(os.path.join(root, name), upload_folder))
+
+        def render(filename):
+            try:
+                return filename, generate_renditions(upload_folder, filename), None
+            except Exception as e:
+                return filename, [], e
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for filename, written, error in pool.map(render, filenames):
+                if error:
+                    click.echo(f'{filename}: failed ({error})')
+                elif written:
+                    click.echo(f'{filename}: {", ".join(written)}')
+        click.echo(f'Checked {len(filenames)} uploads')
+
+    @app.cli.command('counters-reconcile')
+    def counters_reconcile():
+        """Recount the dashboard counters from the item and claim tables."""
+        import counters
+        with db.engine.begin() as conn:
+            counters.rebuild(conn)
+        click.echo('Counters rebuilt')
+
+    @app.cli.command('expire-items')
+    @click.option('--batch-size', type=int, default=500, show_default=True)
+    @click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+    def expire_items(batch_size, max_batches):
+        """Expire active items past their expires_at, a batch at a time."""
+        from expiry import run_expiry
+        run = run_expiry('cli', batch_size=batch_size, max_batches=max_batches)
+        click.echo(f'Expired {run.lost_expired} lost and {run.found_expired} found items, '
+                   f'stamped {run.stamped} in {run.batches} batches ({run.duration_ms} ms)')
+
+    @app.cli.command('stats-rollup')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Recompute the rollups from this day on.')
+    def stats_rollup(since):
+        """Roll up daily statistics for every day not rolled up yet."""
+        from rollups import roll_up
+        days = roll_up(since=since.date() if since else None)
+        click.echo(f'Rolled up {days} days')
+
+    @app.cli.command('metrics-reset')
+    def metrics_reset():
+        """Clear the request metrics saved by every worker."""
+        import metrics
+        if not app.config['METRICS_ENABLED']:
+            click.echo('Metrics are disabled (METRICS_ENABLED)')
+            return
+        metrics.reset()
+        click.echo('Metrics cleared')
+
+    @app.cli.command('import-items')
+    @click.argument('kind', type=click.Choice(['lost', 'found']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+                  help='Input format (default: from the file extension).')
+    @click.option('--photos', type=click.Path(exists=True, file_okay=False), default=None,
+                  help='Directory the photo_filename column is relative to.')
+    @click.option('--chunk-size', type=int, default=1000, show_default=True, help='Rows per insert and commit.')
+    @click.option('--dry-run', is_flag=True, help='Validate the rows without importing them.')
+    def import_items(kind, path, fmt, photos, chunk_size, dry_run):
+        """Bulk import lost or found items from CSV or NDJSON, validated like the report forms."""
+        import imports
+        verb = 'validated' if dry_run else 'imported'
+        summary = imports.import_items(
+            kind, path, fmt=fmt, photo_dir=photos, chunk_size=chunk_size, dry_run=dry_run,
+            progress=lambda n, seconds: click.echo(f'  {n} rows {verb} ({n / max(seconds, 1e-6):.0f} rows/s)'),
+            rejected=lambda line, errors: click.echo(f'  line {line}: {", ".join(errors)}', err=True))
+        rate = summary['imported'] / max(summary['seconds'], 1e-6)
+        click.echo(f'{summary["imported"]} of {summary["read"]} rows {verb}, {summary["rejected"]} rejected, '
+                   f'in {summary["seconds"]:.1f}s ({rate:.0f} rows/s)')
+
+    @app.cli.command('export')
+    @click.argument('kind', type=click.Choice(['lost', 'found', 'claims', 'activity']))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+    @click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+    @click.option('--output', '-o', type=click.Path(dir_okay=False), default=None, help='File to write (default stdout).')
+    @click.option('--status', default=None)
+    @click.option('--category', default=None)
+    @click.option('--item-type', default=None)
+    @click.option('--user-id', type=int, default=None)
+    @click.option('--action', default=None)
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='First day to include (YYYY-MM-DD).')
+    @click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Last day to include (YYYY-MM-DD).')
+    def export(kind, fmt, compress, output, **filters):
+        """Stream items, claims or activity logs out as CSV or NDJSON."""
+        import sys
+        import exports
+        chunks = exports.stream(kind, fmt, filters, compress)
+        if output is None:
+            out = sys.stdout.buffer if compress else sys.stdout
+        elif compress:
+            out = open(output, 'wb')
+        else:
+            out = open(output, 'w', encoding='utf-8', newline='')
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if output is None:
+                out.flush()
+            else:
+                out.close()
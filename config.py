@@ -4,23 +4,94 @@ from dotenv import load_dotenv
 # Load environment variables from .env file for local development
 load_dotenv()
 
+def _database_url(db_url):
+    if db_url.startswith('postgres://'):
+        db_url = db_url.replace('postgres://', 'postgresql://', 1)
+    if db_url.startswith('postgresql') and 'sslmode' not in db_url:
+        if '?' in db_url:
+            db_url += '&sslmode=require'
+        else:
+            db_url += '?sslmode=require'
+    return db_url
+
 class Config:
     db_url = os.environ.get('DATABASE_URL')
     if db_url:
-        if 'sslmode' not in db_url:
-            if db_url.startswith('postgres://'):
-                db_url = db_url.replace('postgres://', 'postgresql://', 1)
-            if '?' in db_url:
-                db_url += '&sslmode=require'
-            else:
-                db_url += '?sslmode=require'
-        SQLALCHEMY_DATABASE_URI = db_url
+        SQLALCHEMY_DATABASE_URI = _database_url(db_url)
     else:
         SQLALCHEMY_DATABASE_URI = 'sqlite:///site.db'
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.environ.get('SECRET_KEY')
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'static/uploads')
+    # Background threads per worker that generate thumbnail/card/detail renditions
+    PHOTO_WORKERS = int(os.environ.get('PHOTO_WORKERS', 2))
+    # '' serves photos from Python, 'nginx' emits X-Accel-Redirect, 'apache' emits X-Sendfile
+    PHOTO_OFFLOAD = os.environ.get('PHOTO_OFFLOAD', '')
+    PHOTO_OFFLOAD_PREFIX = os.environ.get('PHOTO_OFFLOAD_PREFIX', '/protected-uploads/')
+    # 'keyset' pages admin lists by (created_at, id) cursors, 'offset' uses page numbers
+    ADMIN_PAGINATION = os.environ.get('ADMIN_PAGINATION', 'keyset')
+    # Cap for the approximate total shown on cursor-paginated lists (0 disables it)
+    ADMIN_COUNT_LIMIT = int(os.environ.get('ADMIN_COUNT_LIMIT', 10000))
+    # 'buffered' writes activity rows in batches per worker, 'sync' writes them in the request's own commit
+    ACTIVITY_LOG_MODE = os.environ.get('ACTIVITY_LOG_MODE', 'buffered')
+    # A batch is written when it reaches this many rows or this many seconds have passed,
+    # so a crashed worker loses at most that much activity
+    ACTIVITY_BATCH_SIZE = int(os.environ.get('ACTIVITY_BATCH_SIZE', 100))
+    ACTIVITY_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 2.0))
+    # Rows kept while the database is unreachable before the oldest are dropped
+    ACTIVITY_BUFFER_LIMIT = int(os.environ.get('ACTIVITY_BUFFER_LIMIT', 10000))
+    # Seconds between background expiry runs in each worker; 0 leaves expiry to `flask expire-items` (cron)
+    EXPIRY_INTERVAL = int(os.environ.get('EXPIRY_INTERVAL', 0))
+    # Items expired per batch/transaction, and batches per run (0 for no limit)
+    EXPIRY_BATCH_SIZE = int(os.environ.get('EXPIRY_BATCH_SIZE', 500))
+    EXPIRY_MAX_BATCHES = int(os.environ.get('EXPIRY_MAX_BATCHES', 0))
+    # Seconds a worker reuses a logged-in user's identity before re-reading it (0 disables the cache)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    # Seconds between a worker's checks for user edits made by other workers
+    USER_VERSION_CHECK = int(os.environ.get('USER_VERSION_CHECK', 2))
+    # Werkzeug hash method and work factor, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000';
+    # stored hashes made with anything else are upgraded at the next login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Processes per worker that hash and verify passwords (0 hashes in the request thread)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+    # Requests allowed to wait per hashing process before further logins block
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 4))
+    # Most queries one request may run when TESTING; views can raise it with @query_budget (0 disables)
+    QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 25))
+    # Per-endpoint latency, query and render-time metrics on /metrics; off adds no per-request work
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+    # Where each worker saves its totals for /metrics to add up (default: instance/metrics)
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    # Seconds between a worker's saves; /metrics can lag other workers by this much
+    METRICS_WRITE_INTERVAL = float(os.environ.get('METRICS_WRITE_INTERVAL', 5.0))
+    # Bearer token that lets a Prometheus scraper read /metrics without an admin login
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    # Log slow statements and repeated statement shapes per request (N+1) to a rotating file
+    SQL_PROFILER = os.environ.get('SQL_PROFILER', 'false').lower() == 'true'
+    SQL_SLOW_MS = float(os.environ.get('SQL_SLOW_MS', 100))
+    # Runs of one statement shape within a request that count as a likely N+1
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 5))
+    SQL_PROFILER_LOG = os.environ.get('SQL_PROFILER_LOG', '')  # default: instance/sql_profiler.log
+    # Engine tuning: 'auto' follows the database URL; 'postgres', 'pgbouncer' (PgBouncer in
+    # transaction mode), 'sqlite', or 'none' for SQLAlchemy's defaults
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'auto')
+    # Postgres connections per worker, extra ones allowed under bursts, seconds to wait for one,
+    # and seconds before a connection is replaced
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    # Milliseconds a SQLite writer waits for the lock before "database is locked"
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+    # Optional read replica for @read_replica views (browse, search, detail, statistics); '' disables it
+    REPLICA_DATABASE_URL = _database_url(os.environ.get('REPLICA_DATABASE_URL', ''))
+    # Seconds after a user's write that their reads stay on the primary, to cover replication lag
+    REPLICA_READ_YOUR_WRITES_SECONDS = int(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS', 10))
+    # Seconds a worker reads from the primary after the replica fails before trying it again
+    REPLICA_RETRY_SECONDS = int(os.environ.get('REPLICA_RETRY_SECONDS', 30))
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
@@ -0,0 +1,195 @@
+from collections import Counter
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql.elements import BindParameter
+from __init__ import db
+from models import LostItemModel, FoundItemModel, ClaimModel, ItemCounter
+
+ENTITIES = {
+    LostItemModel: 'lost',
+    FoundItemModel: 'found',
+    ClaimModel: 'claim',
+}
+CHUNK_SIZE = 500
+
+
+def _category_column(model):
+    return model.category if hasattr(model, 'category') else db.literal('')
+
+
+def _default_status(model):
+    return model.__table__.c.status.default.arg
+
+
+def _key(model, status, category=None):
+    return ENTITIES[model], status or _default_status(model), category or ''
+
+
+def _tracked(model):
+    return ('status', 'category') if hasattr(model, 'category') else ('status',)
+
+
+def _current(obj):
+    model = type(obj)
+    return _key(model, *(getattr(obj, attr) for attr in _tracked(model)))
+
+
+def _stored(session, obj):
+    """Counter key for the values the row holds before this flush"""
+    model = type(obj)
+    attrs = _tracked(model)
+    histories = [inspect(obj).attrs[attr].history for attr in attrs]
+    if any(history.added and not history.deleted for history in histories):
+        # Assigned while expired, so the old value was never loaded; the row still has it
+        row = session.query(*(getattr(model, attr) for attr in attrs)).filter(model.id == obj.id).one()
+        return _key(model, *row)
+    return _key(model, *(history.deleted[0] if history.deleted else getattr(obj, attr)
+                         for attr, history in zip(attrs, histories)))
+
+
+def apply_deltas(connection, deltas):
+    """Add deltas to the counters on the writer's connection, inside its transaction"""
+    table = ItemCounter.__table__
+    dialect = connection.dialect.name
+    for (entity, status, category), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        values = {'entity': entity, 'status': status, 'category': category, 'count': delta}
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            connection.execute(insert(table).values(**values).on_conflict_do_update(
+                index_elements=[table.c.entity, table.c.status, table.c.category],
+                set_={'count': table.c.count + delta}))
+        else:
+            result = connection.execute(table.update().where(
+                table.c.entity == entity, table.c.status == status, table.c.category == category
+            ).values(count=table.c.count + delta))
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(**values))
+
+
+def _before_flush(session, flush_context, instances):
+    deltas = session.info.setdefault('counter_deltas', Counter())
+    for obj in session.new:
+        if type(obj) in ENTITIES:
+            deltas[_current(obj)] += 1
+    for obj in session.deleted:
+        if type(obj) in ENTITIES:
+            deltas[_stored(session, obj)] -= 1
+    for obj in session.dirty:
+        if type(obj) not in ENTITIES or not session.is_modified(obj):
+            continue
+        old, new = _stored(session, obj), _current(obj)
+        if old != new:
+            deltas[old] -= 1
+            deltas[new] += 1
+
+
+def _after_flush(session, flush_context):
+    deltas = session.info.pop('counter_deltas', None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def _assignments(statement, model):
+    """What an UPDATE sets each tracked column to: {attr: expression}"""
+    values = dict(statement._ordered_values or ()) or statement._values or {}
+    assigned = {getattr(column, 'key', column): value for column, value in values.items()}
+    return {attr: assigned[attr] for attr in _tracked(model) if attr in assigned}
+
+
+def _rows(session, model, criterion, lock=False):
+    query = session.query(model.id, *(getattr(model, attr) for attr in _tracked(model)))
+    if criterion is not None:
+        query = query.filter(criterion)
+    if lock:
+        query = query.with_for_update()
+    return {row[0]: tuple(row[1:]) for row in query}
+
+
+def _do_orm_execute(state):
+    # query.update()/delete() and bulk inserts skip the flush; count the rows they touch
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return None
+    mapper = state.bind_mapper
+    if mapper is None or mapper.class_ not in ENTITIES:
+        return None
+    model = mapper.class_
+    session = state.session
+    deltas = Counter()
+
+    if state.is_insert:
+        rows = state.parameters if isinstance(state.parameters, list) else [state.parameters or {}]
+        result = state.invoke_statement()
+        for row in rows:
+            if row:
+                deltas[_key(model, row.get('status'), row.get('category'))] += 1
+        apply_deltas(session.connection(), deltas)
+        return result
+
+    assigned = _assignments(state.statement, model) if state.is_update else {}
+    if state.is_update and not assigned:
+        # Status and category are untouched, so no counter moves
+        return None
+    # Lock the matching rows and confine the statement to them: the old values read here are
+    # the ones it replaces, and a row committed in between can't change uncounted
+    before = _rows(session, model, state.statement.whereclause, lock=True)
+    result = state.invoke_statement(statement=state.statement.where(model.id.in_(list(before))))
+    for values in before.values():
+        deltas[_key(model, *values)] -= 1
+    if state.is_update:
+        attrs = _tracked(model)
+        if all(isinstance(value, BindParameter) and not value.callable for value in assigned.values()):
+            # Plain values: the new counter key follows from the statement itself
+            for values in before.values():
+                deltas[_key(model, *(assigned[attr].value if attr in assigned else value
+                                     for attr, value in zip(attrs, values)))] += 1
+        else:
+            ids = list(before)
+            for start in range(0, len(ids), CHUNK_SIZE):
+                for values in _rows(session, model, model.id.in_(ids[start:start + CHUNK_SIZE])).values():
+                    deltas[_key(model, *values)] += 1
+    apply_deltas(session.connection(), deltas)
+    return result
+
+
+def rebuild(connection):
+    """Recount every entity from scratch on the given connection"""
+    table = ItemCounter.__table__
+    connection.execute(table.delete())
+    for model, entity in ENTITIES.items():
+        category = _category_column(model)
+        rows = connection.execute(db.select(model.status, category, db.func.count()).group_by(
+            model.status, category)).all()
+        if rows:
+            connection.execute(table.insert(), [
+                {'entity': entity, 'status': status or _default_status(model),
+                 'category': row_category or '', 'count': count}
+                for status, row_category, count in rows
+            ])
+
+
+def snapshot():
+    """All counters in one read: {(entity, status, category): count}"""
+    return {(row.entity, row.status, row.category): row.count for row in ItemCounter.query.all()}
+
+
+def total(counts, entity, status=None):
+    return sum(count for (e, s, _), count in counts.items()
+               if e == entity and (status is None or s == status))
+
+
+def grouped(counts, entity, by):
+    """[(status or category, count)] for one entity, like the old GROUP BY queries"""
+    sums = Counter()
+    for (e, status, category), count in counts.items():
+        if e == entity and count:
+            sums[status if by == 'status' else category] += count
+    return sorted(sums.items())
+
+
+def init_app(app):
+    event.listen(db.session, 'before_flush', _before_flush)
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'do_orm_execute', _do_orm_execute)
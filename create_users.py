@@ -3,74 +3,33 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash
-import sqlite3
+from __init__ import create_app
+from models import User
+import bootstrap
 
-# Direct database approach
-db_path = 'instance/site.db'
+# Uses the app's database settings and password hashing; run `PYTHONPATH=. flask --app app init-db` first
+app = create_app()
 
 try:
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Check if users table exists
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users';")
-    if not cursor.fetchone():
-        print("Users table doesn't exist. Creating it...")
-        cursor.execute('''
-            CREATE TABLE users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username VARCHAR(80) UNIQUE NOT NULL,
-                email VARCHAR(120) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                role VARCHAR(20) DEFAULT 'student',
-                is_verified BOOLEAN DEFAULT 0,
-                is_banned BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP
-            )
-        ''')
-    
-    # Check if student user exists
-    cursor.execute("SELECT * FROM users WHERE username = ?", ('22211013',))
-    if cursor.fetchone():
-        print("Student user '22211013' already exists")
-    else:
+    with app.app_context():
         # Create student user
-        password_hash = generate_password_hash('password123')
-        cursor.execute('''
-            INSERT INTO users (username, email, password_hash, role, is_verified)
-            VALUES (?, ?, ?, ?, ?)
-        ''', ('22211013', 'student@example.com', password_hash, 'student', 1))
-        print("Student user created: username='22211013', password='password123'")
-    
-    # Check if admin user exists
-    cursor.execute("SELECT * FROM users WHERE username = ?", ('admin',))
-    if cursor.fetchone():
-        print("Admin user 'admin' already exists")
-    else:
+        if bootstrap.ensure_user('22211013', 'student@example.com', 'password123'):
+            print("Student user created: username='22211013', password='password123'")
+        else:
+            print("Student user '22211013' already exists")
+
         # Create admin user
-        password_hash = generate_password_hash('admin123')
-        cursor.execute('''
-            INSERT INTO users (username, email, password_hash, role, is_verified)
-            VALUES (?, ?, ?, ?, ?)
-        ''', ('admin', 'admin@example.com', password_hash, 'admin', 1))
-        print("Admin user created: username='admin', password='admin123'")
-    
-    conn.commit()
-    print("Database operations completed successfully!")
-    
-    # Show all users
-    cursor.execute("SELECT username, email, role FROM users")
-    users = cursor.fetchall()
-    print("\nCurrent users in database:")
-    for user in users:
-        print(f"  - {user[0]} ({user[1]}) - Role: {user[2]}")
-        
+        if bootstrap.ensure_user('admin', 'admin@example.com', 'admin123', role='admin'):
+            print("Admin user created: username='admin', password='admin123'")
+        else:
+            print("Admin user 'admin' already exists")
+
+        print("Database operations completed successfully!")
+
+        # Show all users
+        print("\nCurrent users in database:")
+        for user in User.query.order_by(User.id):
+            print(f"  - {user.username} ({user.email}) - Role: {user.role}")
+
 except Exception as e:
     print(f"Error: {e}")
-finally:
-    if 'conn' in locals():
-        conn.close()
@@ -0,0 +1,82 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from __init__ import db
+
+PROFILES = ('auto', 'postgres', 'pgbouncer', 'sqlite', 'none')
+
+
+def resolve(config, url):
+    """The profile to use: DB_PROFILE, or for 'auto' the one matching the database URL"""
+    profile = config['DB_PROFILE']
+    if profile not in PROFILES:
+        raise ValueError(f'DB_PROFILE must be one of {", ".join(PROFILES)}, not {profile!r}')
+    if profile != 'auto':
+        return profile
+    backend = make_url(url).get_backend_name()
+    return {'postgresql': 'postgres', 'sqlite': 'sqlite'}.get(backend, 'none')
+
+
+def engine_options(config, url):
+    """Engine options for the configured profile and a database URL"""
+    profile = resolve(config, url)
+    if profile == 'postgres':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            # Below the server's or load balancer's idle timeout, so a checkout never gets a dead socket
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+            # Reuse the most recent connection so the rest can idle out under light load
+            'pool_use_lifo': True,
+        }
+    if profile == 'pgbouncer':
+        # PgBouncer in transaction mode does the pooling; a connection held here would pin a
+        # server connection, and a prepared statement could land on a different server connection
+        options = {'poolclass': NullPool}
+        if make_url(url).drivername == 'postgresql+psycopg':
+            options['connect_args'] = {'prepare_threshold': None}
+        return options
+    return {}
+
+
+def _sqlite_pragmas(config):
+    return [
+        # Readers no longer block the writer, and the writer no longer blocks readers
+        'PRAGMA journal_mode=WAL',
+        # Safe with WAL: a power loss can drop the last commits but never corrupts the file
+        'PRAGMA synchronous=NORMAL',
+        # Wait for the write lock instead of failing at once with "database is locked"
+        f'PRAGMA busy_timeout={int(config["SQLITE_BUSY_TIMEOUT_MS"])}',
+        f'PRAGMA mmap_size={int(config["SQLITE_MMAP_SIZE"])}',
+        # Negative is KiB rather than pages
+        f'PRAGMA cache_size={-int(config["SQLITE_CACHE_SIZE_KB"])}',
+    ]
+
+
+def configure(app):
+    """Tune the default engine and every bind; call before db.init_app. Explicit options win"""
+    config = app.config
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(config, config['SQLALCHEMY_DATABASE_URI']),
+                                           **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    binds = {}
+    for key, bind in config.get('SQLALCHEMY_BINDS', {}).items():
+        bind = {'url': bind} if isinstance(bind, str) else bind
+        binds[key] = {**engine_options(config, bind['url']), **bind}
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_app(app):
+    pragmas = _sqlite_pragmas(app.config)
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if resolve(app.config, engine.url) == 'sqlite':
+                event.listen(engine, 'connect', on_connect)
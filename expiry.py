@@ -0,0 +1,173 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, event
+from sqlalchemy.exc import IntegrityError
+from __init__ import db
+from models import LostItemModel, FoundItemModel, SystemSetting, ExpiryRun, JobLease
+import matching
+
+ITEM_MODELS = {'lost': LostItemModel, 'found': FoundItemModel}
+DEFAULT_EXPIRY_DAYS = 30
+LEASE_NAME = 'expiry'
+# How long a scheduler run may hold the lease before another worker assumes its holder died
+RUN_LEASE = timedelta(hours=1)
+
+_scheduler_pid = None
+_lock = threading.Lock()
+
+
+def retention_days():
+    """Days an item stays active, from the item_expiry_days system setting"""
+    value = db.session.query(SystemSetting.value).filter_by(key='item_expiry_days').scalar()
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return DEFAULT_EXPIRY_DAYS
+
+
+def stamp(item):
+    """Give a newly reported item its expiry date"""
+    item.expires_at = (item.created_at or datetime.utcnow()) + timedelta(days=retention_days())
+
+
+def _stamp_missing(model, days, batch_size):
+    # Items reported before expires_at was filled in get created_at + retention
+    rows = db.session.query(model.id, model.created_at).filter(
+        model.status == 'active', model.expires_at.is_(None)
+    ).order_by(model.id).limit(batch_size).all()
+    if rows:
+        table = model.__table__
+        db.session.connection().execute(
+            table.update().where(table.c.id == bindparam('item_id')).values(expires_at=bindparam('expiry')),
+            [{'item_id': row.id, 'expiry': (row.created_at or datetime.utcnow()) + timedelta(days=days)}
+             for row in rows])
+    return len(rows)
+
+
+def _expire_batch(item_type, model, now, batch_size):
+    ids = [row[0] for row in db.session.query(model.id).filter(
+        model.status == 'active', model.expires_at <= now
+    ).order_by(model.expires_at).limit(batch_size)]
+    if not ids:
+        return 0
+    matching.remove_items(item_type, ids)
+    # Re-checked here: an admin may have resolved an item, or another run expired it, since the SELECT
+    return db.session.query(model).filter(model.id.in_(ids), model.status == 'active').update(
+        {model.status: 'expired', model.updated_at: now, model.expired_at: now}, synchronize_session=False)
+
+
+def run_expiry(trigger='cli', batch_size=500, max_batches=None, now=None):
+    """Expire due items a bounded batch (and transaction) at a time; returns the recorded run"""
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    run = ExpiryRun(trigger=trigger, started_at=datetime.utcnow(), batches=0, stamped=0)
+    days = retention_days()
+    expired = {'lost': 0, 'found': 0}
+
+    def budget_left():
+        return max_batches is None or run.batches < max_batches
+
+    for item_type, model in ITEM_MODELS.items():
+        while budget_left():
+            stamped = _stamp_missing(model, days, batch_size)
+            if not stamped:
+                break
+            run.stamped += stamped
+            run.batches += 1
+            db.session.commit()
+        while budget_left():
+            count = _expire_batch(item_type, model, now, batch_size)
+            if not count:
+                break
+            expired[item_type] += count
+            run.batches += 1
+            db.session.commit()
+
+    run.lost_expired = expired['lost']
+    run.found_expired = expired['found']
+    run.finished_at = datetime.utcnow()
+    run.duration_ms = int((time.perf_counter() - started) * 1000)
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+
+def _record_expired(session, flush_context, instances):
+    # Admin status changes and edits record when the item expired, as _expire_batch does
+    for item in list(session.new) + list(session.dirty):
+        if isinstance(item, (LostItemModel, FoundItemModel)) and item.status == 'expired':
+            if item in session.new or db.inspect(item).attrs.status.history.added:
+                item.expired_at = datetime.utcnow()
+
+
+def _holder():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _take_lease(until):
+    """Claim the scheduler lease if it has lapsed; True in at most one worker at a time"""
+    now = datetime.utcnow()
+    table = JobLease.__table__
+    # A conditional UPDATE: of two workers racing for a lapsed lease, the second matches no row
+    claimed = db.session.execute(table.update().where(
+        table.c.name == LEASE_NAME, table.c.expires_at <= now
+    ).values(holder=_holder(), expires_at=until)).rowcount
+    if not claimed and db.session.get(JobLease, LEASE_NAME) is None:
+        db.session.add(JobLease(name=LEASE_NAME, holder=_holder(), expires_at=until))
+        claimed = 1
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return bool(claimed)
+
+
+def _release_lease(until):
+    table = JobLease.__table__
+    db.session.execute(table.update().where(
+        table.c.name == LEASE_NAME, table.c.holder == _holder()
+    ).values(expires_at=until))
+    db.session.commit()
+
+
+def _schedule(app):
+    interval = app.config['EXPIRY_INTERVAL']
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                # Every worker runs a scheduler; the lease lets one of them run per interval
+                if _take_lease(datetime.utcnow() + RUN_LEASE):
+                    try:
+                        run_expiry('scheduler', batch_size=app.config['EXPIRY_BATCH_SIZE'],
+                                   max_batches=app.config['EXPIRY_MAX_BATCHES'] or None)
+                    finally:
+                        db.session.rollback()
+                        _release_lease(datetime.utcnow() + timedelta(seconds=interval))
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f'Expiry run failed: {str(e)}')
+            finally:
+                db.session.remove()
+
+
+def init_app(app):
+    if not event.contains(db.session, 'before_flush', _record_expired):
+        event.listen(db.session, 'before_flush', _record_expired)
+    if not app.config['EXPIRY_INTERVAL']:
+        return
+
+    @app.before_request
+    def start_expiry_scheduler():
+        global _scheduler_pid
+        # Started per process on first request, so it also survives a preloading fork
+        if _scheduler_pid == os.getpid():
+            return
+        with _lock:
+            if _scheduler_pid != os.getpid():
+                _scheduler_pid = os.getpid()
+                threading.Thread(target=_schedule, args=(app,), name='expiry-scheduler', daemon=True).start()
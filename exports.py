@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from __init__ import db
+from models import LostItemModel, FoundItemModel, ClaimModel, UserActivity
+
+# What can be exported, and the admin list filters each export accepts
+EXPORTS = {
+    'lost': (LostItemModel, ('status', 'category')),
+    'found': (FoundItemModel, ('status', 'category')),
+    'claims': (ClaimModel, ('status', 'item_type')),
+    'activity': (UserActivity, ('user_id', 'action')),
+}
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+YIELD_PER = 1000
+ROWS_PER_CHUNK = 500
+
+
+def export_query(kind, filters):
+    """Column-only query for an export, ordered by id; filters use the admin lists' 'all' convention
+
+    since and until are days, and both are included.
+    """
+    model, allowed = EXPORTS[kind]
+    columns = list(model.__table__.columns)
+    query = db.session.query(*columns)
+    for name in allowed:
+        value = filters.get(name)
+        if value and value != 'all':
+            query = query.filter(model.__table__.c[name] == value)
+    if filters.get('since'):
+        query = query.filter(model.created_at >= filters['since'])
+    if filters.get('until'):
+        query = query.filter(model.created_at < filters['until'] + timedelta(days=1))
+    # Server-side cursor where the driver has one; rows never pile up in the session
+    query = query.order_by(model.id).execution_options(yield_per=YIELD_PER, stream_results=True)
+    return [column.name for column in columns], query
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def csv_chunks(names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_value(value) for value in row])
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(names, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(names, map(_value, row)))))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(kind, fmt, filters, compress=False):
+    """Generate an export as text chunks, or gzip bytes with compress"""
+    names, query = export_query(kind, filters)
+    chunks = (csv_chunks if fmt == 'csv' else ndjson_chunks)(names, query)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def filename(kind, fmt, compress=False):
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    return f'{kind}-{stamp}.{fmt}' + ('.gz' if compress else '')
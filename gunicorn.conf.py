@@ -0,0 +1,6 @@
+# Picked up automatically by `gunicorn app:app` run from this directory.
+
+# Import the app once in the master and fork the workers from it, so booting or
+# recycling a worker costs a fork instead of an import. create_app runs no queries,
+# and each forked worker drops the master's pooled connections (see _dispose_engines).
+preload_app = True
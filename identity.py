@@ -0,0 +1,126 @@
+import threading
+import time
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
+from __init__ import db
+from models import User
+import snapshots
+
+# Enough for current_user on almost every request
+FIELDS = ('id', 'username', 'email', 'role', 'is_banned', 'is_verified')
+# cache_versions row bumped by every write that changes one of FIELDS or deletes a user
+USERS = 'users'
+
+_cache = {}
+_lock = threading.Lock()
+# Last users version read from the database, and the monotonic time to read it again
+_version = [None, 0.0]
+
+
+class UserIdentity(UserMixin):
+    """Cached stand-in for current_user; anything else is read from the full User row on demand
+
+    Read-only: routes that change the user load the User row and modify that.
+    """
+
+    def __init__(self, values):
+        self.__dict__.update(zip(FIELDS, values))
+
+    @property
+    def record(self):
+        if '_record' not in self.__dict__:
+            self.__dict__['_record'] = db.session.get(User, self.id)
+        return self.__dict__['_record']
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        record = self.record
+        if record is None:
+            # Deleted during this request; load() won't hand this identity out again
+            raise AttributeError(f'{name}: user {self.id} no longer exists')
+        return getattr(record, name)
+
+
+def load(user_id):
+    """Flask-Login user loader: a per-worker cached identity, or the User row with the cache off
+
+    The shared users version is re-read at most every USER_VERSION_CHECK seconds, so an
+    edit or delete made in another worker is seen within that, not after the TTL.
+    """
+    ttl = current_app.config['USER_CACHE_TTL']
+    if not ttl:
+        return db.session.get(User, user_id)
+    now = time.monotonic()
+    version = _users_version(now)
+    entry = _cache.get(user_id)
+    if entry is None or entry[0] != version or entry[1] < now:
+        row = db.session.query(*(getattr(User, field) for field in FIELDS)).filter(User.id == user_id).first()
+        if row is None:
+            invalidate(user_id)
+            return None
+        entry = (version, now + ttl, tuple(row))
+        with _lock:
+            _cache[user_id] = entry
+    return UserIdentity(entry[2])
+
+
+def _users_version(now):
+    if _version[0] is None or now >= _version[1]:
+        version = snapshots.current_version(USERS)
+        with _lock:
+            _version[:] = [version, now + current_app.config['USER_VERSION_CHECK']]
+    return _version[0]
+
+
+def invalidate(*user_ids):
+    with _lock:
+        for user_id in user_ids:
+            _cache.pop(user_id, None)
+
+
+def _changes_identity(user):
+    attrs = db.inspect(user).attrs
+    return any(attrs[field].history.has_changes() for field in FIELDS)
+
+
+def _before_flush(session, flush_context, instances):
+    # A login only touches last_login, so it leaves every cached identity in place
+    if any(isinstance(obj, User) for obj in session.deleted) or any(
+            isinstance(obj, User) and _changes_identity(obj) for obj in session.dirty):
+        session.info['stale_users'] = True
+
+
+def _after_flush(session, flush_context):
+    # Bumped in the writer's transaction, like the snapshot versions
+    if session.info.pop('stale_users', False):
+        snapshots.bump(session.connection(), [USERS])
+        session.info['bumped_users'] = True
+
+
+def _do_orm_execute(state):
+    # query.update()/delete() on users bypass the flush
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None and state.bind_mapper.class_ is User:
+        snapshots.bump(state.session.connection(), [USERS])
+        state.session.info['bumped_users'] = True
+
+
+def _after_commit(session):
+    # This worker sees its own edits at once; the others on their next version check
+    if session.info.pop('bumped_users', False):
+        with _lock:
+            _version[0] = None
+
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('bumped_users', None)
+
+
+def init_app(app):
+    event.listen(db.session, 'before_flush', _before_flush)
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_transaction_end', _after_transaction_end)
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it every size falls back to the original
+    Image = None
+
+# Longest edge in pixels for each rendition
+RENDITIONS = {
+    'thumb': 160,
+    'card': 400,
+    'detail': 1200,
+}
+RENDITION_DIR = 'renditions'
+JPEG_QUALITY = 80
+# A source that couldn't be rendered (corrupt or unsupported) isn't retried for this long
+FAILED_RETRY_SECONDS = 3600
+
+_executor = None
+_executor_pid = None
+_pending = set()
+# filename -> monotonic time after which a failed source may be tried again
+_failed = {}
+_lock = threading.Lock()
+
+
+def rendition_name(filename, size):
+    """Path of a rendition relative to the upload folder"""
+    stem, _ = os.path.splitext(filename)
+    return os.path.join(RENDITION_DIR, size, stem + '.jpg')
+
+
+def generate_renditions(upload_folder, filename):
+    """Write every missing rendition of an uploaded photo; returns the sizes written"""
+    if Image is None:
+        return []
+    source = os.path.join(upload_folder, filename)
+    written = []
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+        # Largest first, so each smaller size is resampled from a smaller image
+        for size, edge in sorted(RENDITIONS.items(), key=lambda pair: -pair[1]):
+            target = os.path.join(upload_folder, rendition_name(filename, size))
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            image.thumbnail((edge, edge), Image.LANCZOS)
+            temporary = f'{target}.{os.getpid()}.tmp'
+            image.save(temporary, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            os.replace(temporary, target)
+            written.append(size)
+    return written
+
+
+def remove_renditions(upload_folder, filename):
+    for size in RENDITIONS:
+        path = os.path.join(upload_folder, rendition_name(filename, size))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _get_executor(workers):
+    global _executor, _executor_pid
+    # A pool inherited across fork has no threads; start a fresh one per process
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='renditions')
+        _executor_pid = os.getpid()
+        _pending.clear()
+    return _executor
+
+
+def _run(upload_folder, filename, logger):
+    try:
+        generate_renditions(upload_folder, filename)
+    except Exception as e:
+        logger.error(f'Could not generate renditions for {filename}: {str(e)}')
+        with _lock:
+            _failed[filename] = time.monotonic() + FAILED_RETRY_SECONDS
+    finally:
+        with _lock:
+            _pending.discard(filename)
+
+
+def schedule_renditions(filename):
+    """Queue rendition generation for a saved upload without blocking the request
+
+    Sources that recently failed are skipped, and keep being served as the original.
+    """
+    if Image is None or not filename:
+        return None
+    with _lock:
+        if filename in _pending or _failed.get(filename, 0) > time.monotonic():
+            return None
+        _failed.pop(filename, None)
+        _pending.add(filename)
+        executor = _get_executor(current_app.config['PHOTO_WORKERS'])
+    return executor.submit(_run, current_app.config['UPLOAD_FOLDER'], filename, current_app.logger)
+
+
+def photo_url(filename, size='card'):
+    return url_for('photo_rendition', size=size, filename=filename)
+
+
+def photo_srcset(filename):
+    return ', '.join(f'{photo_url(filename, size)} {edge}w' for size, edge in RENDITIONS.items())
+
+
+def init_app(app):
+    app.add_template_global(photo_url)
+    app.add_template_global(photo_srcset)
@@ -0,0 +1,157 @@
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from werkzeug.datastructures import MultiDict
+from werkzeug.security import safe_join
+from __init__ import db
+from forms import LostItem, FoundItem
+from models import LostItemModel, FoundItemModel
+import expiry
+import matching
+import storage
+
+# What can be imported, and the report form whose rules each row must pass
+IMPORTS = {
+    'lost': (LostItemModel, LostItem),
+    'found': (FoundItemModel, FoundItem),
+}
+FORMATS = ('csv', 'ndjson')
+# Uploaded with the report form; in an import, photos are named in photo_filename instead
+SKIPPED_FIELDS = ('photo', 'submit')
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_rows(path, fmt):
+    """Yield (line number, row) from a CSV or NDJSON file, gzipped or not, one row at a time"""
+    raw = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+    with io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as text:
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = e
+            yield line_number, row
+
+
+class RowValidator:
+    """Check rows against the report form's validators, reusing one form for every row"""
+
+    def __init__(self, form_class, photo_dir=None):
+        self.form = form_class(formdata=None, meta={'csrf': False})
+        for name in SKIPPED_FIELDS:
+            del self.form[name]
+        self.fields = [field.name for field in self.form]
+        self.photo_dir = photo_dir
+
+    def __call__(self, row):
+        """(values, None) for a valid row, or (None, [error messages])"""
+        if not isinstance(row, dict):
+            return None, [f'not a JSON object: {row}']
+        self.form.process(formdata=MultiDict(
+            {name: str(row[name]).strip() for name in self.fields if row.get(name) is not None}))
+        if not self.form.validate():
+            return None, [f'{name}: {"; ".join(messages)}' for name, messages in self.form.errors.items()]
+        values = {name: self.form[name].data for name in self.fields}
+
+        photo = (row.get('photo_filename') or '').strip()
+        values['photo_filename'] = None
+        if photo:
+            if self.photo_dir is None:
+                return None, ['photo_filename: no photo directory given']
+            path = safe_join(self.photo_dir, photo)
+            if path is None or not os.path.isfile(path):
+                return None, [f'photo_filename: {photo} not found']
+            values['photo_filename'] = path
+
+        values['created_at'], error = _created_at(row.get('created_at'))
+        if error:
+            return None, [f'created_at: {error}']
+        return values, None
+
+
+def _created_at(value):
+    # The original report time, ISO 8601 in UTC unless an offset is given
+    value = str(value or '').strip()
+    if not value:
+        return None, None
+    try:
+        created_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None, f'not an ISO 8601 date or time: {value}'
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if created_at > datetime.utcnow():
+        return None, f'in the future: {value}'
+    return created_at, None
+
+
+def _insert_chunk(item_type, rows):
+    model = IMPORTS[item_type][0]
+    for row in rows:
+        if row['photo_filename']:
+            row['photo_filename'] = storage.save_file(row['photo_filename'])
+    now = datetime.utcnow()
+    retention = timedelta(days=expiry.retention_days())
+    for row in rows:
+        # Rows without a created_at were reported now; either way expiry counts from it
+        created_at = row['created_at'] or now
+        row.update(status='active', created_at=created_at, updated_at=now, expires_at=created_at + retention)
+
+    # One executemany per chunk; the counters pick the rows up from the bulk insert
+    ids = db.session.execute(
+        db.insert(model).returning(model.id, sort_by_parameter_order=True), rows).scalars().all()
+    matching.index_items(item_type, [SimpleNamespace(id=item_id, **row) for item_id, row in zip(ids, rows)])
+    db.session.commit()
+
+
+def import_items(item_type, path, fmt=None, photo_dir=None, chunk_size=1000, dry_run=False,
+                 progress=None, rejected=None):
+    """Validate and insert items from a CSV/NDJSON file, committing every chunk_size valid rows
+
+    Invalid rows are skipped and passed to rejected(line number, errors);
+    progress(imported, seconds) is called after each chunk. Returns a summary dict.
+    """
+    validate = RowValidator(IMPORTS[item_type][1], photo_dir)
+    started = time.monotonic()
+    summary = {'read': 0, 'imported': 0, 'rejected': 0}
+    chunk = []
+
+    def flush():
+        if chunk and not dry_run:
+            _insert_chunk(item_type, chunk)
+        summary['imported'] += len(chunk)
+        chunk.clear()
+        if progress:
+            progress(summary['imported'], time.monotonic() - started)
+
+    for line_number, row in read_rows(path, fmt or detect_format(path)):
+        summary['read'] += 1
+        values, errors = validate(row)
+        if errors:
+            summary['rejected'] += 1
+            if rejected:
+                rejected(line_number, errors)
+            continue
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    summary['seconds'] = time.monotonic() - started
+    return summary
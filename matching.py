@@ -0,0 +1,253 @@
+import math
+import re
+from collections import Counter, defaultdict
+from __init__ import db
+from models import LostItemModel, FoundItemModel, MatchToken, MatchCandidate
+
+ITEM_MODELS = {'lost': LostItemModel, 'found': FoundItemModel}
+OTHER_TYPE = {'lost': 'found', 'found': 'lost'}
+
+NAME_WEIGHT = 2.0        # a word in the item name counts as much as two in the description
+CATEGORY_BOOST = 0.25
+LOCATION_BOOST = 0.15
+MIN_SCORE = 0.15
+CANDIDATE_POOL = 200     # most items ever scored for one insert
+MATCHES_PER_ITEM = 10
+COMMON_TOKEN_RATIO = 0.25  # tokens in more items than this don't select candidates
+
+STOPWORDS = frozenset('''
+    a an and are as at be but by for from has have i in is it its my of on or
+    that the this to was were with while near left lost found please
+'''.split())
+
+
+def _words(text):
+    for word in re.findall(r'[a-z0-9]+', (text or '').lower()):
+        if len(word) > 1 and word not in STOPWORDS:
+            yield word[:50]
+
+
+def term_weights(item):
+    """Sublinear term frequencies over the item name and description"""
+    counts = Counter()
+    for word in _words(item.item_name):
+        counts[word] += NAME_WEIGHT
+    for word in _words(item.description):
+        counts[word] += 1.0
+    return {word: 1.0 + math.log(count) for word, count in counts.items()}
+
+
+def _corpus_size():
+    # Highest ids are a free upper bound on the number of indexed items
+    lost = db.session.query(db.func.max(LostItemModel.id)).scalar() or 0
+    found = db.session.query(db.func.max(FoundItemModel.id)).scalar() or 0
+    return max(lost + found, 1)
+
+
+def _idf(tokens, corpus_size):
+    if not tokens:
+        return {}
+    rows = db.session.query(MatchToken.token, db.func.count()).filter(
+        MatchToken.token.in_(tokens)
+    ).group_by(MatchToken.token).all()
+    frequencies = dict(rows)
+    return {t: math.log((corpus_size + 1) / (frequencies.get(t, 0) + 1)) + 1.0 for t in tokens}
+
+
+def _norm(weights, idf):
+    return math.sqrt(sum((w * idf.get(t, 1.0)) ** 2 for t, w in weights.items())) or 1.0
+
+
+def _candidate_ids(item_type, weights, idf, corpus_size):
+    """Pull the best-overlapping active items of the other kind from the inverted index"""
+    other = OTHER_TYPE[item_type]
+    model = ITEM_MODELS[other]
+    common_idf = math.log(1 / COMMON_TOKEN_RATIO) + 1.0
+    selective = [t for t in weights if corpus_size < 100 or idf[t] > common_idf]
+    if not selective:
+        return []
+    overlap = db.func.sum(MatchToken.weight)
+    rows = db.session.query(MatchToken.item_id).join(
+        model, model.id == MatchToken.item_id
+    ).filter(
+        MatchToken.item_type == other,
+        MatchToken.token.in_(selective),
+        model.status == 'active'
+    ).group_by(MatchToken.item_id).order_by(overlap.desc()).limit(CANDIDATE_POOL).all()
+    return [row[0] for row in rows]
+
+
+def score_item(item_type, item, weights=None, idf=None, corpus_size=None):
+    """Score one item against its candidates; returns [(other_id, score)] best first
+
+    A batch can share one corpus_size and one idf dict, which is filled in as tokens are looked up.
+    """
+    weights = weights if weights is not None else term_weights(item)
+    if not weights:
+        return []
+    corpus_size = corpus_size or _corpus_size()
+    if idf is None:
+        idf = {}
+    idf.update(_idf([t for t in weights if t not in idf], corpus_size))
+    candidate_ids = _candidate_ids(item_type, weights, idf, corpus_size)
+    if not candidate_ids:
+        return []
+
+    other = OTHER_TYPE[item_type]
+    model = ITEM_MODELS[other]
+
+    # Load every candidate's vector in one pass and score them together
+    vectors = defaultdict(dict)
+    for item_id, token, weight in db.session.query(
+        MatchToken.item_id, MatchToken.token, MatchToken.weight
+    ).filter(MatchToken.item_type == other, MatchToken.item_id.in_(candidate_ids)):
+        vectors[item_id][token] = weight
+    extra_tokens = {t for vector in vectors.values() for t in vector} - set(idf)
+    idf.update(_idf(list(extra_tokens), corpus_size))
+
+    attributes = dict((row.id, row) for row in db.session.query(
+        model.id, model.category, model.location
+    ).filter(model.id.in_(candidate_ids)))
+
+    query_vector = {t: w * idf[t] for t, w in weights.items()}
+    query_norm = _norm(weights, idf)
+    scores = []
+    for other_id, vector in vectors.items():
+        dot = sum(query_vector[t] * w * idf[t] for t, w in vector.items() if t in query_vector)
+        score = dot / (query_norm * _norm(vector, idf))
+        row = attributes.get(other_id)
+        if row is not None:
+            if row.category == item.category:
+                score *= 1 + CATEGORY_BOOST
+            if row.location == item.location:
+                score *= 1 + LOCATION_BOOST
+        if score >= MIN_SCORE:
+            scores.append((other_id, round(score, 4)))
+    scores.sort(key=lambda pair: pair[1], reverse=True)
+    return scores[:MATCHES_PER_ITEM]
+
+
+def _pair(item_type, item_id, other_id, score):
+    if item_type == 'lost':
+        return {'lost_item_id': item_id, 'found_item_id': other_id, 'score': score}
+    return {'lost_item_id': other_id, 'found_item_id': item_id, 'score': score}
+
+
+def _candidate_column(item_type):
+    return MatchCandidate.lost_item_id if item_type == 'lost' else MatchCandidate.found_item_id
+
+
+def remove_items(item_type, item_ids):
+    """Drop items from the inverted index and forget their match candidates"""
+    if not item_ids:
+        return
+    db.session.query(MatchToken).filter(
+        MatchToken.item_type == item_type, MatchToken.item_id.in_(item_ids)
+    ).delete(synchronize_session=False)
+    db.session.query(MatchCandidate).filter(
+        _candidate_column(item_type).in_(item_ids)
+    ).delete(synchronize_session=False)
+
+
+def index_item(item_type, item):
+    """(Re)index one item and refresh its match candidates in the current transaction
+
+    Call after the item has been flushed so it has an id. Items that are no
+    longer active are only removed from the index.
+    """
+    remove_items(item_type, [item.id])
+    if item.status != 'active':
+        return []
+
+    weights = term_weights(item)
+    if weights:
+        db.session.execute(db.insert(MatchToken), [
+            {'token': t, 'item_type': item_type, 'item_id': item.id, 'weight': w}
+            for t, w in weights.items()
+        ])
+    matches = score_item(item_type, item, weights)
+    if matches:
+        db.session.execute(db.insert(MatchCandidate), [
+            _pair(item_type, item.id, other_id, score) for other_id, score in matches
+        ])
+    return matches
+
+
+def index_items(item_type, items):
+    """Index a batch of new active items in one insert, then store their candidates together
+
+    For bulk imports; items only need id, item_name, description, category and location.
+    Returns the number of candidates stored.
+    """
+    weights = {item.id: term_weights(item) for item in items}
+    tokens = [{'token': t, 'item_type': item_type, 'item_id': item_id, 'weight': w}
+              for item_id, item_weights in weights.items() for t, w in item_weights.items()]
+    if tokens:
+        db.session.execute(db.insert(MatchToken), tokens)
+    corpus_size = _corpus_size()
+    idf = {}
+    pairs = [_pair(item_type, item.id, other_id, score) for item in items
+             for other_id, score in score_item(item_type, item, weights[item.id], idf, corpus_size)]
+    if pairs:
+        db.session.execute(db.insert(MatchCandidate), pairs)
+    return len(pairs)
+
+
+def matches_for(item_type, item_id, limit=5):
+    """Active items of the other kind that look like this one, best first"""
+    other = OTHER_TYPE[item_type]
+    model = ITEM_MODELS[other]
+    other_column = _candidate_column(other)
+    return db.session.query(model, MatchCandidate.score).join(
+        MatchCandidate, other_column == model.id
+    ).filter(
+        _candidate_column(item_type) == item_id,
+        model.status == 'active'
+    ).order_by(MatchCandidate.score.desc()).limit(limit).all()
+
+
+def rebuild_index(batch_size=500, progress=None):
+    """Rebuild the inverted index and all candidates from the active items"""
+    db.session.query(MatchCandidate).delete(synchronize_session=False)
+    db.session.query(MatchToken).delete(synchronize_session=False)
+    db.session.commit()
+
+    # Index everything first so each item is scored against the full corpus
+    for item_type, model in ITEM_MODELS.items():
+        last_id = 0
+        while True:
+            items = model.query.filter(model.status == 'active', model.id > last_id).order_by(
+                model.id).limit(batch_size).all()
+            if not items:
+                break
+            rows = []
+            for item in items:
+                rows.extend({'token': t, 'item_type': item_type, 'item_id': item.id, 'weight': w}
+                            for t, w in term_weights(item).items())
+            if rows:
+                db.session.execute(db.insert(MatchToken), rows)
+            db.session.commit()
+            last_id = items[-1].id
+
+    stored = 0
+    for item_type, model in ITEM_MODELS.items():
+        rows = []
+        for item in model.query.filter_by(status='active').order_by(model.id).yield_per(batch_size):
+            matches = score_item(item_type, item)
+            if item_type == 'found' and matches:
+                # Pairs already stored from the lost side are symmetric
+                existing = {row[0] for row in db.session.query(MatchCandidate.lost_item_id).filter(
+                    MatchCandidate.found_item_id == item.id)}
+                matches = [(other_id, score) for other_id, score in matches if other_id not in existing]
+            rows.extend(_pair(item_type, item.id, other_id, score) for other_id, score in matches)
+            if len(rows) >= batch_size:
+                db.session.execute(db.insert(MatchCandidate), rows)
+                stored += len(rows)
+                rows = []
+                if progress:
+                    progress(item_type, stored)
+        if rows:
+            db.session.execute(db.insert(MatchCandidate), rows)
+            stored += len(rows)
+        db.session.commit()
+    return stored
@@ -0,0 +1,241 @@
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from collections import Counter
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PREFIX = 'lostandfound'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+HISTOGRAMS = {
+    'request_duration_seconds': (LATENCY_BUCKETS, 'Time from the start of the request to the response, by endpoint.'),
+    'db_queries_per_request': (QUERY_BUCKETS, 'SQL statements run by one request, by endpoint.'),
+}
+COUNTERS = {
+    'db_queries_total': 'SQL statements run, by endpoint.',
+    'db_seconds_total': 'Time spent executing SQL, by endpoint.',
+    'template_seconds_total': 'Time spent rendering templates, by endpoint.',
+}
+
+
+def _empty():
+    return {'requests': Counter(), 'histograms': {name: {} for name in HISTOGRAMS},
+            'counters': {name: Counter() for name in COUNTERS}}
+
+
+# This worker's totals; each worker writes them to <METRICS_DIR>/metrics-<pid>.json
+_totals = _empty()
+_pid = None
+_last_write = 0.0
+_lock = threading.Lock()
+_directory = None
+_interval = 5.0
+
+
+def _path(pid):
+    return os.path.join(_directory, f'metrics-{pid}.json')
+
+
+def _merge(totals, path):
+    with open(path) as f:
+        data = json.load(f)
+    for endpoint, method, status, count in data['requests']:
+        totals['requests'][(endpoint, method, status)] += count
+    for name, series in data['histograms'].items():
+        for endpoint, values in series.items():
+            current = totals['histograms'][name].setdefault(endpoint, [0] * len(values))
+            for index, value in enumerate(values):
+                current[index] += value
+    for name, series in data['counters'].items():
+        totals['counters'][name].update(series)
+
+
+def _check_process():
+    # Called with the lock held. A forked worker starts from zero, or from the totals a
+    # previous process with the same pid left behind, so its counters never go backwards
+    global _pid, _totals
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _totals = _empty()
+        if os.path.exists(_path(_pid)):
+            try:
+                _merge(_totals, _path(_pid))
+            except (OSError, ValueError, KeyError):
+                _totals = _empty()
+
+
+def _observe(name, endpoint, value):
+    buckets = HISTOGRAMS[name][0]
+    values = _totals['histograms'][name].setdefault(endpoint, [0] * (len(buckets) + 2))
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            values[index] += 1
+            break
+    else:
+        values[len(buckets)] += 1  # +Inf
+    values[-1] += value  # sum; the count is the sum of the buckets
+
+
+def write():
+    """Save this worker's totals for /metrics to aggregate"""
+    global _last_write
+    if _directory is None:
+        return
+    with _lock:
+        _check_process()
+        data = json.dumps({'requests': [[*key, count] for key, count in _totals['requests'].items()],
+                           'histograms': _totals['histograms'], 'counters': _totals['counters']})
+        _last_write = time.monotonic()
+    path = _path(os.getpid())
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def _start_request():
+    g.metrics = {'started': time.perf_counter(), 'queries': 0, 'db_seconds': 0.0,
+                 'template_seconds': 0.0, 'template_depth': 0, 'status': 500}
+
+
+def _finish_request(exc=None):
+    state = g.pop('metrics', None)
+    if state is None:
+        return
+    elapsed = time.perf_counter() - state['started']
+    endpoint = request.endpoint or 'unmatched'
+    with _lock:
+        _check_process()
+        _totals['requests'][(endpoint, request.method, str(state['status']))] += 1
+        _observe('request_duration_seconds', endpoint, elapsed)
+        _observe('db_queries_per_request', endpoint, state['queries'])
+        counters = _totals['counters']
+        counters['db_queries_total'][endpoint] += state['queries']
+        counters['db_seconds_total'][endpoint] += state['db_seconds']
+        counters['template_seconds_total'][endpoint] += state['template_seconds']
+        due = time.monotonic() - _last_write >= _interval
+    if due:
+        write()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context, so one that raises leaves nothing on the connection
+    if context is not None and has_request_context() and 'metrics' in g:
+        context.metrics_started = time.perf_counter()
+
+
+def _record_query(context):
+    started = getattr(context, 'metrics_started', None)
+    if started is not None and has_request_context() and 'metrics' in g:
+        g.metrics['queries'] += 1
+        g.metrics['db_seconds'] += time.perf_counter() - started
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_query(context)
+
+
+def _handle_error(exception_context):
+    # A failed statement still cost a round trip
+    _record_query(exception_context.execution_context)
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context() and 'metrics' in g:
+        if not g.metrics['template_depth']:
+            g.metrics['template_started'] = time.perf_counter()
+        g.metrics['template_depth'] += 1
+
+
+def _rendered(sender, template, context, **extra):
+    if has_request_context() and 'metrics' in g and g.metrics['template_depth']:
+        g.metrics['template_depth'] -= 1
+        if not g.metrics['template_depth']:
+            g.metrics['template_seconds'] += time.perf_counter() - g.metrics['template_started']
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Prometheus text format for every worker's totals"""
+    write()
+    totals = _empty()
+    for path in sorted(glob.glob(os.path.join(_directory, 'metrics-*.json'))):
+        try:
+            _merge(totals, path)
+        except (OSError, ValueError, KeyError):
+            continue  # a worker's file being replaced; it is read on the next scrape
+    requests, histograms, counters = totals['requests'], totals['histograms'], totals['counters']
+
+    lines = [f'# HELP {PREFIX}_requests_total Requests handled, by endpoint, method and status.',
+             f'# TYPE {PREFIX}_requests_total counter']
+    for (endpoint, method, status), count in sorted(requests.items()):
+        lines.append(f'{PREFIX}_requests_total{{endpoint="{_label(endpoint)}",method="{method}",status="{status}"}} {count}')
+    for name, (buckets, description) in HISTOGRAMS.items():
+        lines += [f'# HELP {PREFIX}_{name} {description}', f'# TYPE {PREFIX}_{name} histogram']
+        for endpoint, values in sorted(histograms[name].items()):
+            label = f'endpoint="{_label(endpoint)}"'
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{PREFIX}_{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{PREFIX}_{name}_sum{{{label}}} {_number(values[-1])}')
+            lines.append(f'{PREFIX}_{name}_count{{{label}}} {cumulative}')
+    for name, description in COUNTERS.items():
+        lines += [f'# HELP {PREFIX}_{name} {description}', f'# TYPE {PREFIX}_{name} counter']
+        for endpoint, value in sorted(counters[name].items()):
+            lines.append(f'{PREFIX}_{name}{{endpoint="{_label(endpoint)}"}} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def token_matches(token, header):
+    """True when an Authorization header carries the configured bearer token"""
+    return bool(token) and hmac.compare_digest(header or '', f'Bearer {token}')
+
+
+def reset():
+    """Forget every worker's totals"""
+    global _totals
+    with _lock:
+        _totals = _empty()
+    for path in glob.glob(os.path.join(_directory, 'metrics-*.json*')):
+        os.remove(path)
+
+
+def init_app(app):
+    global _directory, _interval
+    # Disabled: no hooks at all, so requests pay nothing
+    if not app.config['METRICS_ENABLED']:
+        return
+    _directory = app.config['METRICS_DIR'] or os.path.join(app.instance_path, 'metrics')
+    _interval = app.config['METRICS_WRITE_INTERVAL']
+    os.makedirs(_directory, exist_ok=True)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.before_request(_start_request)
+
+    @app.after_request
+    def record_status(response):
+        if 'metrics' in g:
+            g.metrics['status'] = response.status_code
+        return response
+
+    app.teardown_request(_finish_request)
+    atexit.register(write)
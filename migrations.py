@@ -0,0 +1,153 @@
+from datetime import datetime
+from sqlalchemy import inspect
+from __init__ import db
+from search import install_search_indexes
+
+
+def _create_indexes(conn, names):
+    """Create the named model indexes on tables that already exist"""
+    existing_tables = set(inspect(conn).get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        for index in table.indexes:
+            if index.name in names:
+                index.create(bind=conn, checkfirst=True)
+
+
+def _add_columns(conn, table_name, names):
+    """Add the named model columns to a table that already exists"""
+    table = db.metadata.tables[table_name]
+    existing = {column['name'] for column in inspect(conn).get_columns(table_name)}
+    quote = conn.dialect.identifier_preparer.quote
+    for name in names:
+        if name not in existing:
+            column = table.c[name]
+            conn.exec_driver_sql(f'ALTER TABLE {quote(table_name)} ADD COLUMN {quote(name)} '
+                                 f'{column.type.compile(dialect=conn.dialect)}')
+
+
+def _create_tables(conn, names):
+    for table in db.metadata.sorted_tables:
+        if table.name in names:
+            table.create(bind=conn, checkfirst=True)
+
+
+def _full_text_search(conn):
+    install_search_indexes(conn)
+
+
+def _hot_path_indexes(conn):
+    _create_indexes(conn, {
+        'ix_lost_items_status_created_at',
+        'ix_lost_items_status_category_created_at',
+        'ix_lost_items_student_email_created_at',
+        'ix_lost_items_created_at',
+        'ix_found_items_status_created_at',
+        'ix_found_items_status_category_created_at',
+        'ix_found_items_student_email_created_at',
+        'ix_found_items_created_at',
+        'ix_claims_status_created_at',
+        'ix_claims_item_type_created_at',
+        'ix_claims_student_email_created_at',
+        'ix_claims_created_at',
+        'ix_claim_history_claim_id',
+        'ix_user_activities_user_id_created_at',
+        'ix_user_activities_created_at',
+    })
+
+
+def _match_tables(conn):
+    _create_tables(conn, {'match_tokens', 'match_candidates'})
+
+
+def _photo_blobs(conn):
+    _create_tables(conn, {'photo_blobs'})
+
+
+def _cache_versions(conn):
+    _create_tables(conn, {'cache_versions'})
+
+
+def _item_counters(conn):
+    import counters
+    _create_tables(conn, {'item_counters'})
+    counters.rebuild(conn)
+
+
+def _expiry(conn):
+    _create_indexes(conn, {'ix_lost_items_status_expires_at', 'ix_found_items_status_expires_at'})
+    _create_tables(conn, {'expiry_runs'})
+
+
+def _daily_rollups(conn):
+    from models import ClaimModel
+    _create_tables(conn, {'daily_item_stats', 'daily_claim_stats'})
+    _create_indexes(conn, {'ix_claims_status_resolved_at'})
+    # Claims resolved before resolved_at was recorded
+    claims = ClaimModel.__table__
+    conn.execute(claims.update().where(
+        claims.c.status.in_(('approved', 'rejected')), claims.c.resolved_at.is_(None)
+    ).values(resolved_at=claims.c.updated_at))
+
+
+def _expired_at(conn):
+    from models import LostItemModel, FoundItemModel
+    for model in (LostItemModel, FoundItemModel):
+        _add_columns(conn, model.__tablename__, {'expired_at'})
+        # Items expired before the time was recorded: _expire_batch stamped updated_at
+        table = model.__table__
+        conn.execute(table.update().where(
+            table.c.status == 'expired', table.c.expired_at.is_(None)
+        ).values(expired_at=db.func.coalesce(table.c.updated_at, table.c.expires_at)))
+    _create_indexes(conn, {'ix_lost_items_expired_at', 'ix_found_items_expired_at'})
+
+
+def _job_leases(conn):
+    _create_tables(conn, {'job_leases'})
+
+
+# Append new migrations to the end; never renumber or edit one that has shipped
+MIGRATIONS = [
+    (1, 'full-text search index', _full_text_search),
+    (2, 'hot filter/sort indexes', _hot_path_indexes),
+    (3, 'lost/found match candidates', _match_tables),
+    (4, 'content-addressed photo blobs', _photo_blobs),
+    (5, 'cache versions', _cache_versions),
+    (6, 'maintained item counters', _item_counters),
+    (7, 'scheduled expiry', _expiry),
+    (8, 'daily statistics rollups', _daily_rollups),
+    (9, 'recorded expiry times', _expired_at),
+    (10, 'background job leases', _job_leases),
+]
+
+
+def _migrations_table():
+    from models import SchemaMigration
+    return SchemaMigration.__table__
+
+
+def current_version(engine):
+    table = _migrations_table()
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(table.name):
+            return 0
+        return conn.execute(db.select(db.func.max(table.c.version))).scalar() or 0
+
+
+def upgrade(engine, target=None):
+    """Apply pending migrations in order and return the versions applied"""
+    table = _migrations_table()
+    table.create(bind=engine, checkfirst=True)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version <= current_version(engine):
+            continue
+        # Each migration commits together with its schema_migrations row
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(table.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+        applied.append((version, name))
+    return applied
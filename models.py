@@ -1,8 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from __init__ import db
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from datetime import datetime
+import passwords
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -18,10 +18,10 @@ class User(UserMixin, db.Model):
     last_login = db.Column(db.DateTime, nullable=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -62,6 +62,11 @@ class UserActivity(db.Model):
     
     user = db.relationship('User', backref='activities')
 
+    __table_args__ = (
+        db.Index('ix_user_activities_user_id_created_at', user_id, created_at),
+        db.Index('ix_user_activities_created_at', created_at),
+    )
+
 class LostItemModel(db.Model):
     __tablename__ = 'lost items'
 
@@ -79,6 +84,17 @@ class LostItemModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     expires_at = db.Column(db.DateTime, nullable=True)
+    # When the item last became 'expired' (scheduler, bulk action or admin); kept if it is reactivated
+    expired_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_lost_items_status_created_at', status, created_at.desc()),
+        db.Index('ix_lost_items_status_category_created_at', status, category, created_at),
+        db.Index('ix_lost_items_student_email_created_at', student_email, created_at),
+        db.Index('ix_lost_items_created_at', created_at),
+        db.Index('ix_lost_items_status_expires_at', status, expires_at),
+        db.Index('ix_lost_items_expired_at', expired_at),
+    )
 
 class FoundItemModel(db.Model):
     __tablename__ = 'found items'
@@ -98,6 +114,17 @@ class FoundItemModel(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     expires_at = db.Column(db.DateTime, nullable=True)
+    # When the item last became 'expired' (scheduler, bulk action or admin); kept if it is reactivated
+    expired_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_found_items_status_created_at', status, created_at.desc()),
+        db.Index('ix_found_items_status_category_created_at', status, category, created_at),
+        db.Index('ix_found_items_student_email_created_at', student_email, created_at),
+        db.Index('ix_found_items_created_at', created_at),
+        db.Index('ix_found_items_status_expires_at', status, expires_at),
+        db.Index('ix_found_items_expired_at', expired_at),
+    )
 
 class ClaimModel(db.Model):
     __tablename__= 'claims'
@@ -115,6 +142,14 @@ class ClaimModel(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     resolved_at = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_claims_status_created_at', status, created_at),
+        db.Index('ix_claims_item_type_created_at', item_type, created_at),
+        db.Index('ix_claims_student_email_created_at', student_email, created_at),
+        db.Index('ix_claims_created_at', created_at),
+        db.Index('ix_claims_status_resolved_at', status, resolved_at),
+    )
+
 class ClaimHistory(db.Model):
     __tablename__ = 'claim_history'
     
@@ -128,6 +163,115 @@ class ClaimHistory(db.Model):
     claim = db.relationship('ClaimModel', backref='history')
     admin = db.relationship('User')
 
+    __table_args__ = (
+        db.Index('ix_claim_history_claim_id', claim_id),
+    )
+
+class MatchToken(db.Model):
+    __tablename__ = 'match_tokens'
+
+    # Inverted index: which active items mention a token, and how strongly
+    token = db.Column(db.String(50), primary_key=True)
+    item_type = db.Column(db.String(20), primary_key=True)  # 'lost' or 'found'
+    item_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    weight = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_match_tokens_item', item_type, item_id),
+    )
+
+class MatchCandidate(db.Model):
+    __tablename__ = 'match_candidates'
+
+    id = db.Column(db.Integer, primary_key=True)
+    lost_item_id = db.Column(db.Integer, nullable=False)
+    found_item_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint(lost_item_id, found_item_id, name='uq_match_candidates_pair'),
+        db.Index('ix_match_candidates_lost_score', lost_item_id, score),
+        db.Index('ix_match_candidates_found_score', found_item_id, score),
+    )
+
+class PhotoBlob(db.Model):
+    __tablename__ = 'photo_blobs'
+
+    # One row per stored file; items reference it by path in photo_filename
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    path = db.Column(db.String(100), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExpiryRun(db.Model):
+    __tablename__ = 'expiry_runs'
+
+    # One row per run of the expiry job
+    id = db.Column(db.Integer, primary_key=True)
+    trigger = db.Column(db.String(20), nullable=False)  # 'scheduler', 'cli' or 'admin'
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    batches = db.Column(db.Integer, nullable=False, default=0)
+    stamped = db.Column(db.Integer, nullable=False, default=0)  # active items given an expires_at
+    lost_expired = db.Column(db.Integer, nullable=False, default=0)
+    found_expired = db.Column(db.Integer, nullable=False, default=0)
+    duration_ms = db.Column(db.Integer, nullable=True)
+
+class JobLease(db.Model):
+    __tablename__ = 'job_leases'
+
+    # One row per background job; only the holder of an unexpired lease runs it
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class DailyItemStat(db.Model):
+    __tablename__ = 'daily_item_stats'
+
+    # Items reported and expired per day, kind, category and location
+    day = db.Column(db.Date, primary_key=True)
+    item_type = db.Column(db.String(20), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    location = db.Column(db.String(100), primary_key=True)
+    reported = db.Column(db.Integer, nullable=False, default=0)
+    expired = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyClaimStat(db.Model):
+    __tablename__ = 'daily_claim_stats'
+
+    # One row per rolled-up day, even an empty one; the newest row marks how far the rollup got
+    day = db.Column(db.Date, primary_key=True)
+    opened = db.Column(db.Integer, nullable=False, default=0)
+    approved = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    median_hours_to_claim = db.Column(db.Float, nullable=True)
+
+class ItemCounter(db.Model):
+    __tablename__ = 'item_counters'
+
+    # Row counts per entity ('lost', 'found', 'claim'), status and category ('' for claims)
+    entity = db.Column(db.String(20), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+
+    # Bumped in the same transaction as the writes that make a cached view stale
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 
 
 
@@ -0,0 +1,126 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import url_for
+from sqlalchemy import text
+from __init__ import db
+
+
+class KeysetPage:
+    """One page of a list ordered on (created_at, id), navigated with opaque cursors
+
+    Unlike Pagination there is no page number and no exact total: the query
+    seeks straight to the cursor row instead of scanning OFFSET rows, and the
+    optional total is a capped (or planner-estimated) count.
+    """
+
+    page = None
+    pages = None
+
+    def __init__(self, items, has_prev, has_next, total=None, total_kind='exact'):
+        self.items = items
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.total = total
+        self.total_kind = total_kind
+
+    @property
+    def total_label(self):
+        if self.total is None:
+            return 'n/a'
+        if self.total_kind == 'capped':
+            return f'{self.total}+'
+        if self.total_kind == 'estimated':
+            return f'~{self.total}'
+        return str(self.total)
+
+    @property
+    def prev_cursor(self):
+        return encode_cursor(self.items[0], 'prev') if self.has_prev and self.items else None
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.items[-1], 'next') if self.has_next and self.items else None
+
+
+def encode_cursor(row, direction):
+    payload = json.dumps([row.created_at.isoformat(), row.id, direction[0]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (created_at, id, direction) for a cursor token, or None if it is malformed"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id), 'prev' if direction == 'p' else 'next'
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def approximate_count(query, model, limit):
+    """Count rows up to limit; returns (count, 'exact' | 'capped' | 'estimated')"""
+    if not limit:
+        return None, 'exact'
+    if query.whereclause is None and db.engine.dialect.name == 'postgresql':
+        # Unfiltered list: the planner's row estimate is free and close enough
+        estimate = db.session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)'),
+            {'name': f'"{model.__tablename__}"'}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate, 'estimated'
+    count = query.order_by(None).limit(limit + 1).count()
+    return min(count, limit), 'capped' if count > limit else 'exact'
+
+
+def keyset_paginate(query, model, per_page, cursor=None, order='desc', count_limit=0):
+    """Fetch the page after (or before) cursor from query, ordered on (created_at, id)"""
+    key = db.tuple_(model.created_at, model.id)
+    descending = order == 'desc'
+    position = decode_cursor(cursor)
+
+    page_query = query
+    backwards = False
+    if position:
+        created_at, row_id, direction = position
+        boundary = db.tuple_(db.literal(created_at), db.literal(row_id))
+        backwards = direction == 'prev'
+        # Walking forward in a descending list means smaller keys, and vice versa
+        if descending != backwards:
+            page_query = page_query.filter(key < boundary)
+        else:
+            page_query = page_query.filter(key > boundary)
+
+    if descending != backwards:
+        page_query = page_query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        page_query = page_query.order_by(model.created_at.asc(), model.id.asc())
+
+    rows = page_query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = position is not None, more
+
+    total, total_kind = approximate_count(query, model, count_limit)
+    return KeysetPage(rows, has_prev, has_next, total, total_kind)
+
+
+def page_url(endpoint, page, direction, **params):
+    """Link to the previous/next page for either a Pagination or a KeysetPage"""
+    if isinstance(page, KeysetPage):
+        params['cursor'] = page.next_cursor if direction == 'next' else page.prev_cursor
+    else:
+        params['page'] = page.next_num if direction == 'next' else page.prev_num
+    return url_for(endpoint, **params)
+
+
+def init_app(app):
+    app.add_template_global(page_url)
@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+_executor = None
+_executor_pid = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+def _context():
+    # Never fork this (threaded) worker: a lock another thread held at that moment stays held
+    # in the child. The fork server is a fresh single-threaded process that imports only this
+    # module, not app.py, and forks the hashing processes from there
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _get_executor(workers):
+    global _executor, _executor_pid, _slots
+    # A pool inherited across fork is unusable; start a fresh one per process
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=_context())
+        _executor_pid = os.getpid()
+        _slots = threading.BoundedSemaphore(workers * current_app.config['PASSWORD_HASH_QUEUE'])
+    return _executor
+
+
+def _run(function, *args):
+    workers = current_app.config['PASSWORD_HASH_WORKERS']
+    if not workers:
+        return function(*args)
+    with _lock:
+        executor = _get_executor(workers)
+        slots = _slots
+    # Bound the backlog: callers past the limit wait here instead of queueing unbounded work
+    with slots:
+        return executor.submit(function, *args).result()
+
+
+def hash_password(password):
+    """Hash with the configured method and work factor, off the request thread"""
+    return _run(_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(password_hash, password):
+    return _run(_verify, password_hash, password)
+
+
+@lru_cache(maxsize=None)
+def _method_prefix(method):
+    # 'scrypt' is stored as 'scrypt:32768:8:1'; ask Werkzeug for the full form once
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """True when a stored hash was made with another method or work factor than configured"""
+    return password_hash.split('$', 1)[0] != _method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
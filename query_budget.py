@@ -0,0 +1,41 @@
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Allow a view more (or, with None, any number of) queries than QUERY_BUDGET"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and current_app.testing:
+        g.query_statements = g.get('query_statements', [])
+        g.query_statements.append(statement)
+
+
+def init_app(app):
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    @app.after_request
+    def enforce_query_budget(response):
+        # Tests only: a list that lazy-loads per row blows through the budget
+        if not app.testing or not app.config['QUERY_BUDGET']:
+            return response
+        view = app.view_functions.get(request.endpoint)
+        limit = getattr(view, 'query_budget', app.config['QUERY_BUDGET'])
+        statements = g.get('query_statements', [])
+        if limit is not None and len(statements) > limit:
+            repeated = max(set(statements), key=statements.count)
+            raise QueryBudgetExceeded(
+                f'{request.endpoint} ran {len(statements)} queries (budget {limit}); '
+                f'most repeated ({statements.count(repeated)}x): {repeated}')
+        return response
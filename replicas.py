@@ -0,0 +1,113 @@
+import logging
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, session as cookie_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger('lostandfound.replicas')
+
+BIND_KEY = 'replica'
+
+# Until when this worker keeps reads off a replica that failed, in time.monotonic() seconds
+_down_until = 0.0
+
+
+def read_replica(view):
+    """Run a read-only view's queries on the replica, when one is configured"""
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        g.read_replica = True
+        return view(*args, **kwargs)
+    return decorated_function
+
+
+@contextmanager
+def primary():
+    """Send the reads in the block to the primary, e.g. a read-then-write step in a replica view"""
+    previous = g.get('read_replica')
+    g.read_replica = False
+    try:
+        yield
+    finally:
+        g.read_replica = previous
+
+
+def _mark_down(error):
+    global _down_until
+    _down_until = time.monotonic() + current_app.config['REPLICA_RETRY_SECONDS']
+    logger.warning('Read replica unavailable, reading from the primary for %ss: %s',
+                   current_app.config['REPLICA_RETRY_SECONDS'], error)
+
+
+def _recently_wrote():
+    # Set after this browser's last write, so the user sees it even before the replica does
+    return has_request_context() and cookie_session.get('primary_until', 0) > time.time()
+
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to the replica on @read_replica views, or for statements with
+    execution_options(read_replica=True); everything else, and every read after a write in
+    the same session, goes to the primary
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+        elif bind is None and self._wants_replica(clause):
+            replica = self._replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _wants_replica(self, clause):
+        if not getattr(clause, 'is_select', False) or getattr(clause, '_for_update_arg', None) is not None:
+            return False
+        if self.info.get('wrote') or not has_app_context():
+            return False
+        marked = clause.get_execution_options().get('read_replica')
+        if marked is None:
+            marked = g.get('read_replica', False)
+        return marked and not _recently_wrote()
+
+    def _replica(self):
+        engine = self._db.engines.get(BIND_KEY)
+        if engine is None or time.monotonic() < _down_until:
+            return None
+        if 'replica_checked' not in self.info:
+            # Once per session: an unreachable replica costs one failed connect, not a 500
+            try:
+                engine.connect().close()
+            except DBAPIError as error:
+                _mark_down(error)
+                return None
+            self.info['replica_checked'] = True
+        return engine
+
+
+def _after_commit(session):
+    if session.info.pop('wrote', False) and has_request_context() and current_app.config['REPLICA_DATABASE_URL']:
+        cookie_session['primary_until'] = time.time() + current_app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+
+
+def _handle_error(context):
+    if context.is_disconnect:
+        _mark_down(context.original_exception)
+
+
+def configure(app):
+    """Add the replica bind from REPLICA_DATABASE_URL; call before db.init_app"""
+    if app.config['REPLICA_DATABASE_URL']:
+        app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}),
+                                          BIND_KEY: app.config['REPLICA_DATABASE_URL']}
+
+
+def init_app(app):
+    if not app.config['REPLICA_DATABASE_URL']:
+        return
+    event.listen(RoutingSession, 'after_commit', _after_commit)
+    with app.app_context():
+        event.listen(app.extensions['sqlalchemy'].engines[BIND_KEY], 'handle_error', _handle_error)
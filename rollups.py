@@ -0,0 +1,140 @@
+import statistics
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from __init__ import db
+from models import LostItemModel, FoundItemModel, ClaimModel, DailyItemStat, DailyClaimStat
+
+ITEM_MODELS = {'lost': LostItemModel, 'found': FoundItemModel}
+WINDOW_DAYS = 31  # days rolled up per transaction
+CHUNK_SIZE = 500
+
+
+def last_rolled_up_day():
+    return db.session.query(db.func.max(DailyClaimStat.day)).scalar()
+
+
+def _first_day():
+    starts = [db.session.query(db.func.min(model.created_at)).scalar()
+              for model in (LostItemModel, FoundItemModel, ClaimModel)]
+    starts = [start for start in starts if start]
+    return min(starts).date() if starts else None
+
+
+def _item_created_at(item_type, ids):
+    model = ITEM_MODELS.get(item_type)
+    created = {}
+    if model is None:
+        return created
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        created.update(db.session.query(model.id, model.created_at).filter(
+            model.id.in_(ids[start:start + CHUNK_SIZE])))
+    return created
+
+
+def _roll_up_window(first, last):
+    begin = datetime.combine(first, time.min)
+    end = datetime.combine(last + timedelta(days=1), time.min)
+
+    items = defaultdict(lambda: {'reported': 0, 'expired': 0})
+    for item_type, model in ITEM_MODELS.items():
+        for created_at, category, location in db.session.query(
+            model.created_at, model.category, model.location
+        ).filter(model.created_at >= begin, model.created_at < end):
+            items[(created_at.date(), item_type, category or '', location or '')]['reported'] += 1
+        # Expiries count on the day the item actually expired, whatever its status is now, so a
+        # later reactivation doesn't rewrite the history
+        for expired_at, category, location in db.session.query(
+            model.expired_at, model.category, model.location
+        ).filter(model.expired_at >= begin, model.expired_at < end):
+            items[(expired_at.date(), item_type, category or '', location or '')]['expired'] += 1
+
+    days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+    claims = {day: {'opened': 0, 'approved': 0, 'rejected': 0} for day in days}
+    for (created_at,) in db.session.query(ClaimModel.created_at).filter(
+        ClaimModel.created_at >= begin, ClaimModel.created_at < end
+    ):
+        claims[created_at.date()]['opened'] += 1
+
+    resolved = db.session.query(
+        ClaimModel.status, ClaimModel.item_type, ClaimModel.item_id, ClaimModel.resolved_at
+    ).filter(
+        ClaimModel.status.in_(('approved', 'rejected')),
+        ClaimModel.resolved_at >= begin, ClaimModel.resolved_at < end
+    ).all()
+    item_ids = defaultdict(set)
+    for status, item_type, item_id, resolved_at in resolved:
+        claims[resolved_at.date()][status] += 1
+        if status == 'approved' and item_id:
+            item_ids[item_type].add(item_id)
+    reported_at = {item_type: _item_created_at(item_type, ids) for item_type, ids in item_ids.items()}
+    hours = defaultdict(list)
+    for status, item_type, item_id, resolved_at in resolved:
+        created_at = reported_at.get(item_type, {}).get(item_id)
+        if status == 'approved' and created_at:
+            hours[resolved_at.date()].append((resolved_at - created_at).total_seconds() / 3600)
+
+    if items:
+        db.session.execute(db.insert(DailyItemStat), [
+            {'day': day, 'item_type': item_type, 'category': category, 'location': location, **counts}
+            for (day, item_type, category, location), counts in items.items()
+        ])
+    db.session.execute(db.insert(DailyClaimStat), [
+        {'day': day, **counts,
+         'median_hours_to_claim': round(statistics.median(hours[day]), 1) if hours[day] else None}
+        for day, counts in claims.items()
+    ])
+
+
+def roll_up(until=None, since=None):
+    """Roll up each day not rolled up yet, through yesterday (UTC); returns the number of days
+
+    With `since`, days from that date on are recomputed instead.
+    """
+    until = until or datetime.utcnow().date() - timedelta(days=1)
+    if since is not None:
+        db.session.query(DailyItemStat).filter(DailyItemStat.day >= since).delete(synchronize_session=False)
+        db.session.query(DailyClaimStat).filter(DailyClaimStat.day >= since).delete(synchronize_session=False)
+        first = since
+    else:
+        last = last_rolled_up_day()
+        first = last + timedelta(days=1) if last else _first_day()
+    if first is None or first > until:
+        db.session.commit()
+        return 0
+
+    processed = 0
+    while first <= until:
+        last = min(first + timedelta(days=WINDOW_DAYS - 1), until)
+        _roll_up_window(first, last)
+        db.session.commit()
+        processed += (last - first).days + 1
+        first = last + timedelta(days=1)
+    return processed
+
+
+def series(first, last):
+    """Per-day chart data for [first, last], read from the rollups only"""
+    days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+    rows = {day: {'day': day, 'lost': 0, 'found': 0, 'expired': 0, 'opened': 0,
+                  'approved': 0, 'rejected': 0, 'median_hours_to_claim': None} for day in days}
+    for day, item_type, reported, expired in db.session.query(
+        DailyItemStat.day, DailyItemStat.item_type,
+        db.func.sum(DailyItemStat.reported), db.func.sum(DailyItemStat.expired)
+    ).filter(DailyItemStat.day >= first, DailyItemStat.day <= last).group_by(
+        DailyItemStat.day, DailyItemStat.item_type
+    ):
+        rows[day][item_type] += reported
+        rows[day]['expired'] += expired
+    for stat in DailyClaimStat.query.filter(DailyClaimStat.day >= first, DailyClaimStat.day <= last):
+        rows[stat.day].update(opened=stat.opened, approved=stat.approved, rejected=stat.rejected,
+                              median_hours_to_claim=stat.median_hours_to_claim)
+    return [rows[day] for day in days]
+
+
+def top(column, first, last, limit=10):
+    """[(value, reported)] for a DailyItemStat column over [first, last], most reported first"""
+    total = db.func.sum(DailyItemStat.reported)
+    return db.session.query(column, total).filter(
+        DailyItemStat.day >= first, DailyItemStat.day <= last
+    ).group_by(column).having(total > 0).order_by(total.desc()).limit(limit).all()
@@ -0,0 +1,136 @@
+import re
+import time
+from sqlalchemy import text, inspect, false, Integer, Float
+from __init__ import db
+
+# Per item table: (FTS5 table name on SQLite, GIN index name on Postgres)
+SEARCH_TABLES = {
+    'lost items': ('lost_items_fts', 'ix_lost_items_search_vector'),
+    'found items': ('found_items_fts', 'ix_found_items_search_vector'),
+}
+
+SEARCH_COLUMNS = ('item_name', 'description', 'location')
+
+# Seconds before a table found without its index is checked again, e.g. after `flask init-db`
+RECHECK_SECONDS = 60
+
+# True once the index is there, otherwise the time.monotonic() after which to look again
+_available = {}
+
+
+def _sqlite_statements(table, fts):
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{c}' for c in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{c}' for c in SEARCH_COLUMNS)
+    return [
+        f'''CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {columns}, content='{table}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2')''',
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{table}" BEGIN
+                INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{table}" BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON "{table}" BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});
+            END''',
+    ]
+
+
+def _postgres_statements(table, index):
+    # Locations are stored as slugs (library_steve_biko), so split them into words
+    return [
+        f'''ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(item_name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+                setweight(to_tsvector('simple', replace(coalesce(location, ''), '_', ' ')), 'C')
+            ) STORED''',
+        f'CREATE INDEX IF NOT EXISTS {index} ON "{table}" USING GIN (search_vector)',
+    ]
+
+
+def install_search_indexes(conn):
+    """Create the full-text index for each item table and populate it from existing rows"""
+    dialect = conn.dialect.name
+    for table, (fts, index) in SEARCH_TABLES.items():
+        if dialect == 'sqlite':
+            exists = inspect(conn).has_table(fts)
+            for statement in _sqlite_statements(table, fts):
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        elif dialect == 'postgresql':
+            for statement in _postgres_statements(table, index):
+                conn.execute(text(statement))
+    _available.clear()
+
+
+def _index_exists(engine, model):
+    fts, _ = SEARCH_TABLES[model.__tablename__]
+    if engine.dialect.name == 'sqlite':
+        return inspect(engine).has_table(fts)
+    if engine.dialect.name == 'postgresql':
+        columns = inspect(engine).get_columns(model.__tablename__)
+        return any(c['name'] == 'search_vector' for c in columns)
+    return False
+
+
+def _search_available(model):
+    engine = db.engine
+    key = (engine.url, model.__tablename__)
+    cached = _available.get(key)
+    if cached is True:
+        return True
+    # Not there last time: the index may be installed later by another process
+    if cached is not None and time.monotonic() < cached:
+        return False
+    available = _index_exists(engine, model)
+    _available[key] = True if available else time.monotonic() + RECHECK_SECONDS
+    return available
+
+
+def _terms(search_text):
+    return re.findall(r'\w+', search_text.lower())
+
+
+def _ranked_ids(model, terms):
+    table = model.__tablename__
+    fts, _ = SEARCH_TABLES[table]
+    if db.engine.dialect.name == 'sqlite':
+        # Prefix match on every term; bm25 is lower-is-better, so negate it
+        match = ' '.join(f'"{term}"*' for term in terms)
+        statement = text(
+            f'SELECT rowid AS id, -bm25({fts}, 10.0, 4.0, 1.0) AS rank '
+            f'FROM {fts} WHERE {fts} MATCH :match'
+        ).bindparams(match=match)
+    else:
+        match = ' & '.join(f'{term}:*' for term in terms)
+        statement = text(
+            f'SELECT id, ts_rank_cd(search_vector, q) AS rank '
+            f'FROM "{table}", to_tsquery(\'english\', :match) AS q '
+            f'WHERE search_vector @@ q'
+        ).bindparams(match=match)
+    return statement.columns(id=Integer, rank=Float).subquery()
+
+
+def apply_search(query, model, search_text):
+    """Restrict an item query to rows matching search_text, most relevant first"""
+    terms = _terms(search_text)
+    if not terms:
+        # Nothing searchable (e.g. only punctuation) matches nothing, not everything
+        return query.filter(false())
+
+    if not _search_available(model):
+        for term in terms:
+            query = query.filter(
+                model.item_name.contains(term) |
+                model.description.contains(term) |
+                model.location.contains(term)
+            )
+        return query
+
+    ranked = _ranked_ids(model, terms)
+    return query.join(ranked, ranked.c.id == model.id).order_by(ranked.c.rank.desc())
@@ -0,0 +1,91 @@
+import threading
+from flask import render_template
+from markupsafe import Markup
+from sqlalchemy import event
+from __init__ import db
+from models import LostItemModel, FoundItemModel, CacheVersion
+
+HOME_RECENT_ITEMS = 'home_recent_items'
+RECENT_LIMIT = 6
+
+# Which cached views a write to each model makes stale
+INVALIDATES = {
+    LostItemModel: (HOME_RECENT_ITEMS,),
+    FoundItemModel: (HOME_RECENT_ITEMS,),
+}
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def current_version(name):
+    version = db.session.query(CacheVersion.version).filter_by(name=name).scalar()
+    return version or 0
+
+
+def bump(connection, names):
+    """Invalidate cached views; runs on the writer's connection so it commits or rolls back with it"""
+    table = CacheVersion.__table__
+    for name in names:
+        result = connection.execute(
+            table.update().where(table.c.name == name).values(version=table.c.version + 1))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=1))
+
+
+def _stale_names(objects, session):
+    names = set()
+    for obj in objects:
+        if type(obj) in INVALIDATES and (obj not in session.dirty or session.is_modified(obj)):
+            names.update(INVALIDATES[type(obj)])
+    return names
+
+
+def _before_flush(session, flush_context, instances):
+    names = _stale_names(list(session.new) + list(session.dirty) + list(session.deleted), session)
+    if names:
+        session.info.setdefault('stale_snapshots', set()).update(names)
+
+
+def _after_flush(session, flush_context):
+    names = session.info.pop('stale_snapshots', None)
+    if names:
+        bump(session.connection(), sorted(names))
+
+
+def _do_orm_execute(state):
+    # query.update()/delete() and bulk inserts bypass the flush, so catch them here
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return
+    mapper = state.bind_mapper
+    if mapper is not None and mapper.class_ in INVALIDATES:
+        bump(state.session.connection(), INVALIDATES[mapper.class_])
+
+
+def _render_recent_items():
+    recent_lost = LostItemModel.query.filter_by(status='active').order_by(
+        LostItemModel.created_at.desc()).limit(RECENT_LIMIT).all()
+    recent_found = FoundItemModel.query.filter_by(status='active').order_by(
+        FoundItemModel.created_at.desc()).limit(RECENT_LIMIT).all()
+    return render_template('home_recent_items.html',
+                           recent_lost=recent_lost,
+                           recent_found=recent_found)
+
+
+def recent_items():
+    """Rendered recent lost/found cards, re-rendered only after an item write"""
+    version = current_version(HOME_RECENT_ITEMS)
+    cached = _snapshots.get(HOME_RECENT_ITEMS)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    html = Markup(_render_recent_items())
+    with _lock:
+        _snapshots[HOME_RECENT_ITEMS] = (version, html)
+    return html
+
+
+def init_app(app):
+    event.listen(db.session, 'before_flush', _before_flush)
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'do_orm_execute', _do_orm_execute)
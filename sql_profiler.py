@@ -0,0 +1,112 @@
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('lostandfound.sql')
+
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+STACK_FRAMES = 6
+PARAMETER_CHARS = 300
+REPO = os.path.dirname(os.path.abspath(__file__))
+# Expanded IN lists differ only in their number of placeholders
+IN_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)')
+SPACE = re.compile(r'\s+')
+
+_slow_seconds = None
+_repeat_threshold = None
+
+
+def shape(statement):
+    """A statement with IN lists collapsed, so N lazy loads of one relationship compare equal"""
+    return SPACE.sub(' ', IN_LIST.sub('(?)', statement)).strip()
+
+
+def _stack():
+    # Application frames only: the view or helper that issued the statement, not SQLAlchemy
+    frames = [frame for frame in traceback.extract_stack()
+              if frame.filename.startswith(REPO) and frame.filename != __file__
+              and 'site-packages' not in frame.filename]
+    return ''.join(traceback.format_list(frames[-STACK_FRAMES:])).rstrip()
+
+
+def _parameters(parameters, executemany):
+    if executemany:
+        text = f'{len(parameters)} sets, first {parameters[0]!r}' if parameters else '[]'
+    else:
+        text = repr(parameters)
+    return text if len(text) <= PARAMETER_CHARS else text[:PARAMETER_CHARS] + '...'
+
+
+def _route():
+    return f'{request.method} {request.path} ({request.endpoint})' if has_request_context() else '-'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context, so one that raises leaves nothing on the connection
+    if context is not None:
+        context.profiler_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'profiler_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if elapsed >= _slow_seconds:
+        logger.warning('Slow query %.1f ms on %s\n  %s\n  parameters: %s\n%s', elapsed * 1000, _route(),
+                       SPACE.sub(' ', statement).strip(), _parameters(parameters, executemany), _stack())
+    if has_request_context():
+        profile = g.get('sql_profile')
+        if profile is None:
+            profile = g.sql_profile = {'shapes': Counter(), 'stacks': {}, 'seconds': Counter()}
+        key = shape(statement)
+        profile['shapes'][key] += 1
+        profile['seconds'][key] += elapsed
+        if profile['shapes'][key] == 2:
+            # Where the repetition starts is where a joinedload/selectinload belongs
+            profile['stacks'][key] = _stack()
+
+
+def _summarize(exc=None):
+    profile = g.pop('sql_profile', None)
+    if profile is None:
+        return
+    repeated = [(count, key) for key, count in profile['shapes'].items() if count >= _repeat_threshold]
+    if not repeated:
+        return
+    total = sum(profile['shapes'].values())
+    lines = [f'Possible N+1 on {_route()}: {total} statements, {len(profile["shapes"])} distinct']
+    for count, key in sorted(repeated, reverse=True):
+        lines.append(f'  {count}x ({profile["seconds"][key] * 1000:.1f} ms): {key}')
+        lines.append('\n'.join('    ' + line for line in profile['stacks'].get(key, '').splitlines()))
+    logger.warning('\n'.join(lines))
+
+
+def init_app(app):
+    global _slow_seconds, _repeat_threshold
+    # Opt-in: development and staging only
+    if not app.config['SQL_PROFILER']:
+        return
+    _slow_seconds = app.config['SQL_SLOW_MS'] / 1000
+    _repeat_threshold = app.config['SQL_REPEAT_THRESHOLD']
+    path = app.config['SQL_PROFILER_LOG'] or os.path.join(app.instance_path, 'sql_profiler.log')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if not any(getattr(handler, 'baseFilename', None) == os.path.abspath(path) for handler in logger.handlers):
+        handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter('[%(asctime)s] pid %(process)d %(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.teardown_request(_summarize)
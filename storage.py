@@ -0,0 +1,270 @@
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, request, send_from_directory, abort
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+from __init__ import db
+from models import PhotoBlob, LostItemModel, FoundItemModel
+from images import remove_renditions, schedule_renditions
+
+CHUNK_SIZE = 64 * 1024
+EXTENSION_ALIASES = {'.jpeg': '.jpg'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+BLOB_PATH = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+RELEASE_CHUNK_SIZE = 500
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def blob_path(digest, extension):
+    """Sharded location of a blob relative to the upload folder: ab/cd/abcd...ef.jpg"""
+    return f'{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def _extension(filename):
+    extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    return EXTENSION_ALIASES.get(extension, extension) or '.jpg'
+
+
+def save_upload(file_storage):
+    """Stream an upload to disk, hashing it as it is written, and take a reference to it
+
+    Identical content is stored once; the returned path is what items keep in
+    photo_filename. The reference is part of the current transaction: the file is
+    moved into place (and its renditions queued) when it commits, and deleted if
+    it doesn't.
+    """
+    return _store(file_storage.stream, file_storage.filename)
+
+
+def save_file(path):
+    """Take a reference to a file on disk (bulk imports), exactly as save_upload does"""
+    with open(path, 'rb') as stream:
+        return _store(stream, path)
+
+
+def _store(stream, filename):
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=upload_folder, prefix='.upload-', delete=False) as temporary:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            temporary.write(chunk)
+            size += len(chunk)
+    digest = digest.hexdigest()
+
+    try:
+        path = _reference(db.session.connection(), digest, blob_path(digest, _extension(filename)), size)
+    except Exception:
+        os.remove(temporary.name)
+        raise
+    db.session.info.setdefault('pending_photos', []).append((temporary.name, path))
+    return path
+
+
+def _reference(connection, digest, path, size):
+    # One statement, so concurrent uploads of the same content can't both miss the row and
+    # collide on the unique sha256: the second waits for the first and counts a reference
+    table = PhotoBlob.__table__
+    values = {'sha256': digest, 'path': path, 'size': size, 'ref_count': 1}
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        return connection.execute(insert(table).values(**values).on_conflict_do_update(
+            index_elements=[table.c.sha256], set_={'ref_count': table.c.ref_count + 1}
+        ).returning(table.c.path)).scalar_one()
+    stored = connection.execute(db.select(table.c.path).where(table.c.sha256 == digest)).scalar()
+    if stored is None:
+        connection.execute(table.insert().values(**values))
+        return path
+    connection.execute(table.update().where(table.c.sha256 == digest).values(ref_count=table.c.ref_count + 1))
+    return stored
+
+
+def content_digest(path):
+    """SHA-256 a blob path was named after, or None for uploads that predate content addressing"""
+    match = BLOB_PATH.search(path or '')
+    return match.group(1) if match else None
+
+
+def send_photo(path, variant=None, immutable=None):
+    """Serve a file (or a rendition variant) from the upload folder with caching suited to its URL
+
+    Content-addressed paths never change, so they get a strong ETag derived
+    from the digest and a year of immutable caching; anything else must be
+    revalidated. With PHOTO_OFFLOAD set, the bytes are left to the proxy via
+    X-Accel-Redirect (nginx) or X-Sendfile (Apache).
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    full_path = safe_join(upload_folder, path)
+    if full_path is None or not os.path.isfile(full_path):
+        abort(404)
+
+    digest = content_digest(path)
+    if immutable is None:
+        immutable = digest is not None
+    etag = f'{digest}-{variant}' if digest and variant else digest
+
+    offload = current_app.config['PHOTO_OFFLOAD']
+    if offload:
+        stat = os.stat(full_path)
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        response.set_etag(etag or f'{int(stat.st_mtime)}-{stat.st_size}')
+        response.last_modified = stat.st_mtime
+        if offload == 'nginx':
+            response.headers['X-Accel-Redirect'] = current_app.config['PHOTO_OFFLOAD_PREFIX'] + path
+        else:
+            response.headers['X-Sendfile'] = os.path.abspath(full_path)
+        # Answer revalidations here; Range requests are handled by the proxy
+        response.make_conditional(request)
+    else:
+        # send_file answers If-None-Match/If-Modified-Since with 304 and Range with 206
+        response = send_from_directory(upload_folder, path, etag=etag or True)
+
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def _referenced_by_items(paths):
+    referenced = set()
+    for model in (LostItemModel, FoundItemModel):
+        referenced.update(row[0] for row in db.session.query(model.photo_filename).filter(
+            model.photo_filename.in_(paths)))
+    return referenced
+
+
+def release(paths):
+    """Drop one reference per path; files whose last reference goes are removed after commit
+
+    Call after the referencing rows have been deleted (or flushed as deleted).
+    Works a chunk of paths at a time, so it suits bulk deletes too.
+    """
+    references = Counter(filter(None, paths))
+    distinct = sorted(references)
+    orphaned = db.session.info.setdefault('orphaned_photos', set())
+    for start in range(0, len(distinct), RELEASE_CHUNK_SIZE):
+        chunk = distinct[start:start + RELEASE_CHUNK_SIZE]
+        blobs = {path for (path,) in db.session.query(PhotoBlob.path).filter(PhotoBlob.path.in_(chunk))}
+        # Uploaded before content addressing: only remove if no item still uses the name
+        legacy = set(chunk) - blobs
+        if legacy:
+            orphaned.update(legacy - _referenced_by_items(legacy))
+        if not blobs:
+            continue
+        by_count = defaultdict(list)
+        for path in blobs:
+            by_count[references[path]].append(path)
+        for count, group in by_count.items():
+            db.session.query(PhotoBlob).filter(PhotoBlob.path.in_(group)).update(
+                {PhotoBlob.ref_count: PhotoBlob.ref_count - count}, synchronize_session=False)
+        unreferenced = PhotoBlob.path.in_(blobs) & (PhotoBlob.ref_count <= 0)
+        orphaned.update(path for (path,) in db.session.query(PhotoBlob.path).filter(unreferenced))
+        db.session.query(PhotoBlob).filter(unreferenced).delete(synchronize_session=False)
+
+
+def remove_files(upload_folder, paths):
+    for path in paths:
+        full_path = os.path.join(upload_folder, path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+        remove_renditions(upload_folder, path)
+        # Tidy the two shard directories if this was their last file
+        shard = os.path.dirname(path)
+        while shard:
+            try:
+                os.rmdir(os.path.join(upload_folder, shard))
+            except OSError:
+                break
+            shard = os.path.dirname(shard)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    # A pool inherited across fork has no threads; start a fresh one per process
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='photo-removal')
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _remove_orphans(app, paths):
+    with app.app_context():
+        try:
+            # The same content may have been uploaded again since the delete committed
+            kept = {path for (path,) in db.session.query(PhotoBlob.path).filter(PhotoBlob.path.in_(paths))}
+            kept |= _referenced_by_items(paths)
+            remove_files(app.config['UPLOAD_FOLDER'], [path for path in paths if path not in kept])
+        except Exception as e:
+            app.logger.error(f'Could not remove {len(paths)} photos: {str(e)}')
+        finally:
+            db.session.remove()
+
+
+def schedule_removal(paths):
+    """Remove unreferenced photo files and their renditions off the request thread"""
+    paths = sorted(paths)
+    app = current_app._get_current_object()
+    with _lock:
+        executor = _get_executor()
+    return executor.submit(_remove_orphans, app, paths)
+
+
+def _place(upload_folder, pending):
+    for temporary, path in pending:
+        target = os.path.join(upload_folder, path)
+        if os.path.exists(target):
+            os.remove(temporary)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temporary, target)
+        schedule_renditions(path)
+
+
+def _after_commit(session):
+    pending = session.info.pop('pending_photos', None)
+    if pending:
+        _place(current_app.config['UPLOAD_FOLDER'], pending)
+    paths = session.info.pop('orphaned_photos', None)
+    if paths:
+        schedule_removal(paths)
+
+
+def _after_rollback(session):
+    session.info.pop('orphaned_photos', None)
+
+
+def _after_transaction_end(session, transaction):
+    # Uploads whose reference never committed (rolled back, or the session closed) leave nothing behind
+    if transaction.parent is None:
+        for temporary, _ in session.info.pop('pending_photos', []):
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+
+def init_app(app):
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
+    event.listen(db.session, 'after_transaction_end', _after_transaction_end)
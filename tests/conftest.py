@@ -0,0 +1,161 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+from flask import g
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The project folder has an __init__.py, so pytest doesn't put it on sys.path by itself
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix='lostandfound-tests-')
+DATABASE = os.path.join(WORKDIR, 'test.db')
+TEMPLATE = os.path.join(WORKDIR, 'template.db')
+
+# The project package (and with it config.Config) is imported before this file, so the
+# settings go on Config itself rather than in the environment
+from config import Config
+
+for name, value in {
+    'SQLALCHEMY_DATABASE_URI': f'sqlite:///{DATABASE}',
+    'UPLOAD_FOLDER': os.path.join(WORKDIR, 'uploads'),
+    'SECRET_KEY': 'test',
+    'ACTIVITY_LOG_MODE': 'sync',
+    # Buffered-mode tests flush by hand, or by filling a batch
+    'ACTIVITY_FLUSH_INTERVAL': 3600,
+    'EXPIRY_INTERVAL': 0,
+    'USER_CACHE_TTL': 0,
+    'PASSWORD_HASH_WORKERS': 0,
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'METRICS_ENABLED': False,
+    'SQL_PROFILER': False,
+    'REPLICA_DATABASE_URL': '',
+}.items():
+    setattr(Config, name, value)
+
+
+def _remove_database():
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(DATABASE + suffix):
+            os.remove(DATABASE + suffix)
+
+
+@pytest.fixture(scope='session')
+def _schema():
+    from app import app
+    from __init__ import db
+    import bootstrap
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+    @app.teardown_request
+    def forget_user(exc):
+        # Requests reuse the test's app context, and with it g; load the user afresh each time
+        g.pop('_login_user', None)
+
+    with app.app_context():
+        bootstrap.create_schema()
+        bootstrap.seed_defaults()
+        bootstrap.ensure_user('admin', 'admin@example.com', 'admin-password', role='admin')
+        bootstrap.ensure_user('student', 'student@example.com', 'student-password')
+        db.session.remove()
+        db.engine.dispose()
+    shutil.copy(DATABASE, TEMPLATE)
+    yield app
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def app(_schema):
+    """The app on a fresh copy of the seeded database, inside an app context"""
+    from __init__ import db
+
+    with _schema.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    _remove_database()
+    shutil.copy(TEMPLATE, DATABASE)
+    with _schema.app_context():
+        yield _schema
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, username):
+    from models import User
+
+    user = User.query.filter_by(username=username).one()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    return user
+
+
+@pytest.fixture
+def admin_client(client):
+    login(client, 'admin')
+    return client
+
+
+@pytest.fixture
+def student_client(client):
+    login(client, 'student')
+    return client
+
+
+@pytest.fixture
+def upload_folder(app, tmp_path):
+    """An empty upload folder for this test"""
+    previous = app.config['UPLOAD_FOLDER']
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    yield str(tmp_path)
+    app.config['UPLOAD_FOLDER'] = previous
+
+
+@pytest.fixture
+def item_values():
+    """Column values for a valid lost (or found) item, with any of them overridden"""
+    from models import FoundItemModel
+
+    def item_values(model=None, **values):
+        defaults = dict(item_name='Backpack', category='Bags', description='Blue backpack with a laptop',
+                        location='Library', full_names='Test Student', student_number='21000000',
+                        student_email='student@example.com')
+        if model is FoundItemModel:
+            defaults['current_location'] = 'Front desk'
+        return dict(defaults, **values)
+    return item_values
+
+
+@pytest.fixture
+def make_item(app, item_values):
+    """Add a lost item (or an item of the given model) to the session"""
+    from __init__ import db
+    from models import LostItemModel
+
+    def make_item(model=LostItemModel, **values):
+        item = model(**item_values(model, **values))
+        db.session.add(item)
+        return item
+    return make_item
+
+
+@pytest.fixture
+def make_claim(app):
+    """Add a pending claim on a lost item to the session"""
+    from __init__ import db
+    from models import ClaimModel
+
+    def make_claim(**values):
+        defaults = dict(full_names='Test Student', student_number='21000000', student_email='student@example.com',
+                        description='That is mine', item_type='lost', item_id=1)
+        claim = ClaimModel(**dict(defaults, **values))
+        db.session.add(claim)
+        return claim
+    return make_claim
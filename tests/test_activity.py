@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from __init__ import db
+from models import User, UserActivity
+import activity
+
+
+@pytest.fixture
+def buffered(app):
+    app.config['ACTIVITY_LOG_MODE'] = 'buffered'
+    activity.flush()
+    yield
+    activity.flush()
+    app.config['ACTIVITY_LOG_MODE'] = 'sync'
+
+
+def _user_id():
+    return User.query.filter_by(username='student').one().id
+
+
+def _actions():
+    db.session.expire_all()
+    return sorted(row.action for row in UserActivity.query)
+
+
+def _record(app, *actions, commit=True):
+    user_id = _user_id()
+    with app.test_request_context('/'):
+        for action in actions:
+            activity.record(user_id, action)
+        if commit:
+            db.session.commit()
+        else:
+            db.session.rollback()
+
+
+def test_sync_rows_commit_with_the_request(app):
+    _record(app, 'login')
+    assert _actions() == ['login']
+
+
+def test_sync_rows_roll_back_with_the_request(app):
+    _record(app, 'login', commit=False)
+    assert _actions() == []
+
+
+def test_buffered_rows_wait_for_a_flush(app, buffered):
+    _record(app, 'login', 'logout')
+    assert _actions() == []
+    assert activity.flush() == 2
+    assert _actions() == ['login', 'logout']
+    assert activity.flush() == 0
+
+
+def test_buffered_rows_are_dropped_on_rollback(app, buffered):
+    _record(app, 'login', commit=False)
+    _record(app, 'logout')
+    assert activity.flush() == 1
+    assert _actions() == ['logout']
+
+
+def test_full_batch_wakes_the_flusher(app, buffered):
+    app.config['ACTIVITY_BATCH_SIZE'] = 2
+    try:
+        _record(app, 'login', 'logout')
+        deadline = time.monotonic() + 5
+        while _actions() != ['login', 'logout'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        app.config['ACTIVITY_BATCH_SIZE'] = 100
+    assert _actions() == ['login', 'logout']
+
+
+def test_failed_flush_keeps_the_newest_rows_up_to_the_limit(app, buffered, monkeypatch):
+    app.config['ACTIVITY_BUFFER_LIMIT'] = 3
+    try:
+        def unreachable(rows):
+            raise RuntimeError('database unreachable')
+
+        monkeypatch.setattr(activity, '_write', unreachable)
+        _record(app, 'a', 'b')
+        assert activity.flush() == 0
+        _record(app, 'c', 'd')
+        assert activity.flush() == 0
+        monkeypatch.undo()
+        assert activity.flush() == 3
+    finally:
+        app.config['ACTIVITY_BUFFER_LIMIT'] = 10000
+    assert _actions() == ['b', 'c', 'd']
+
+
+def test_buffer_is_flushed_at_exit(app, buffered, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(activity.atexit, 'register', hooks.append)
+    monkeypatch.setattr(activity.event, 'listen', lambda *args: None)
+    activity.init_app(app)
+    _record(app, 'logout')
+    for hook in hooks:
+        hook()
+    assert _actions() == ['logout']
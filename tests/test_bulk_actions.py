@@ -0,0 +1,110 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from werkzeug.datastructures import FileStorage
+
+from __init__ import db
+from models import LostItemModel, FoundItemModel, PhotoBlob
+import counters
+import storage
+
+CHUNK = 2
+
+
+@pytest.fixture
+def chunked(app, monkeypatch):
+    monkeypatch.setattr('app.BULK_CHUNK_SIZE', CHUNK)
+    # Tiny chunks mean many more statements than a real request makes
+    monkeypatch.setitem(app.config, 'QUERY_BUDGET', 0)
+
+
+@pytest.fixture
+def statements(app):
+    """Item UPDATE and DELETE statements sent while the test runs"""
+    sent = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.startswith(('UPDATE "lost items"', 'DELETE FROM "lost items"')):
+            sent.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield sent
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def _items(make_item, count, **values):
+    items = [make_item(item_name=f'Item {n}', category='Books' if n % 2 else 'Bags', **values) for n in range(count)]
+    db.session.commit()
+    return [item.id for item in items]
+
+
+def _bulk(client, action, ids, item_type='lost'):
+    response = client.post(f'/admin/bulk-action/{item_type}', data={'action': action, 'item_ids': json.dumps(ids)})
+    assert response.status_code == 302
+    db.session.expire_all()
+
+
+def test_update_runs_one_statement_per_chunk(admin_client, make_item, chunked, statements):
+    ids = _items(make_item, 5)
+    _bulk(admin_client, 'verify', ids)
+    assert len([s for s in statements if s.startswith('UPDATE')]) == 3
+    assert all(item.is_verified for item in LostItemModel.query)
+
+
+def test_expire_counts_and_keeps_earlier_expiry(admin_client, make_item, chunked):
+    expired_at = datetime(2025, 1, 1)
+    earlier = make_item(item_name='Old', status='expired')
+    ids = _items(make_item, 5) + [earlier.id]
+    LostItemModel.query.filter_by(id=earlier.id).update({LostItemModel.expired_at: expired_at})
+    db.session.commit()
+    _bulk(admin_client, 'expire', ids)
+
+    snapshot = counters.snapshot()
+    assert counters.total(snapshot, 'lost', 'active') == 0
+    assert counters.total(snapshot, 'lost', 'expired') == 6
+    assert snapshot[('lost', 'expired', 'Books')] == 2
+    assert db.session.get(LostItemModel, earlier.id).expired_at == expired_at
+    assert LostItemModel.query.filter(LostItemModel.expired_at > expired_at).count() == 5
+
+
+def test_unselected_items_are_untouched(admin_client, make_item, chunked):
+    ids = _items(make_item, 5)
+    _bulk(admin_client, 'expire', ids[:3])
+    assert counters.total(counters.snapshot(), 'lost', 'active') == 2
+    assert sorted(item.id for item in LostItemModel.query.filter_by(status='active')) == ids[3:]
+
+
+def test_delete_runs_per_chunk_and_updates_counters(admin_client, make_item, chunked, statements):
+    ids = _items(make_item, 5)
+    found = make_item(FoundItemModel)
+    db.session.commit()
+    _bulk(admin_client, 'delete', ids[:4])
+
+    assert len([s for s in statements if s.startswith('DELETE')]) == 2
+    assert [item.id for item in LostItemModel.query] == ids[4:]
+    assert counters.total(counters.snapshot(), 'lost') == 1
+    assert counters.total(counters.snapshot(), 'found') == 1
+    assert db.session.get(FoundItemModel, found.id) is not None
+
+
+def test_delete_releases_photos(admin_client, make_item, chunked, upload_folder, monkeypatch):
+    shared, own = (storage.save_upload(FileStorage(io.BytesIO(data), filename='photo.jpg'))
+                   for data in (b'shared', b'own'))
+    storage.save_upload(FileStorage(io.BytesIO(b'shared'), filename='copy.jpg'))
+    kept = make_item(item_name='Kept', photo_filename=shared)
+    deleted = [make_item(item_name='Shared', photo_filename=shared), make_item(item_name='Own', photo_filename=own),
+               make_item(item_name='No photo')]
+    db.session.commit()
+
+    released = []
+    release = storage.release
+    monkeypatch.setattr(storage, 'release', lambda paths: released.extend(paths) or release(paths))
+    _bulk(admin_client, 'delete', [item.id for item in deleted])
+
+    assert sorted(released) == sorted([shared, own])
+    # The kept item still holds the shared blob; the other one lost its last reference
+    assert {blob.path: blob.ref_count for blob in PhotoBlob.query} == {shared: 1}
+    assert LostItemModel.query.one().id == kept.id
@@ -0,0 +1,112 @@
+from collections import Counter
+
+from __init__ import db
+from models import LostItemModel, FoundItemModel, ItemCounter
+import counters
+
+
+def _recount():
+    counts = Counter()
+    for model, entity in counters.ENTITIES.items():
+        category = counters._category_column(model)
+        for status, row_category, count in db.session.query(model.status, category, db.func.count()).group_by(
+                model.status, category):
+            counts[(entity, status, row_category or '')] += count
+    return counts
+
+
+def _assert_in_step():
+    assert +Counter(counters.snapshot()) == _recount()
+
+
+def test_insert(make_item, make_claim):
+    make_item()
+    make_item(category='Books')
+    make_item(FoundItemModel, status='claimed')
+    make_claim()
+    db.session.commit()
+    _assert_in_step()
+    assert counters.snapshot()[('lost', 'active', 'Bags')] == 1
+    assert counters.snapshot()[('claim', 'pending', '')] == 1
+
+
+def test_update(make_item):
+    item = make_item()
+    db.session.commit()
+    item.status = 'claimed'
+    item.category = 'Electronics'
+    db.session.commit()
+    item.description = 'Only the description changes'
+    db.session.commit()
+    _assert_in_step()
+    assert counters.snapshot()[('lost', 'active', 'Bags')] == 0
+    assert counters.snapshot()[('lost', 'claimed', 'Electronics')] == 1
+
+
+def test_bulk_insert(app, item_values):
+    rows = [item_values(FoundItemModel, item_name=f'Item {n}', category='Books' if n % 2 else 'Bags', status='active')
+            for n in range(5)]
+    db.session.execute(db.insert(FoundItemModel), rows)
+    db.session.commit()
+    _assert_in_step()
+    assert counters.snapshot()[('found', 'active', 'Books')] == 2
+
+
+def test_bulk_update(make_item):
+    make_item(category='Bags')
+    make_item(category='Books')
+    make_item(category='Books', status='claimed')
+    db.session.commit()
+    updated = LostItemModel.query.filter(LostItemModel.category == 'Books').update(
+        {LostItemModel.status: 'expired'}, synchronize_session=False)
+    db.session.commit()
+    assert updated == 2
+    _assert_in_step()
+    assert counters.snapshot()[('lost', 'expired', 'Books')] == 2
+
+    # Values computed in SQL are read back after the statement
+    db.session.execute(db.update(LostItemModel).values(category=LostItemModel.location))
+    db.session.commit()
+    _assert_in_step()
+    assert counters.snapshot()[('lost', 'expired', 'Library')] == 2
+
+
+def test_bulk_update_of_untracked_columns(make_item):
+    make_item()
+    db.session.commit()
+    before = counters.snapshot()
+    LostItemModel.query.update({LostItemModel.is_verified: True}, synchronize_session=False)
+    db.session.commit()
+    assert counters.snapshot() == before
+
+
+def test_delete(make_item):
+    items = [make_item(), make_item(category='Books'), make_item(category='Books')]
+    db.session.commit()
+    db.session.delete(items[0])
+    db.session.commit()
+    _assert_in_step()
+
+    deleted = LostItemModel.query.filter_by(category='Books').delete(synchronize_session=False)
+    db.session.commit()
+    assert deleted == 2
+    _assert_in_step()
+    assert counters.total(counters.snapshot(), 'lost') == 0
+
+
+def test_rolled_back_changes_are_not_counted(make_item):
+    make_item()
+    db.session.commit()
+    LostItemModel.query.update({LostItemModel.status: 'claimed'}, synchronize_session=False)
+    db.session.rollback()
+    _assert_in_step()
+
+
+def test_reconcile_command(app, make_item):
+    make_item()
+    db.session.commit()
+    db.session.query(ItemCounter).update({ItemCounter.count: 99}, synchronize_session=False)
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['counters-reconcile'])
+    assert result.output == 'Counters rebuilt\n'
+    _assert_in_step()
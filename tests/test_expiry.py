@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from __init__ import db
+from models import LostItemModel, JobLease
+import counters
+import expiry
+
+
+def test_due_items_expire(make_item):
+    due = make_item(expires_at=datetime.utcnow() - timedelta(days=1))
+    later = make_item(expires_at=datetime.utcnow() + timedelta(days=1))
+    db.session.commit()
+    run = expiry.run_expiry('cli')
+    assert run.lost_expired == 1
+    assert (due.status, later.status) == ('expired', 'active')
+    assert due.expired_at is not None
+
+
+def test_items_resolved_after_the_batch_was_selected_keep_their_status(make_item):
+    item = make_item(expires_at=datetime.utcnow() - timedelta(days=1))
+    db.session.commit()
+    table = LostItemModel.__table__
+
+    def resolve_first(state):
+        # An admin resolves the item between the run's SELECT and its UPDATE
+        if state.is_update and state.bind_mapper is not None and state.bind_mapper.class_ is LostItemModel:
+            state.session.connection().execute(table.update().where(table.c.id == item.id).values(status='claimed'))
+
+    event.listen(db.session, 'do_orm_execute', resolve_first, insert=True)
+    try:
+        assert expiry._expire_batch('lost', LostItemModel, datetime.utcnow(), 10) == 0
+    finally:
+        event.remove(db.session, 'do_orm_execute', resolve_first)
+    db.session.commit()
+    db.session.expire_all()
+    assert (item.status, item.expired_at) == ('claimed', None)
+    assert not counters.snapshot().get(('lost', 'expired', 'Bags'))
+
+
+def test_one_scheduler_holds_the_lease(app, monkeypatch):
+    until = datetime.utcnow() + timedelta(minutes=5)
+    assert expiry._take_lease(until)
+    monkeypatch.setattr(expiry, '_holder', lambda: 'other-host:1')
+    assert not expiry._take_lease(until)
+
+
+def test_lapsed_lease_can_be_taken_over(app, monkeypatch):
+    assert expiry._take_lease(datetime.utcnow() + timedelta(minutes=5))
+    # The holder released it with its next-run time, which has now passed
+    expiry._release_lease(datetime.utcnow() - timedelta(seconds=1))
+    monkeypatch.setattr(expiry, '_holder', lambda: 'other-host:1')
+    assert expiry._take_lease(datetime.utcnow() + timedelta(minutes=5))
+    assert db.session.get(JobLease, expiry.LEASE_NAME).holder == 'other-host:1'
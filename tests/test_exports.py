@@ -0,0 +1,32 @@
+import csv
+import io
+from datetime import datetime
+
+import pytest
+
+from __init__ import db
+
+
+@pytest.fixture
+def items(make_item):
+    for n, created_at in enumerate(['2025-03-09 23:59', '2025-03-10 00:00', '2025-03-12 18:30', '2025-03-13 00:00']):
+        make_item(item_name=f'Item {n}', created_at=datetime.strptime(created_at, '%Y-%m-%d %H:%M'))
+    db.session.commit()
+
+
+def _names(response):
+    assert response.status_code == 200
+    return [row['item_name'] for row in csv.DictReader(io.StringIO(response.get_data(as_text=True)))]
+
+
+def test_since_and_until_days_are_included(admin_client, items):
+    response = admin_client.get('/admin/export/lost.csv?since=2025-03-10&until=2025-03-12')
+    assert _names(response) == ['Item 1', 'Item 2']
+
+
+def test_single_day(admin_client, items):
+    assert _names(admin_client.get('/admin/export/lost.csv?since=2025-03-12&until=2025-03-12')) == ['Item 2']
+
+
+def test_invalid_day_is_rejected(admin_client, items):
+    assert admin_client.get('/admin/export/lost.csv?until=March').status_code == 400
@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import event
+
+from __init__ import db
+from models import User
+import identity
+import snapshots
+
+
+@pytest.fixture
+def cached(app):
+    app.config['USER_CACHE_TTL'] = 30
+    identity._cache.clear()
+    identity._version[0] = None
+    yield
+    identity._cache.clear()
+    identity._version[0] = None
+    app.config['USER_CACHE_TTL'] = 0
+
+
+def _admin():
+    return User.query.filter_by(username='admin').one()
+
+
+def _statements(load):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        load()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return statements
+
+
+def _bump_elsewhere():
+    # As another worker would: the bump reaches this worker only through the database
+    with db.engine.begin() as connection:
+        snapshots.bump(connection, [identity.USERS])
+
+
+def test_cached_identity_runs_no_query(cached):
+    user_id = _admin().id
+    identity.load(user_id)
+    assert _statements(lambda: identity.load(user_id).role) == []
+
+
+def test_other_workers_edits_are_seen_at_the_next_version_check(cached, monkeypatch):
+    admin = _admin()
+    identity.load(admin.id)
+    _bump_elsewhere()
+    statements = _statements(lambda: identity.load(admin.id))
+    assert statements == []
+
+    now = identity._version[1]
+    monkeypatch.setattr(identity.time, 'monotonic', lambda: now)
+    statements = _statements(lambda: identity.load(admin.id))
+    assert any('cache_versions' in statement for statement in statements)
+    assert any('FROM users' in statement for statement in statements)
+
+
+def test_edits_are_seen_without_waiting_for_the_ttl(cached):
+    admin = _admin()
+    assert identity.load(admin.id).role == 'admin'
+    admin.role = 'student'
+    db.session.commit()
+    assert identity.load(admin.id).role == 'student'
+
+
+def test_bulk_edits_are_seen(cached):
+    admin = _admin()
+    identity.load(admin.id)
+    User.query.filter_by(id=admin.id).update({User.is_banned: True}, synchronize_session=False)
+    db.session.commit()
+    assert identity.load(admin.id).is_banned
+
+
+def test_deleted_user_is_not_loaded(cached):
+    admin = _admin()
+    identity.load(admin.id)
+    db.session.delete(admin)
+    db.session.commit()
+    assert identity.load(admin.id) is None
+
+
+def test_other_attributes_come_from_the_row(cached):
+    admin = _admin()
+    assert identity.load(admin.id).created_at == admin.created_at
+    loaded = identity.load(admin.id)
+    db.session.delete(admin)
+    db.session.commit()
+    with pytest.raises(AttributeError, match='no longer exists'):
+        loaded.created_at
+
+
+def test_demoted_admin_loses_admin_pages(cached, admin_client):
+    assert admin_client.get('/admin_dashboard').status_code == 200
+    _admin().role = 'student'
+    db.session.commit()
+    assert admin_client.get('/admin_dashboard').status_code == 302
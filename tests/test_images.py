@@ -0,0 +1,57 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import images
+
+
+@pytest.fixture
+def source(upload_folder):
+    """Write a source file into the upload folder; returns its name"""
+    images._failed.clear()
+
+    def source(name, data):
+        with open(os.path.join(upload_folder, name), 'wb') as handle:
+            handle.write(data)
+        return name
+    yield source
+    images._failed.clear()
+
+
+def _jpeg(size=(800, 600)):
+    data = io.BytesIO()
+    Image.new('RGB', size, 'navy').save(data, 'JPEG')
+    return data.getvalue()
+
+
+def test_every_size_is_written(upload_folder, source):
+    name = source('photo.jpg', _jpeg())
+    assert images.schedule_renditions(name).result(timeout=10) is None
+    for size, edge in images.RENDITIONS.items():
+        with Image.open(os.path.join(upload_folder, images.rendition_name(name, size))) as rendition:
+            assert max(rendition.size) == min(edge, 800)
+
+
+def test_failed_source_is_not_resubmitted(source, monkeypatch):
+    name = source('corrupt.jpg', b'not an image')
+    images.schedule_renditions(name).result(timeout=10)
+    assert images.schedule_renditions(name) is None
+
+    later = images.time.monotonic() + images.FAILED_RETRY_SECONDS + 1
+    monkeypatch.setattr(images.time, 'monotonic', lambda: later)
+    retry = images.schedule_renditions(name)
+    assert retry is not None
+    retry.result(timeout=10)
+
+
+def test_failed_source_is_served_as_the_original(client, source, monkeypatch):
+    data = b'not an image'
+    name = source('corrupt.jpg', data)
+    images.schedule_renditions(name).result(timeout=10)
+    monkeypatch.setattr(images, '_get_executor', lambda workers: pytest.fail('resubmitted a failed source'))
+    response = client.get(f'/photos/card/{name}')
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.cache_control.no_cache
@@ -0,0 +1,108 @@
+import csv
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import LostItemModel, FoundItemModel
+import counters
+import expiry
+import imports
+
+FIELDS = ['item_name', 'category', 'description', 'location', 'full_names', 'student_number', 'student_email']
+
+
+@pytest.fixture
+def row(app, item_values):
+    """A file row; imports take category and location slugs"""
+    def row(n, **values):
+        slugs = dict(item_name=f'Backpack {n}', category='bags', location='library_steve_biko')
+        return item_values(**dict(slugs, **values))
+    return row
+
+
+def _write_csv(path, rows, fields=FIELDS):
+    with open(path, 'w', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def _import(path, **options):
+    rejected = []
+    summary = imports.import_items('lost', path, rejected=lambda line, errors: rejected.append((line, errors)),
+                                   **options)
+    return summary, rejected
+
+
+def test_bad_rows_are_reported_and_the_rest_imported(row, tmp_path):
+    rows = [row(0), row(1, item_name=''), row(2), row(3, category='spaceships'), row(4),
+            row(5, description='x' * 501), row(6)]
+    summary, rejected = _import(_write_csv(tmp_path / 'items.csv', rows), chunk_size=2)
+
+    assert summary['read'] == 7 and summary['imported'] == 4 and summary['rejected'] == 3
+    # Line numbers count the header, so row n is on line n + 2
+    assert [line for line, _ in rejected] == [3, 5, 7]
+    assert rejected[0][1][0].startswith('item_name:')
+    assert rejected[1][1][0].startswith('category:')
+    assert sorted(item.item_name for item in LostItemModel.query) == [
+        'Backpack 0', 'Backpack 2', 'Backpack 4', 'Backpack 6']
+    assert counters.total(counters.snapshot(), 'lost', 'active') == 4
+
+
+def test_ndjson_reports_lines_that_are_not_json(row, tmp_path):
+    path = tmp_path / 'items.ndjson'
+    path.write_text('\n'.join([json.dumps(row(0)), '{not json', json.dumps([1, 2]), '', json.dumps(row(1))]))
+    summary, rejected = _import(str(path))
+
+    assert summary['imported'] == 2
+    assert [line for line, _ in rejected] == [2, 3]
+    assert LostItemModel.query.count() == 2
+
+
+def test_missing_photos_are_rejected(row, tmp_path):
+    photos = tmp_path / 'photos'
+    photos.mkdir()
+    (photos / 'bag.jpg').write_bytes(b'not really a jpeg')
+    rows = [row(0, photo_filename='bag.jpg'), row(1, photo_filename='missing.jpg'),
+            row(2, photo_filename='../outside.jpg')]
+    summary, rejected = _import(_write_csv(tmp_path / 'items.csv', rows, FIELDS + ['photo_filename']),
+                                photo_dir=str(photos))
+
+    assert summary['imported'] == 1
+    assert [line for line, _ in rejected] == [3, 4]
+    assert LostItemModel.query.one().photo_filename.endswith('.jpg')
+
+
+def test_dry_run_inserts_nothing(row, tmp_path):
+    summary, rejected = _import(_write_csv(tmp_path / 'items.csv', [row(0), row(1, student_email='')]),
+                                dry_run=True)
+    assert summary['imported'] == 1 and len(rejected) == 1
+    assert LostItemModel.query.count() == 0
+
+
+def test_found_items_need_their_own_fields(row, tmp_path):
+    rejected = []
+    summary = imports.import_items('found', _write_csv(tmp_path / 'items.csv', [row(0)]),
+                                   rejected=lambda line, errors: rejected.append(errors))
+    assert summary['imported'] == 0
+    assert any(error.startswith('current_location:') for error in rejected[0])
+    assert FoundItemModel.query.count() == 0
+
+
+def test_created_at_from_the_file_is_kept(row, tmp_path):
+    rows = [row(0, created_at='2025-03-10T09:30:00'), row(1, created_at='2025-03-10T09:30:00+02:00'),
+            row(2), row(3, created_at='last Tuesday'), row(4, created_at='2999-01-01')]
+    before = datetime.utcnow()
+    summary, rejected = _import(_write_csv(tmp_path / 'items.csv', rows, FIELDS + ['created_at']))
+
+    assert summary['imported'] == 3
+    assert [(line, errors[0].split(':')[0]) for line, errors in rejected] == [(5, 'created_at'), (6, 'created_at')]
+    items = {item.item_name: item for item in LostItemModel.query}
+    retention = timedelta(days=expiry.retention_days())
+    assert items['Backpack 0'].created_at == datetime(2025, 3, 10, 9, 30)
+    assert items['Backpack 0'].expires_at == datetime(2025, 3, 10, 9, 30) + retention
+    assert items['Backpack 1'].created_at == datetime(2025, 3, 10, 7, 30)
+    assert items['Backpack 2'].created_at >= before
+    assert items['Backpack 2'].expires_at == items['Backpack 2'].created_at + retention
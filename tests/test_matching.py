@@ -0,0 +1,72 @@
+import pytest
+
+from __init__ import db
+from models import LostItemModel, FoundItemModel, MatchCandidate
+import matching
+
+
+@pytest.fixture
+def items(make_item):
+    def _add(model, name, description, category='Electronics'):
+        item = make_item(model, item_name=name, description=description, category=category)
+        db.session.flush()
+        matching.index_item('lost' if model is LostItemModel else 'found', item)
+        return item
+
+    phone = _add(LostItemModel, 'Black Samsung phone', 'Samsung Galaxy phone in a black leather case')
+    textbook = _add(LostItemModel, 'Chemistry textbook', 'Organic chemistry textbook, third edition',
+                    category='Books')
+    found_phone = _add(FoundItemModel, 'Samsung phone', 'Black Samsung Galaxy with a leather case')
+    found_bottle = _add(FoundItemModel, 'Water bottle', 'Steel water bottle with stickers', category='Other')
+    db.session.commit()
+    return phone, textbook, found_phone, found_bottle
+
+
+def _scores(item_type, item):
+    return dict(matching.score_item(item_type, item))
+
+
+def test_candidates_are_symmetric(items):
+    phone, textbook, found_phone, found_bottle = items
+    from_lost = _scores('lost', phone)
+    from_found = _scores('found', found_phone)
+    assert list(from_lost) == [found_phone.id]
+    assert from_found[phone.id] == pytest.approx(from_lost[found_phone.id])
+    assert textbook.id not in from_found
+
+    assert [item.id for item, _ in matching.matches_for('lost', phone.id)] == [found_phone.id]
+    assert [item.id for item, _ in matching.matches_for('found', found_phone.id)] == [phone.id]
+    # One row serves both sides of the pair
+    assert MatchCandidate.query.filter_by(lost_item_id=phone.id, found_item_id=found_phone.id).count() == 1
+
+
+def test_unrelated_items_do_not_match(items):
+    phone, textbook, found_phone, found_bottle = items
+    assert matching.matches_for('lost', textbook.id) == []
+    assert matching.matches_for('found', found_bottle.id) == []
+
+
+def test_removed_items_disappear(items):
+    phone, textbook, found_phone, found_bottle = items
+    matching.remove_items('found', [found_phone.id])
+    db.session.commit()
+    assert matching.matches_for('lost', phone.id) == []
+    assert matching.matches_for('found', found_phone.id) == []
+    assert _scores('lost', phone) == {}
+
+
+def test_items_that_stop_being_active_disappear(items):
+    phone, textbook, found_phone, found_bottle = items
+    found_phone.status = 'claimed'
+    matching.index_item('found', found_phone)
+    db.session.commit()
+    assert matching.matches_for('lost', phone.id) == []
+    assert _scores('lost', phone) == {}
+
+
+def test_rebuild_index_finds_the_same_candidates(items):
+    phone, textbook, found_phone, found_bottle = items
+    before = _scores('lost', phone)
+    matching.rebuild_index(batch_size=2)
+    assert _scores('lost', phone) == pytest.approx(before)
+    assert MatchCandidate.query.count() == 1
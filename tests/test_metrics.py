@@ -0,0 +1,42 @@
+import pytest
+from flask import Flask, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from __init__ import db
+import metrics
+
+
+@pytest.fixture
+def engine(app, tmp_path):
+    """The test database's engine, timed by metrics hooks installed twice"""
+    for name in ('first', 'second'):
+        fresh = Flask(name, instance_path=str(tmp_path))
+        fresh.config.update(METRICS_ENABLED=True, METRICS_DIR=str(tmp_path), METRICS_WRITE_INTERVAL=3600)
+        metrics.init_app(fresh)
+    yield db.engine, fresh
+    event.remove(Engine, 'before_cursor_execute', metrics._before_cursor_execute)
+    event.remove(Engine, 'after_cursor_execute', metrics._after_cursor_execute)
+    event.remove(Engine, 'handle_error', metrics._handle_error)
+
+
+def test_each_statement_is_counted_once(engine):
+    engine, fresh = engine
+    with fresh.test_request_context('/'), engine.connect() as conn:
+        metrics._start_request()
+        conn.exec_driver_sql('SELECT 1')
+        conn.exec_driver_sql('SELECT 2')
+        assert g.metrics['queries'] == 2
+        assert g.metrics['db_seconds'] > 0
+
+
+def test_failed_statement_leaves_nothing_behind(engine):
+    engine, fresh = engine
+    with fresh.test_request_context('/'), engine.connect() as conn:
+        metrics._start_request()
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql('SELECT * FROM no_such_table')
+        conn.exec_driver_sql('SELECT 1')
+        assert g.metrics['queries'] == 2
+        assert not any(key.startswith('metrics') for key in conn.info)
@@ -0,0 +1,82 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+from __init__ import db
+from models import LostItemModel
+from pagination import decode_cursor, encode_cursor, keyset_paginate
+
+PER_PAGE = 3
+
+
+@pytest.fixture
+def items(make_item):
+    """Eleven items, seven of them sharing one created_at so pages split inside the tie"""
+    tied = datetime(2025, 3, 1, 12, 0)
+    times = [tied - timedelta(days=2), tied - timedelta(days=1)] + [tied] * 7 + [tied + timedelta(days=1)] * 2
+    for n, created_at in enumerate(times):
+        make_item(item_name=f'Item {n}', created_at=created_at)
+    db.session.commit()
+    return LostItemModel.query.all()
+
+
+def _ids(page):
+    return [item.id for item in page.items]
+
+
+def _walk(order):
+    pages = [keyset_paginate(LostItemModel.query, LostItemModel, PER_PAGE, order=order)]
+    while pages[-1].has_next:
+        pages.append(keyset_paginate(LostItemModel.query, LostItemModel, PER_PAGE,
+                                     cursor=pages[-1].next_cursor, order=order))
+    return pages
+
+
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+def test_pages_cover_every_row_once_in_order(items, order):
+    expected = [item.id for item in sorted(items, key=lambda item: (item.created_at, item.id),
+                                           reverse=order == 'desc')]
+    pages = _walk(order)
+    assert [item_id for page in pages for item_id in _ids(page)] == expected
+    assert all(len(page.items) == PER_PAGE for page in pages[:-1])
+    assert not pages[0].has_prev and not pages[-1].has_next
+
+
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+def test_prev_cursor_returns_the_previous_page(items, order):
+    pages = _walk(order)
+    for previous, page in zip(pages, pages[1:]):
+        back = keyset_paginate(LostItemModel.query, LostItemModel, PER_PAGE, cursor=page.prev_cursor, order=order)
+        assert _ids(back) == _ids(previous)
+        assert back.has_next
+    first = keyset_paginate(LostItemModel.query, LostItemModel, PER_PAGE, cursor=pages[1].prev_cursor, order=order)
+    assert not first.has_prev
+
+
+def test_cursor_round_trip(items):
+    item = items[3]
+    assert decode_cursor(encode_cursor(item, 'next')) == (item.created_at, item.id, 'next')
+    assert decode_cursor(encode_cursor(item, 'prev')) == (item.created_at, item.id, 'prev')
+
+
+@pytest.mark.parametrize('token', [
+    '',
+    None,
+    'not-a-cursor',
+    '%%%',
+    base64.urlsafe_b64encode(b'{"created_at": 1}').decode(),
+    base64.urlsafe_b64encode(b'["yesterday",1,"n"]').decode(),
+    base64.urlsafe_b64encode(b'["2025-03-01T12:00:00","x","n"]').decode(),
+    base64.urlsafe_b64encode(b'["2025-03-01T12:00:00",1]').decode(),
+])
+def test_invalid_cursor_is_ignored(items, token):
+    assert decode_cursor(token) is None
+    page = keyset_paginate(LostItemModel.query, LostItemModel, PER_PAGE, cursor=token)
+    assert _ids(page) == _ids(_walk('desc')[0])
+    assert not page.has_prev
+
+
+def test_admin_list_accepts_any_cursor(admin_client, items):
+    assert admin_client.get('/admin/lost-items').status_code == 200
+    assert admin_client.get('/admin/lost-items?cursor=garbage').status_code == 200
@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+import passwords
+
+
+@pytest.fixture
+def pool(app):
+    app.config['PASSWORD_HASH_WORKERS'] = 1
+    yield
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    with passwords._lock:
+        if passwords._executor is not None:
+            passwords._executor.shutdown()
+        passwords._executor = None
+
+
+def test_hashing_runs_in_a_process_that_is_not_a_fork_of_this_one(pool):
+    stored = passwords.hash_password('correct horse')
+    assert passwords.verify_password(stored, 'correct horse')
+    assert not passwords.verify_password(stored, 'battery staple')
+    assert passwords._executor._mp_context.get_start_method() in ('forkserver', 'spawn')
+
+
+def test_hashing_from_several_threads(app, pool):
+    results = []
+
+    def login():
+        with app.app_context():
+            results.append(passwords.verify_password(passwords.hash_password('secret'), 'secret'))
+
+    threads = [threading.Thread(target=login) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert results == [True] * 4
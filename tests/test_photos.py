@@ -0,0 +1,135 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from __init__ import db
+import images
+import storage
+
+
+def _jpeg():
+    data = io.BytesIO()
+    Image.new('RGB', (800, 600), 'navy').save(data, 'JPEG')
+    return data.getvalue()
+
+
+@pytest.fixture
+def photo(upload_folder):
+    """A committed content-addressed upload: its path, digest and bytes"""
+    data = _jpeg()
+    path = storage.save_upload(FileStorage(io.BytesIO(data), filename='photo.jpg'))
+    db.session.commit()
+    return path, storage.content_digest(path), data
+
+
+@pytest.fixture
+def pending(monkeypatch):
+    """Rendition jobs the routes asked for, recorded instead of run"""
+    scheduled = []
+    monkeypatch.setattr('app.schedule_renditions', scheduled.append)
+    return scheduled
+
+
+@pytest.fixture
+def offload(app):
+    def offload(mode):
+        app.config['PHOTO_OFFLOAD'] = mode
+    yield offload
+    app.config['PHOTO_OFFLOAD'] = ''
+
+
+def _assert_immutable(response):
+    assert response.cache_control.public
+    assert response.cache_control.max_age == storage.IMMUTABLE_MAX_AGE
+    assert response.cache_control.immutable
+    assert not response.cache_control.no_cache
+
+
+def test_content_addressed_photo_is_immutable(client, photo):
+    path, digest, data = photo
+    response = client.get(f'/uploads/{path}')
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.get_etag() == (digest, False)
+    _assert_immutable(response)
+
+
+def test_matching_etag_gets_304(client, photo):
+    path, digest, data = photo
+    response = client.get(f'/uploads/{path}', headers={'If-None-Match': f'"{digest}"'})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert client.get(f'/uploads/{path}', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_range_gets_206(client, photo):
+    path, digest, data = photo
+    response = client.get(f'/uploads/{path}', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.data == data[:100]
+    assert response.headers['Content-Range'] == f'bytes 0-99/{len(data)}'
+
+
+def test_legacy_upload_must_be_revalidated(client, upload_folder):
+    with open(os.path.join(upload_folder, 'old_photo.jpg'), 'wb') as handle:
+        handle.write(_jpeg())
+    response = client.get('/uploads/old_photo.jpg')
+    assert response.status_code == 200
+    assert response.cache_control.no_cache and not response.cache_control.immutable
+    etag, _ = response.get_etag()
+    assert client.get('/uploads/old_photo.jpg', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+
+
+@pytest.mark.parametrize('path', ['missing.jpg', '../conftest.py'])
+def test_missing_or_outside_files_are_404(client, upload_folder, path):
+    assert client.get(f'/uploads/{path}').status_code == 404
+
+
+def test_pending_rendition_serves_the_original_uncached(client, photo, pending):
+    path, digest, data = photo
+    response = client.get(f'/photos/card/{path}')
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.cache_control.no_cache and not response.cache_control.immutable
+    assert pending == [path]
+
+
+def test_ready_rendition_is_immutable_with_its_own_etag(client, app, photo, pending):
+    path, digest, data = photo
+    images.generate_renditions(app.config['UPLOAD_FOLDER'], path)
+    response = client.get(f'/photos/card/{path}')
+    assert response.status_code == 200
+    assert max(Image.open(io.BytesIO(response.data)).size) == images.RENDITIONS['card']
+    assert response.get_etag() == (f'{digest}-card', False)
+    _assert_immutable(response)
+    assert pending == []
+    assert client.get(f'/photos/card/{path}', headers={'If-None-Match': f'"{digest}-card"'}).status_code == 304
+
+
+def test_unknown_size_is_404(client, photo):
+    path, digest, data = photo
+    assert client.get(f'/photos/huge/{path}').status_code == 404
+
+
+def test_nginx_offload(client, app, photo, offload):
+    path, digest, data = photo
+    offload('nginx')
+    response = client.get(f'/uploads/{path}')
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == app.config['PHOTO_OFFLOAD_PREFIX'] + path
+    assert response.data == b''
+    assert response.mimetype == 'image/jpeg'
+    _assert_immutable(response)
+    assert client.get(f'/uploads/{path}', headers={'If-None-Match': f'"{digest}"'}).status_code == 304
+
+
+def test_sendfile_offload(client, app, photo, offload):
+    path, digest, data = photo
+    offload('apache')
+    response = client.get(f'/uploads/{path}')
+    assert response.headers['X-Sendfile'] == os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], path))
+    assert response.data == b''
+    assert 'X-Accel-Redirect' not in response.headers
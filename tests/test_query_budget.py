@@ -0,0 +1,62 @@
+import pytest
+from flask import Flask, g
+
+from __init__ import db
+from models import User, FoundItemModel, UserActivity
+from query_budget import QueryBudgetExceeded
+import query_budget
+import rollups
+
+ROWS = 60
+
+
+@pytest.fixture
+def populated(app, make_item, make_claim):
+    """Enough rows of everything that a per-row query would blow the budget"""
+    for n in range(ROWS):
+        make_item(item_name=f'Item {n}')
+        make_item(FoundItemModel, item_name=f'Item {n}')
+        make_claim(item_id=n + 1, status='approved' if n % 2 else 'pending', admin_notes='Checked')
+        # A user per row, so a lazy-loaded user can't come from the identity map
+        user = User(username=f'user{n}', email=f'user{n}@example.com', password_hash='x', role='student')
+        db.session.add(UserActivity(user=user, action='login'))
+    db.session.commit()
+    rollups.roll_up()
+    db.session.commit()
+
+
+@pytest.mark.parametrize('path', [
+    '/admin_dashboard',
+    '/admin/claims',
+    '/admin/claims?status=approved&sort=status&order=asc',
+    '/admin/activity-logs',
+    '/admin/lost-items',
+    '/admin/found-items',
+    '/admin/statistics',
+    '/admin/users',
+])
+def test_admin_pages_stay_within_budget(admin_client, populated, path):
+    assert admin_client.get(path).status_code == 200
+
+
+def test_user_dashboard_stays_within_budget(student_client, populated):
+    assert student_client.get('/dashboard').status_code == 200
+
+
+def test_budget_is_enforced(app, admin_client, populated):
+    budget = app.config['QUERY_BUDGET']
+    app.config['QUERY_BUDGET'] = 2
+    try:
+        with pytest.raises(QueryBudgetExceeded, match='admin_claims ran'):
+            admin_client.get('/admin/claims')
+    finally:
+        app.config['QUERY_BUDGET'] = budget
+
+
+def test_each_statement_is_counted_once(app):
+    # A second create_app must not count every statement twice
+    query_budget.init_app(Flask('again'))
+    engine = db.engine
+    with app.test_request_context('/'), engine.connect() as conn:
+        conn.exec_driver_sql('SELECT 1')
+        assert g.query_statements == ['SELECT 1']
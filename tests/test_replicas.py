@@ -0,0 +1,112 @@
+import sqlite3
+
+import pytest
+from flask import g
+from sqlalchemy import create_engine, event
+
+from __init__ import db
+from models import LostItemModel
+from replicas import RoutingSession
+import replicas
+
+
+@pytest.fixture
+def replica(app, make_item, tmp_path):
+    """A second SQLite database as the replica bind; it lags behind with only the item 'On both'"""
+    make_item(item_name='On both')
+    db.session.commit()
+    path = str(tmp_path / 'replica.db')
+    # The backup API, since committed pages may still be in the primary's WAL file
+    source, target = sqlite3.connect(db.engine.url.database), sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.close()
+    make_item(item_name='Primary only')
+    db.session.commit()
+    yield _attach(app, f'sqlite:///{path}')
+    _detach(app)
+
+
+@pytest.fixture
+def unreachable(app, make_item, tmp_path):
+    make_item(item_name='Primary only')
+    db.session.commit()
+    yield _attach(app, f'sqlite:///{tmp_path}/missing/replica.db')
+    _detach(app)
+
+
+def _attach(app, url):
+    engine = create_engine(url)
+    db.engines[replicas.BIND_KEY] = engine
+    app.config['REPLICA_DATABASE_URL'] = url
+    event.listen(RoutingSession, 'after_commit', replicas._after_commit)
+    event.listen(engine, 'handle_error', replicas._handle_error)
+    db.session.remove()
+    return engine
+
+
+def _detach(app):
+    event.remove(RoutingSession, 'after_commit', replicas._after_commit)
+    db.engines.pop(replicas.BIND_KEY).dispose()
+    app.config['REPLICA_DATABASE_URL'] = ''
+    replicas._down_until = 0.0
+    db.session.remove()
+
+
+def _names(response):
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    return {name for name in ('On both', 'Primary only') if name in html}
+
+
+def test_replica_views_read_from_the_replica(client, replica):
+    assert _names(client.get('/lost-items')) == {'On both'}
+
+
+def test_other_views_read_from_the_primary(admin_client, replica):
+    assert _names(admin_client.get('/admin/lost-items')) == {'On both', 'Primary only'}
+
+
+def test_marked_statements_read_from_the_replica(app, replica):
+    query = db.select(LostItemModel.item_name)
+    assert db.session.scalars(query.execution_options(read_replica=True)).all() == ['On both']
+    assert sorted(db.session.scalars(query)) == ['On both', 'Primary only']
+
+
+def test_reads_after_a_write_in_the_session_use_the_primary(app, replica):
+    with app.test_request_context('/lost-items'):
+        g.read_replica = True
+        assert [item.item_name for item in LostItemModel.query] == ['On both']
+        LostItemModel.query.filter_by(item_name='On both').update({LostItemModel.category: 'Books'})
+        assert sorted(item.item_name for item in LostItemModel.query) == ['On both', 'Primary only']
+        db.session.rollback()
+
+
+def test_locking_reads_use_the_primary(app, replica):
+    with app.test_request_context('/lost-items'):
+        g.read_replica = True
+        assert len(LostItemModel.query.with_for_update().all()) == 2
+
+
+def test_a_write_keeps_that_browser_on_the_primary(admin_client, replica):
+    assert _names(admin_client.get('/lost-items')) == {'On both'}
+    item = LostItemModel.query.filter_by(item_name='On both').one()
+    response = admin_client.post(f'/admin/update-item-status/lost/{item.id}', data={'status': 'active'})
+    assert response.status_code == 302
+    with admin_client.session_transaction() as session:
+        assert 'primary_until' in session
+    assert _names(admin_client.get('/lost-items')) == {'On both', 'Primary only'}
+
+    with admin_client.session_transaction() as session:
+        session['primary_until'] = 0
+    assert _names(admin_client.get('/lost-items')) == {'On both'}
+
+
+def test_unreachable_replica_falls_back_to_the_primary(client, unreachable, monkeypatch):
+    assert _names(client.get('/lost-items')) == {'Primary only'}
+    assert replicas._down_until > 0
+
+    connects = []
+    monkeypatch.setattr(unreachable, 'connect', lambda: connects.append(1) or pytest.fail('retried too soon'))
+    assert _names(client.get('/lost-items')) == {'Primary only'}
+    assert connects == []
@@ -0,0 +1,88 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from __init__ import db
+from models import LostItemModel, DailyItemStat, DailyClaimStat
+import rollups
+
+MARCH_1 = date(2025, 3, 1)
+
+
+def _at(day, hour=9):
+    return datetime.combine(MARCH_1 + timedelta(days=day), datetime.min.time()) + timedelta(hours=hour)
+
+
+@pytest.fixture
+def history(make_item, make_claim):
+    """Items reported on March 1-3, and claims approved on March 3 after 2, 4 and 10 hours"""
+    items = [make_item(created_at=_at(day)) for day in (0, 0, 1, 2)]
+    db.session.flush()
+    phone = make_item(item_name='Phone', category='Electronics', created_at=_at(2, hour=0))
+    db.session.flush()
+    for hours in (2, 4, 10):
+        make_claim(item_id=phone.id, status='approved', created_at=_at(2, hour=0), resolved_at=_at(2, hour=hours))
+    make_claim(item_id=items[0].id, status='rejected', created_at=_at(1), resolved_at=_at(2, hour=1))
+    db.session.commit()
+
+
+def _reported(day):
+    return rollups.series(MARCH_1 + timedelta(days=day), MARCH_1 + timedelta(days=day))[0]['lost']
+
+
+def test_days_are_rolled_up(history):
+    assert rollups.roll_up(until=_at(2).date()) == 3
+    rows = rollups.series(MARCH_1, MARCH_1 + timedelta(days=2))
+    assert [row['lost'] for row in rows] == [2, 1, 2]
+    assert [row['opened'] for row in rows] == [0, 1, 3]
+    assert (rows[2]['approved'], rows[2]['rejected']) == (3, 1)
+    assert rollups.top(DailyItemStat.category, MARCH_1, MARCH_1 + timedelta(days=2)) == [('Bags', 4), ('Electronics', 1)]
+
+
+def test_median_hours_to_claim(history, make_claim):
+    rollups.roll_up(until=_at(2).date())
+    assert rollups.series(_at(2).date(), _at(2).date())[0]['median_hours_to_claim'] == 4.0
+    assert rollups.series(MARCH_1, MARCH_1)[0]['median_hours_to_claim'] is None
+
+    phone = LostItemModel.query.filter_by(item_name='Phone').one()
+    make_claim(item_id=phone.id, status='approved', created_at=_at(2), resolved_at=_at(2, hour=15))
+    db.session.commit()
+    rollups.roll_up(until=_at(2).date(), since=_at(2).date())
+    # An even number of claims: the mean of the middle two (4 and 10 hours)
+    assert rollups.series(_at(2).date(), _at(2).date())[0]['median_hours_to_claim'] == 7.0
+
+
+def test_rerun_only_processes_new_days(history, make_item):
+    rollups.roll_up(until=_at(2).date())
+    assert rollups.roll_up(until=_at(2).date()) == 0
+
+    # Backdated into a day that is already rolled up, and a new day
+    make_item(created_at=_at(1, hour=12))
+    make_item(created_at=_at(3))
+    db.session.commit()
+    assert rollups.roll_up(until=_at(3).date()) == 1
+    assert (_reported(1), _reported(3)) == (1, 1)
+    assert DailyClaimStat.query.count() == 4
+
+
+def test_since_recomputes_existing_days(history, make_item):
+    rollups.roll_up(until=_at(2).date())
+    make_item(created_at=_at(1, hour=12))
+    db.session.commit()
+    assert rollups.roll_up(until=_at(2).date(), since=_at(1).date()) == 2
+    assert [_reported(day) for day in range(3)] == [2, 2, 2]
+    # Replaced, not added to
+    assert DailyClaimStat.query.count() == 3
+    assert db.session.query(db.func.sum(DailyItemStat.reported)).scalar() == 6
+
+
+def test_stats_rollup_command(app, history):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['stats-rollup'])
+    assert result.exit_code == 0
+    # Every day from March 1 through yesterday
+    assert result.output == f'Rolled up {(datetime.utcnow().date() - MARCH_1).days} days\n'
+    assert runner.invoke(args=['stats-rollup']).output == 'Rolled up 0 days\n'
+    result = runner.invoke(args=['stats-rollup', '--since', (datetime.utcnow().date() - timedelta(days=2)).isoformat()])
+    assert result.output == 'Rolled up 2 days\n'
+    assert [_reported(day) for day in range(3)] == [2, 1, 2]
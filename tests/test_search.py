@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import text
+
+from __init__ import db
+from models import LostItemModel
+import search
+
+
+@pytest.fixture
+def items(make_item):
+    for name in ('Black Samsung phone', 'Chemistry textbook'):
+        make_item(item_name=name, description=f'{name} left behind')
+    db.session.commit()
+    search._available.clear()
+    yield
+    search._available.clear()
+
+
+def _names(search_text):
+    return [item.item_name for item in search.apply_search(LostItemModel.query, LostItemModel, search_text)]
+
+
+def _drop_index():
+    fts = search.SEARCH_TABLES[LostItemModel.__tablename__][0]
+    with db.engine.begin() as conn:
+        for suffix in ('_ai', '_ad', '_au'):
+            conn.execute(text(f'DROP TRIGGER {fts}{suffix}'))
+        conn.execute(text(f'DROP TABLE {fts}'))
+
+
+def test_prefix_search_uses_the_index(items):
+    assert _names('sams pho') == ['Black Samsung phone']
+    assert search._available[(db.engine.url, LostItemModel.__tablename__)] is True
+
+
+def test_missing_index_is_checked_again_later(items, monkeypatch):
+    _drop_index()
+    assert _names('textbook') == ['Chemistry textbook']
+    assert not search._search_available(LostItemModel)
+
+    # Installed by another process, which can't clear this one's cache
+    with db.engine.begin() as conn:
+        for statement in search._sqlite_statements(LostItemModel.__tablename__, 'lost_items_fts'):
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO lost_items_fts(lost_items_fts) VALUES ('rebuild')"))
+    assert not search._search_available(LostItemModel)
+
+    later = search.time.monotonic() + search.RECHECK_SECONDS + 1
+    monkeypatch.setattr(search.time, 'monotonic', lambda: later)
+    assert search._search_available(LostItemModel)
+    assert _names('chem') == ['Chemistry textbook']
+
+
+@pytest.mark.parametrize('search_text', ['!!!', '  ', '?*"'])
+def test_text_without_words_matches_nothing(items, client, search_text):
+    assert _names(search_text) == []
+    html = client.get('/lost-items', query_string={'query': search_text}).get_data(as_text=True)
+    assert 'Black Samsung phone' not in html and 'Chemistry textbook' not in html
+
+
+def test_text_without_words_matches_nothing_without_the_index(items):
+    _drop_index()
+    assert _names('!!!') == []
@@ -0,0 +1,119 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from flask import template_rendered
+
+from __init__ import db
+from models import LostItemModel, FoundItemModel
+import expiry
+import snapshots
+
+
+@pytest.fixture
+def renders(app):
+    """Names of the item cards each time the snapshot is rendered rather than served from cache"""
+    snapshots._snapshots.clear()
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        if template.name == 'home_recent_items.html':
+            rendered.append(sorted(item.item_name for item in context['recent_lost'] + context['recent_found']))
+
+    template_rendered.connect(record, app)
+    yield rendered
+    template_rendered.disconnect(record, app)
+    snapshots._snapshots.clear()
+
+
+@pytest.fixture
+def phone(make_item):
+    item = make_item(item_name='Black phone')
+    db.session.commit()
+    return item
+
+
+def _version():
+    return snapshots.current_version(snapshots.HOME_RECENT_ITEMS)
+
+
+def _home(client, path='/'):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_snapshot_is_reused_until_an_item_changes(client, renders, phone):
+    assert 'Black phone' in _home(client)
+    assert 'Black phone' in _home(client, '/home')
+    assert renders == [['Black phone']]
+
+
+def test_reported_item_appears(client, renders, phone, make_item):
+    _home(client)
+    make_item(FoundItemModel, item_name='Blue umbrella')
+    db.session.commit()
+    assert 'Blue umbrella' in _home(client)
+    assert renders[-1] == ['Black phone', 'Blue umbrella']
+
+
+def test_reported_item_through_the_route_appears(student_client, renders, upload_folder):
+    _home(student_client)
+    before = _version()
+    response = student_client.post('/report-lost-item', data=dict(
+        item_name='Red scarf', category='clothing', description='Knitted red scarf', location='library_steve_biko',
+        full_names='Test Student', student_number='21000000', student_email='student@example.com',
+        photo=(io.BytesIO(b'scarf photo'), 'scarf.jpg')))
+    assert response.status_code == 302
+    assert _version() > before
+    assert 'Red scarf' in _home(student_client)
+
+
+def test_edited_item_is_rerendered(client, renders, phone):
+    _home(client)
+    phone.item_name = 'Silver phone'
+    db.session.commit()
+    html = _home(client)
+    assert 'Silver phone' in html and 'Black phone' not in html
+
+
+def test_bulk_expired_items_disappear(client, renders, phone):
+    _home(client)
+    phone.expires_at = datetime.utcnow() - timedelta(days=1)
+    db.session.commit()
+    _home(client)
+    before = _version()
+    assert expiry.run_expiry('cli').lost_expired == 1
+    assert _version() > before
+    assert 'Black phone' not in _home(client)
+    assert renders[-1] == []
+
+
+def test_claimed_items_disappear(admin_client, renders, phone, make_claim):
+    claim = make_claim(item_id=phone.id)
+    db.session.commit()
+    assert 'Black phone' in _home(admin_client)
+    response = admin_client.post(f'/admin/update-claim/{claim.id}', data={'status': 'approved'})
+    assert response.status_code == 302
+    assert db.session.get(LostItemModel, phone.id).status == 'claimed'
+    assert 'Black phone' not in _home(admin_client)
+
+
+def test_rolled_back_write_keeps_the_snapshot(client, renders, phone):
+    _home(client)
+    before = _version()
+    phone.item_name = 'Never saved'
+    db.session.flush()
+    LostItemModel.query.update({LostItemModel.status: 'expired'}, synchronize_session=False)
+    db.session.rollback()
+    assert _version() == before
+    assert 'Black phone' in _home(client)
+    assert len(renders) == 1
+
+
+def test_untracked_write_keeps_the_snapshot(client, renders, phone):
+    _home(client)
+    before = _version()
+    db.session.merge(phone).item_name = phone.item_name
+    db.session.commit()
+    assert _version() == before
@@ -0,0 +1,87 @@
+import logging
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from __init__ import db
+import sql_profiler
+
+
+@pytest.fixture
+def profiled(app, tmp_path):
+    """A profiled app, its log file and the test database's engine; the hooks are installed twice"""
+    log = tmp_path / 'sql.log'
+    fresh = Flask('profiled', instance_path=str(tmp_path))
+    fresh.config.update(SQL_PROFILER=True, SQL_SLOW_MS=60000, SQL_REPEAT_THRESHOLD=3, SQL_PROFILER_LOG=str(log))
+    sql_profiler.init_app(fresh)
+    sql_profiler.init_app(fresh)
+    yield fresh, log, db.engine
+    event.remove(Engine, 'before_cursor_execute', sql_profiler._before_cursor_execute)
+    event.remove(Engine, 'after_cursor_execute', sql_profiler._after_cursor_execute)
+    for handler in sql_profiler.logger.handlers[:]:
+        sql_profiler.logger.removeHandler(handler)
+        handler.close()
+    sql_profiler.logger.propagate = True
+    sql_profiler.logger.setLevel(logging.NOTSET)
+
+
+def _log(log):
+    for handler in sql_profiler.logger.handlers:
+        handler.flush()
+    return log.read_text() if log.exists() else ''
+
+
+def test_shape_collapses_in_lists():
+    assert sql_profiler.shape('SELECT * FROM t WHERE id IN (?, ?, ?)') == \
+        sql_profiler.shape('SELECT *\n  FROM t WHERE id IN (?, ?)') == 'SELECT * FROM t WHERE id IN (?)'
+
+
+def test_only_slow_statements_are_logged(profiled, monkeypatch):
+    fresh, log, engine = profiled
+    with engine.connect() as conn:
+        conn.exec_driver_sql('SELECT 1')
+        assert 'Slow query' not in _log(log)
+        monkeypatch.setattr(sql_profiler, '_slow_seconds', 0)
+        conn.exec_driver_sql('SELECT 2')
+    text = _log(log)
+    assert text.count('Slow query') == 1
+    assert 'SELECT 2' in text and 'parameters: ()' in text
+
+
+def test_repeated_shapes_are_summarized_per_request(profiled):
+    fresh, log, engine = profiled
+    with fresh.test_request_context('/admin/claims'), engine.connect() as conn:
+        for ids in [(1,), (1, 2), (1, 2, 3)]:
+            conn.exec_driver_sql(f'SELECT 1 WHERE 1 IN ({", ".join("?" * len(ids))})', ids)
+        conn.exec_driver_sql('SELECT 1 FROM users WHERE id = ?', (1,))
+        conn.exec_driver_sql('SELECT 1 FROM users WHERE id = ?', (2,))
+        sql_profiler._summarize()
+    text = _log(log)
+    assert 'Possible N+1 on GET /admin/claims' in text
+    assert '5 statements, 2 distinct' in text
+    # Only shapes run at least SQL_REPEAT_THRESHOLD times are listed, and each appears once
+    assert 'FROM users' not in text
+    assert text.count('Possible N+1') == 1
+
+
+def test_request_without_repeats_logs_nothing(profiled):
+    fresh, log, engine = profiled
+    with fresh.test_request_context('/'), engine.connect() as conn:
+        conn.exec_driver_sql('SELECT 1')
+        conn.exec_driver_sql('SELECT 2')
+        sql_profiler._summarize()
+    assert _log(log) == ''
+
+
+def test_failed_statement_leaves_nothing_behind(profiled, monkeypatch):
+    fresh, log, engine = profiled
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql('SELECT * FROM no_such_table')
+        assert not any(key.startswith('profiler') for key in conn.info)
+        monkeypatch.setattr(sql_profiler, '_slow_seconds', 0)
+        conn.exec_driver_sql('SELECT 1')
+    assert 'no_such_table' not in _log(log)
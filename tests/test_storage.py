@@ -0,0 +1,55 @@
+import glob
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from __init__ import db
+from models import PhotoBlob
+import storage
+
+
+def _upload(data, filename='photo.jpg'):
+    return storage.save_upload(FileStorage(io.BytesIO(data), filename=filename))
+
+
+def _temporary_files(folder):
+    return glob.glob(os.path.join(folder, '.upload-*'))
+
+
+def test_file_is_placed_when_the_reference_commits(upload_folder):
+    path = _upload(b'photo bytes')
+    assert not os.path.exists(os.path.join(upload_folder, path))
+    db.session.commit()
+    assert os.path.exists(os.path.join(upload_folder, path))
+    assert _temporary_files(upload_folder) == []
+
+
+def test_identical_uploads_share_one_blob(upload_folder):
+    first = _upload(b'same bytes', 'a.jpg')
+    db.session.commit()
+    second = _upload(b'same bytes', 'b.jpeg')
+    third = _upload(b'same bytes', 'c.png')
+    db.session.commit()
+    assert first == second == third
+    assert PhotoBlob.query.one().ref_count == 3
+    assert _temporary_files(upload_folder) == []
+
+
+@pytest.mark.parametrize('end', ['rollback', 'close'])
+def test_uncommitted_upload_leaves_nothing_behind(upload_folder, end):
+    path = _upload(b'never committed')
+    getattr(db.session, end)()
+    assert _temporary_files(upload_folder) == []
+    assert not os.path.exists(os.path.join(upload_folder, path))
+    assert PhotoBlob.query.count() == 0
+
+
+def test_release_removes_the_last_reference(upload_folder):
+    path = _upload(b'released bytes')
+    _upload(b'released bytes')
+    db.session.commit()
+    storage.release([path])
+    db.session.commit()
+    assert PhotoBlob.query.one().ref_count == 1
@@ -0,0 +1,72 @@
+import logging
+
+import pytest
+from flask import Flask, g
+from sqlalchemy import event
+
+from __init__ import db
+from models import ClaimModel, LostItemModel, UserActivity
+import unit_of_work
+
+
+@pytest.fixture
+def claim(make_claim):
+    claim = make_claim()
+    db.session.commit()
+    return claim
+
+
+@pytest.fixture
+def debug(app):
+    app.debug = True
+    yield
+    app.debug = False
+
+
+def test_write_route_commits_once(debug, admin_client, claim):
+    response = admin_client.post(f'/admin/update-claim/{claim.id}', data={'status': 'rejected'})
+    assert response.status_code == 302
+    assert response.headers['X-DB-Commits'] == '1'
+
+
+def test_failed_write_is_rolled_back_and_flashed(admin_client, claim):
+    def fail(conn, cursor, statement, *args):
+        if statement.startswith('INSERT INTO user_activities'):
+            raise RuntimeError('deadlock detected')
+
+    event.listen(db.engine, 'before_cursor_execute', fail)
+    try:
+        response = admin_client.post(f'/admin/update-claim/{claim.id}', data={'status': 'approved'})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', fail)
+
+    assert response.status_code == 302
+    with admin_client.session_transaction() as session:
+        assert session['_flashes'][-1][0] == 'error'
+    db.session.expire_all()
+    assert db.session.get(ClaimModel, claim.id).status == 'pending'
+    assert UserActivity.query.filter_by(action='update_claim').count() == 0
+
+
+def test_expiry_route_may_commit_per_batch(debug, make_item, admin_client, caplog):
+    make_item()
+    db.session.commit()
+    LostItemModel.query.update({LostItemModel.expires_at: db.func.datetime('now', '-1 day')})
+    db.session.commit()
+
+    with caplog.at_level(logging.WARNING):
+        response = admin_client.get('/admin/expire-old-items')
+    assert response.status_code == 302
+    assert int(response.headers['X-DB-Commits']) > 1
+    assert 'commits in one request' not in caplog.text
+    assert LostItemModel.query.one().status == 'expired'
+    assert UserActivity.query.filter_by(action='expire_old_items').count() == 1
+
+
+def test_each_commit_is_counted_once(app):
+    unit_of_work.init_app(Flask('again'))
+    engine = db.engine
+    with app.test_request_context('/'):
+        with engine.begin() as conn:
+            conn.exec_driver_sql('SELECT 1')
+        assert g.db_commits == 1
@@ -0,0 +1,54 @@
+from functools import wraps
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from __init__ import db
+
+
+def unit_of_work(view):
+    """Commit everything the view changed once, after it returns; roll it all back if it raises
+
+    Views (and the helpers they call, log_activity included) only add, change
+    and flush. Use flush where an id or a constraint error is needed early.
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        try:
+            response = view(*args, **kwargs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return response
+    return decorated_function
+
+
+def commits_in_batches(view):
+    """Mark a view that commits as it goes (a batched job run from a route) instead of once
+
+    Such views aren't wrapped in @unit_of_work, and the debug check doesn't flag their commits.
+    """
+    view.commits_in_batches = True
+    return view
+
+
+def _count_commit(conn):
+    if has_request_context():
+        g.db_commits = g.get('db_commits', 0) + 1
+
+
+def init_app(app):
+    if not event.contains(Engine, 'commit', _count_commit):
+        event.listen(Engine, 'commit', _count_commit)
+
+    @app.after_request
+    def report_commits(response):
+        # Debug only: a write route should commit once
+        if not app.debug:
+            return response
+        commits = g.get('db_commits', 0)
+        response.headers['X-DB-Commits'] = str(commits)
+        view = app.view_functions.get(request.endpoint)
+        if commits > 1 and not getattr(view, 'commits_in_batches', False):
+            app.logger.warning(f'{commits} commits in one request to {request.endpoint}')
+        return response